@@ -1,4 +1,9 @@
+import os
 import ee
+import instrumentation
+import ee_retry
+import scene_index
+import s1_tracks
 import geopandas as gpd
 import geemap
 from shapely.geometry import Point
@@ -6,6 +11,14 @@ from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from ipywidgets import HBox, VBox, HTML, VBox as VBoxWidget
 from IPython.display import display
+from export_utils import NATIVE_GRID_BANDS, export_image_to_drive, analytic_flood_mask, scaled_index, MASK_NODATA, INDEX_NODATA
+from download_utils import download_image_to_cog
+from datacube import build_datacube, write_datacube
+from mosaic_utils import daily_mosaics, image_for_date
+from render_utils import render_thumbnails, render_timelapse, resolve_rgb
+from report_utils import build_report
+from interactive_utils import time_slider_map, lazy_map_grid
+from tile_cache import add_cached_layer
 
 # Trigger the authentication flow.
 ee.Authenticate() #force=True)
@@ -26,6 +39,52 @@ dias_posteriores = 25 # Número de dias depois da data de referência
 # Definir o buffer em graus
 buffer_degrees = 0.1  # 10 km em graus
 
+# Grade de exportação: por padrão usa a projeção e resolução nativas do sensor.
+# Reamostragem é opcional: informe export_scale (m) e/ou export_crs explicitamente
+export_scale = None       # Ex.: 30 para reamostrar para 30 m
+export_crs = None         # Ex.: 'EPSG:4326'
+export_resampling = None  # 'bilinear' ou 'bicubic' (None = vizinho mais próximo)
+
+# Modo de exportação: 'drive' (tarefa em lote) ou 'local' (download direto em COG)
+export_mode = 'drive'
+output_dir = 'saidas'          # Pasta dos COGs no modo 'local'
+cog_compression = 'DEFLATE'    # 'DEFLATE' ou 'ZSTD' (com preditor)
+write_cube = False             # Grava o datacube Zarr (time x y x) do sensor em output_dir
+
+# Modo de exibição: 'interactive' (um mapa geemap por data), 'lazy' (grade com
+# painéis criados ao clicar, base primeiro), 'slider' (um único mapa com seletor
+# de data), 'thumbnails' (PNGs estáticos renderizados em paralelo) ou 'report'
+# (relatório HTML estático). Fora do modo 'interactive' o stretch de cada data
+# só é calculado quando o painel é renderizado
+display_mode = 'interactive'
+thumbnail_size = 768           # Maior dimensão das miniaturas em pixels
+make_timelapse = False         # Gera um único timelapse (base + todas as datas)
+timelapse_format = 'gif'       # 'gif' ou 'mp4'
+report_pdf = False             # No modo 'report', também gera PDF
+
+# Instrumentação: tempo, nº de chamadas ao EE e bytes por etapa
+# (tabela-resumo no fim da execução + trace JSON em output_dir)
+instrument = True
+if instrument:
+    instrumentation.install()
+
+# Controle de cota: repete erros transitórios (429, "Too many concurrent
+# aggregations") com backoff exponencial e ajusta as chamadas simultâneas (AIMD)
+retry_calls = True
+if retry_calls:
+    ee_retry.install()
+
+# Inventário pelo índice local de cenas (SQLite em ~/.cache/satelite): só o
+# trecho do período ainda não sincronizado é buscado no servidor
+use_scene_index = True
+
+# Passagens da órbita: as duas entram na mesma linha do tempo (só 'DESCENDING'
+# descarta metade das aquisições). Com harmonize_passes, o VV de cada cena é
+# levado ao nível da base combinada pela base da sua trilha (passagem e órbita
+# relativa), para o limiar valer igual nas duas passagens
+orbit_passes = list(s1_tracks.ORBIT_PASSES)
+harmonize_passes = True
+
 ponto = Point(lon, lat)
 poligono_buffer = ponto.buffer(buffer_degrees)
 area_interesse = gpd.GeoDataFrame([{'id': 0, 'geometry': poligono_buffer}], crs='EPSG:4326')
@@ -69,7 +128,7 @@ s1_collection = (
     ee.ImageCollection('COPERNICUS/S1_GRD')
     .filterBounds(geometry)
     .filterDate(start_date, end_date)
-    .filter(ee.Filter.eq('orbitProperties_pass', 'DESCENDING'))
+    .filter(ee.Filter.inList('orbitProperties_pass', orbit_passes))
     .filter(ee.Filter.eq('resolution_meters', 10))
     .filter(ee.Filter.eq('instrumentMode', 'IW'))
     .filter(ee.Filter.listContains(
@@ -79,8 +138,30 @@ s1_collection = (
 )
 
 
+instrumentation.set_stage('inventory')
+
+# Obtém data e system:index de todas as cenas em uma única chamada ao servidor
+def get_image_info(image):
+    return ee.Feature(None, {
+        'date': image.date().format('YYYY-MM-dd'),
+        'system:index': image.get('system:index')
+    })
+
+if use_scene_index:
+    dates_list, indices_list = scene_index.SceneIndex().inventory(
+        'COPERNICUS/S1_GRD', (minx, miny, maxx, maxy), start_date, end_date, orbit_pass=orbit_passes
+    )
+else:
+    image_info = s1_collection.map(get_image_info)
+    inventory = ee.Dictionary({
+        'date': image_info.aggregate_array('date'),
+        'system:index': image_info.aggregate_array('system:index')
+    }).getInfo()
+    dates_list = inventory['date']
+    indices_list = inventory['system:index']
+
 # Verifica quantas imagens existem
-image_count = s1_collection.size().getInfo()
+image_count = len(dates_list)
 print(f"Número de imagens encontradas: {image_count}")
 
 if image_count == 0:
@@ -92,24 +173,6 @@ else:
       flooded = vv.lt(-17).rename('FLOOD')  # limiar típico
       return image.addBands(flooded)
 
-    # Aplica  a todas as imagens
-    flood_collection = s1_collection.map(calculate_flood_s1)
-
-    # Obtém informações das datas das imagens
-    def get_image_info(image):
-        return ee.Feature(None, {
-            'date': image.date().format('YYYY-MM-dd'),
-            'system:index': image.get('system:index')
-        })
-
-
-
-    image_info = flood_collection.map(get_image_info)
-
-    dates_list = image_info.aggregate_array('date').getInfo()
-    indices_list = image_info.aggregate_array('system:index').getInfo()
-
-
     # Remove duplicatas mantendo a ordem
     unique_dates = []
     seen = set()
@@ -154,12 +217,13 @@ else:
 
 
     # Busca e processa imagem de base (mosaico do ano anterior)
+    instrumentation.set_stage('baseline')
     print(f"\n=== Processando imagem de base (mosaico do ano anterior) ===")
     base_collection = (
     ee.ImageCollection('COPERNICUS/S1_GRD')
     .filterBounds(geometry)
     .filterDate(base_start_date, base_end_date)
-    .filter(ee.Filter.eq('orbitProperties_pass', 'DESCENDING'))
+    .filter(ee.Filter.inList('orbitProperties_pass', orbit_passes))
     .filter(ee.Filter.eq('resolution_meters', 10))
     .filter(ee.Filter.eq('instrumentMode', 'IW'))
     .filter(ee.Filter.listContains(
@@ -173,9 +237,20 @@ else:
     base_count = base_collection.size().getInfo()
     print(f"Imagens encontradas para período de base (ano {previous_year}): {base_count}")
 
+    # Corrige o VV de cada cena pela base da sua trilha (no servidor, sem chamadas extras)
+    if harmonize_passes and base_count > 0:
+        s1_collection = s1_tracks.harmonize_tracks(s1_collection, base_collection)
+
+    # Aplica  a todas as imagens
+    flood_collection = s1_collection.map(calculate_flood_s1)
+
     # Cria mapas individuais para cada imagem
     maps_list = []
 
+    # Imagens e parâmetros de visualização por data (para o datacube)
+    cube_images = []
+    stretches = {}
+
     # Processa imagem de base se encontrada
     if base_count > 0:
         # Aplica máscara de nuvens em todas as imagens
@@ -217,20 +292,22 @@ else:
         )
 
 
-        # Cria mapa da imagem de base
-        base_map = geemap.Map(
-            toolbar_control=False,
-            draw_control=False,
-            measure_control=False,
-            fullscreen_control=False,
-            attribution_control=False
-        )
+        base_map = None
+        if display_mode == 'interactive':
+            # Cria mapa da imagem de base
+            base_map = geemap.Map(
+                toolbar_control=False,
+                draw_control=False,
+                measure_control=False,
+                fullscreen_control=False,
+                attribution_control=False
+            )
 
-        base_map.addLayer(geometry, {'color': 'blue', 'fillColor': '00000000', 'weight': 2}, 'Área de interesse')
-        base_map.addLayer(rgb_image, {}, 'VV (Radar)')
-        base_map.addLayer(base_flooded_area, {}, 'Áreas inundadas')
-        base_map.centerObject(geometry, 12)
-        base_map.addLayerControl()
+            base_map.addLayer(geometry, {'color': 'blue', 'fillColor': '00000000', 'weight': 2}, 'Área de interesse')
+            add_cached_layer(base_map, rgb_image, {}, 'VV (Radar)', bounds=bounds)
+            add_cached_layer(base_map, base_flooded_area, {}, 'Áreas inundadas', bounds=bounds)
+            base_map.centerObject(geometry, 12)
+            base_map.addLayerControl()
 
         # Gera nome de arquivo para imagem de base (usa o ano como data)
         base_date_for_filename = f"{previous_year}0101"  # Formato YYYYMMDD para o nome do arquivo
@@ -242,32 +319,32 @@ else:
         maps_list.append({
             'map': base_map,
             'date': f"{base_date_str}",
-            'filename': base_filename
+            'filename': base_filename,
+            'rgb': rgb_image,
+            'flood': base_flooded_area,
+            'mask': base_image.select('FLOOD')
         })
         print(f"  Imagem de base adicionada ao primeiro painel")
     else:
         print(f"  Aviso: Nenhuma imagem encontrada para o período de base")
 
+    instrumentation.set_stage('stretch')
+    # Mosaicos diários montados no servidor (uma expressão para todas as datas)
+    daily_collection = daily_mosaics(flood_collection, [d[0] for d in unique_dates])
     for date, idx in unique_dates:
         # Filtra TODAS as imagens da data específica (não apenas por system:index)
         date_start = f"{date}T00:00:00"
         date_end = f"{date}T23:59:59"
         date_collection = flood_collection.filterDate(date_start, date_end)
+        # Cena original da data (preserva a grade nativa para exportação)
+        reference_scene = date_collection.first()
 
-        # Verifica quantas cenas existem para esta data
-        scene_count = date_collection.size().getInfo()
+        # Nº de cenas da data (já conhecido pelo inventário, sem nova chamada ao servidor)
+        scene_count = dates_list.count(date)
         print(f"  Data {date}: {scene_count} cena(s) encontrada(s)")
 
-        # Processa as imagens baseado no número de cenas
-        if scene_count > 1:
-            # Múltiplas cenas: faz mosaico para combinar todas
-            image = date_collection.mosaic()#.clip(geometry)
-        elif scene_count == 1:
-            # Uma única cena: usa ela diretamente
-            image = date_collection.first()#.clip(geometry)
-        else:
-            print(f"  Aviso: Nenhuma cena encontrada para {date}, pulando...")
-            continue
+        # Mosaico do dia (uma ou mais cenas) da coleção diária
+        image = image_for_date(daily_collection, date)
 
         # Calcula parâmetros de visualização automaticamente
         vv_vis = image.visualize(
@@ -290,35 +367,46 @@ else:
 
 
 
-        # Cria mapa individual com configurações limpas
-        Map = geemap.Map(
-            toolbar_control=False,  # Remove toolbar
-            draw_control=False,     # Remove controles de desenho
-            measure_control=False,   # Remove controles de medida
-            fullscreen_control=False, # Remove controle de tela cheia
-            attribution_control=False # Remove créditos do ipyleaflet
-        )
-        vv_vis = image.visualize(
-          bands=['VV'],
-          min=-25,
-          max=0
-        )
+        Map = None
+        if display_mode == 'interactive':
+            # Cria mapa individual com configurações limpas
+            Map = geemap.Map(
+                toolbar_control=False,  # Remove toolbar
+                draw_control=False,     # Remove controles de desenho
+                measure_control=False,   # Remove controles de medida
+                fullscreen_control=False, # Remove controle de tela cheia
+                attribution_control=False # Remove créditos do ipyleaflet
+            )
+            vv_vis = image.visualize(
+              bands=['VV'],
+              min=-25,
+              max=0
+            )
 
-        Map.addLayer(geometry, {'color': 'blue', 'fillColor': '00000000', 'weight': 2}, 'Área de interesse')
-        Map.addLayer(vv_vis, {}, 'VV (Radar)')
-        Map.addLayer(flooded_area, {}, 'Áreas inundadas')
-        Map.centerObject(geometry,12)
+            Map.addLayer(geometry, {'color': 'blue', 'fillColor': '00000000', 'weight': 2}, 'Área de interesse')
+            add_cached_layer(Map, vv_vis, {}, 'VV (Radar)', bounds=bounds)
+            add_cached_layer(Map, flooded_area, {}, 'Áreas inundadas', bounds=bounds)
+            Map.centerObject(geometry,12)
 
-        # Adiciona controle de layers (para habilitar/desabilitar)
-        Map.addLayerControl()
+            # Adiciona controle de layers (para habilitar/desabilitar)
+            Map.addLayerControl()
 
         # Armazena mapa, data e nome do arquivo juntos
         maps_list.append({
             'map': Map,
             'date': date,
-            'filename': filenames[date]
+            'filename': filenames[date],
+            'rgb': vv_vis,
+            'flood': flooded_area,
+            'mask': image.select('FLOOD')
         })
 
+        # Guarda imagem e stretch da data para o datacube
+        cube_images.append((date, image))
+        stretches[date] = vis_params
+
+    instrumentation.set_stage('render')
+
     # Exibe informações
     print(f"\nSensor: {sensor_name}")
     print(f"Período: {start_date} a {end_date}")
@@ -328,8 +416,52 @@ else:
     else:
         print(f"Total de imagens processadas: {total_images} ({len(unique_dates)} do período de análise)")
 
+    if make_timelapse:
+        # Um único timelapse substitui os N painéis (uma requisição de vídeo no servidor)
+        os.makedirs(output_dir, exist_ok=True)
+        timelapse_name = f"{cidade_uf.replace(' ', '_')}_{sensor_name.replace('/', '_')}_timelapse.{timelapse_format}"
+        timelapse_file = render_timelapse(
+            maps_list,
+            geometry,
+            os.path.join(output_dir, timelapse_name),
+            header=f"{cidade_uf} - {sensor_name}",
+            dimensions=thumbnail_size
+        )
+        print(f"Timelapse gravado em: {timelapse_file}")
+
+    if display_mode == 'thumbnails':
+        # Renderiza todas as miniaturas (base + datas) em paralelo, com cache por expressão
+        thumbnails = render_thumbnails(
+            maps_list,
+            geometry,
+            cache_dir=os.path.join(output_dir, 'miniaturas'),
+            dimensions=thumbnail_size
+        )
+        for thumb in thumbnails:
+            print(f"  {thumb['date']}: {thumb['png']}")
+    elif display_mode == 'report':
+        # Relatório HTML autocontido, atualizado à medida que os painéis ficam prontos
+        os.makedirs(output_dir, exist_ok=True)
+        report_name = f"{cidade_uf.replace(' ', '_')}_{sensor_name.replace('/', '_')}.html"
+        report_file = build_report(
+            maps_list,
+            geometry,
+            os.path.join(output_dir, report_name),
+            header=f"{cidade_uf} - {sensor_name}",
+            scale=NATIVE_GRID_BANDS[sensor_name][1],
+            cache_dir=os.path.join(output_dir, 'miniaturas'),
+            dimensions=thumbnail_size,
+            pdf=report_pdf
+        )
+        print(f"Relatório gravado em: {report_file}")
+    elif display_mode == 'slider':
+        # Um único mapa; as camadas de cada data são criadas só quando selecionada
+        display(time_slider_map(maps_list, geometry, header=f"{cidade_uf} - {sensor_name}", bounds=bounds))
+    elif display_mode == 'lazy':
+        # Grade retornada na hora; cada mapa (e seu stretch) só é criado ao ser aberto
+        display(lazy_map_grid(maps_list, geometry, header=f"{cidade_uf} - {sensor_name}", bounds=bounds))
     # Exibe mapas lado a lado em painéis múltiplos (máximo 2 por linha)
-    if len(maps_list) == 1:
+    elif len(maps_list) == 1:
         # Se houver apenas um mapa
         map_item = maps_list[0]
         map_item['map'].layout.width = '100%'
@@ -408,7 +540,111 @@ else:
         final_box.layout.border = 'none'
         display(final_box)
 
-# Exportar a imagem RGB do período de inundação
+instrumentation.set_stage('datacube')
+
+# Datacube do sensor (time x y x) em Zarr: índice, máscara, base e stretch
+if write_cube and image_count > 0 and cube_images:
+    os.makedirs(output_dir, exist_ok=True)
+    cube = build_datacube(
+        sensor_name,
+        cube_images,
+        region=geometry,
+        reference_image=reference_scene,
+        stretches=stretches,
+        base_image=base_image if base_count > 0 else None,
+        base_stretch={'min': -25, 'max': 0} if base_count > 0 else None
+    )
+    cube_name = f"{cidade_uf.replace(' ', '_')}_{sensor_name.replace('/', '_')}.zarr"
+    write_datacube(cube, os.path.join(output_dir, cube_name))
+
+instrumentation.set_stage('export')
+
+# Produtos da última data (sem imagens no período não há o que exportar)
+if image_count > 0:
+    # Produtos analíticos da última data: máscara uint8 de banda única (1 = água,
+    # 0 = seco, 255 = sem dado) e índice contínuo em int16 escalado
+    flood_mask = analytic_flood_mask(image.select('FLOOD'))
+    index_int16 = scaled_index(image, sensor_name)
+
+    if export_mode == 'local':
+        # Download direto em paralelo para COG local (sem fila do Drive)
+        os.makedirs(output_dir, exist_ok=True)
+        download_image_to_cog(
+            vv_vis,
+            os.path.join(output_dir, f"{filenames[date]}_RGB.tif"),
+            region=geometry,
+            reference_image=reference_scene,
+            sensor=sensor_name,
+            compress=cog_compression,
+            overview_resampling='AVERAGE'
+        )
+        download_image_to_cog(
+            flood_mask,
+            os.path.join(output_dir, f"{filenames[date]}_inundacao.tif"),
+            region=geometry,
+            reference_image=reference_scene,
+            sensor=sensor_name,
+            compress=cog_compression,
+            nodata=MASK_NODATA
+        )
+        download_image_to_cog(
+            index_int16,
+            os.path.join(output_dir, f"{filenames[date]}_indice.tif"),
+            region=geometry,
+            reference_image=reference_scene,
+            sensor=sensor_name,
+            compress=cog_compression,
+            overview_resampling='AVERAGE',
+            nodata=INDEX_NODATA
+        )
+    else:
+        # Exportar a imagem RGB do período de inundação (grade nativa do sensor)
+        task1 = export_image_to_drive(
+            image=vv_vis,                        # A imagem que você quer exportar
+            description='RGB_inundacao',         # Nome do arquivo exportado
+            region=geometry,                     # Região de recorte da exportação
+            reference_image=reference_scene,     # Cena original que define crs/crsTransform
+            sensor=sensor_name,
+            scale=export_scale,                  # None = resolução nativa
+            crs=export_crs,                      # None = projeção nativa
+            resampling=export_resampling
+        )
+
+        # Exportar a máscara de áreas inundadas (uint8, grade nativa, sem interpolação)
+        task2 = export_image_to_drive(
+            image=flood_mask,                    # Máscara analítica de banda única
+            description='areas_inundadas',       # Nome do arquivo exportado
+            region=geometry,                     # Região de recorte da exportação
+            reference_image=reference_scene,     # Cena original que define crs/crsTransform
+            sensor=sensor_name,
+            scale=export_scale,
+            crs=export_crs,
+            nodata=MASK_NODATA
+        )
+
+        # Exportar o índice contínuo (int16 escalado)
+        task3 = export_image_to_drive(
+            image=index_int16,                   # Índice x 10000 (VV em centi-dB)
+            description='indice_agua',           # Nome do arquivo exportado
+            region=geometry,                     # Região de recorte da exportação
+            reference_image=reference_scene,     # Cena original que define crs/crsTransform
+            sensor=sensor_name,
+            scale=export_scale,
+            crs=export_crs,
+            resampling=export_resampling,
+            nodata=INDEX_NODATA
+        )
+
+        # task1.start()
+        # task2.start()
+        # task3.start()
+
+# Métricas de throttling (repetições, erros de cota e limite de concorrência)
+if retry_calls:
+    print(ee_retry.controller.summary())
 
-# task1.start()
-# task2.start()
+# Resumo por etapa e trace JSON da execução
+if instrument:
+    os.makedirs(output_dir, exist_ok=True)
+    trace_name = f"{cidade_uf.replace(' ', '_')}_{sensor_name.replace('/', '_')}_trace.json"
+    instrumentation.report(os.path.join(output_dir, trace_name))
@@ -0,0 +1,63 @@
+from shapely.geometry import Point, shape
+from shapely.strtree import STRtree
+
+
+# Índice espacial (STRtree) das AOIs monitoradas: para cada footprint de cena,
+# devolve só as AOIs que ele intersecta, em O(log n), com a fração coberta.
+
+
+def aoi_shape(aoi):
+    """
+    Geometria shapely da AOI, como nos scripts: envelope de Point(lon, lat).buffer(buffer_degrees).
+
+    Parâmetros:
+    - aoi: Dicionário com 'lon', 'lat' e 'buffer_degrees'
+    """
+    return Point(aoi['lon'], aoi['lat']).buffer(aoi['buffer_degrees']).envelope
+
+
+class AOIIndex:
+    """
+    STRtree sobre as geometrias das AOIs.
+
+    Uso:
+        index = AOIIndex(aois)
+        for aoi, coverage in index.query(scene_footprint_geojson):
+            ...
+    """
+
+    def __init__(self, aois):
+        self.aois = list(aois)
+        self.geometries = [aoi_shape(aoi) for aoi in self.aois]
+        self._tree = STRtree(self.geometries)
+
+    def __len__(self):
+        return len(self.aois)
+
+    def bounds(self):
+        """Envelope (minx, miny, maxx, maxy) de todas as AOIs (None se vazio)."""
+        if not self.geometries:
+            return None
+        boxes = [g.bounds for g in self.geometries]
+        return (
+            min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes)
+        )
+
+    def query(self, footprint):
+        """
+        AOIs intersectadas por um footprint.
+
+        Parâmetros:
+        - footprint: GeoJSON (dicionário) ou geometria shapely da cena
+
+        Retorna:
+        - Lista de (aoi, fração da área da AOI coberta pela cena), na ordem das AOIs
+        """
+        geometry = shape(footprint) if isinstance(footprint, dict) else footprint
+        result = []
+        for i in sorted(self._tree.query(geometry, predicate='intersects')):
+            aoi_geometry = self.geometries[i]
+            coverage = aoi_geometry.intersection(geometry).area / aoi_geometry.area if aoi_geometry.area else 1.0
+            result.append((self.aois[i], min(1.0, coverage)))
+        return result
@@ -0,0 +1,310 @@
+import argparse
+import json
+import math
+
+import ee
+
+import instrumentation
+from aoi_index import AOIIndex, aoi_shape
+from export_utils import (
+    INDEX_NODATA, MASK_NODATA, analytic_flood_mask, export_grid_params, export_image_to_drive, scaled_index
+)
+from mosaic_utils import image_for_date
+from pipeline import (
+    AOI_STYLE, FLOOD_VIS, SENSOR_FLOWS, aoi_bounds, aoi_geometry, analysis_window, baseline, build_rgb,
+    daily_composites, daily_stretches, harmonize, inventory
+)
+
+
+# Planejamento de lotes de AOIs: AOIs que se sobrepõem (ex.: municípios
+# vizinhos com buffer_degrees=0.2) são agrupadas e cada produto do sensor
+# (mosaico da data, stretch por percentis, máscara de água, map IDs) é
+# calculado uma única vez sobre o envelope do grupo. Os painéis das AOIs usam
+# as mesmas imagens e map IDs, limitados pelo envelope da AOI no mapa; as
+# exportações continuam por AOI (a região define o recorte e o arquivo).
+
+
+def _area_km2(bounds):
+    """Área aproximada (km²) de um envelope em graus, sem chamada ao servidor."""
+    minx, miny, maxx, maxy = bounds
+    width = (maxx - minx) * 111.320 * math.cos(math.radians((miny + maxy) / 2))
+    return abs(width * (maxy - miny) * 110.574)
+
+
+def _merge_bounds(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def plan_groups(aois, max_group_degrees=1.0):
+    """
+    Agrupa AOIs sobrepostas.
+
+    Duas AOIs (ou grupos) só são unidas se processar o envelope comum custar
+    menos área que processá-las separadamente e se o envelope não passar de
+    max_group_degrees de lado; assim cadeias de vizinhos não viram um
+    retângulo enorme com área vazia.
+
+    Parâmetros:
+    - aois: Lista de dicionários com 'name', 'lon', 'lat' e 'buffer_degrees'
+    - max_group_degrees: Lado máximo do envelope de um grupo em graus
+
+    Retorna:
+    - Lista de grupos (listas de AOIs), na ordem da primeira AOI de cada grupo
+    """
+    aois = list(aois)
+    index = AOIIndex(aois)
+    position = {id(aoi): i for i, aoi in enumerate(aois)}
+    parent = list(range(len(aois)))
+    bounds = [aoi_shape(aoi).bounds for aoi in aois]
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, aoi in enumerate(aois):
+        for neighbour, coverage in index.query(aoi_shape(aoi)):
+            j = position[id(neighbour)]
+            ri, rj = find(i), find(j)
+            if ri == rj or coverage <= 0:
+                continue
+            merged = _merge_bounds(bounds[ri], bounds[rj])
+            if merged[2] - merged[0] > max_group_degrees or merged[3] - merged[1] > max_group_degrees:
+                continue
+            if _area_km2(merged) > _area_km2(bounds[ri]) + _area_km2(bounds[rj]):
+                continue
+            parent[rj] = ri
+            bounds[ri] = merged
+
+    groups = {}
+    for i, aoi in enumerate(aois):
+        groups.setdefault(find(i), []).append(aoi)
+    return list(groups.values())
+
+
+def run_group(sensor, group, reference_date, dias_anteriores=20, dias_posteriores=20,
+              render=True, export=True, scene_index=None):
+    """
+    Executa o fluxo de um sensor uma vez para um grupo de AOIs.
+
+    Inventário, base, mosaicos, stretch e map IDs são calculados sobre o
+    envelope do grupo (o stretch passa a ser comum às AOIs vizinhas); cada AOI
+    recebe os painéis do grupo (mesmos map IDs, sem recorte: o mapa é limitado
+    por 'bounds') e as próprias exportações, com a grade nativa obtida uma vez
+    por data. Com scene_index, as datas de cada AOI são só as das cenas que a
+    intersectam (consulta local).
+
+    Parâmetros:
+    - sensor: Chave de pipeline.SENSOR_FLOWS
+    - group: Lista de AOIs (ver plan_groups)
+    - reference_date, dias_anteriores, dias_posteriores: Período de análise
+    - render, export: Como em pipeline.run_flow
+    - scene_index: scene_index.SceneIndex (opcional)
+
+    Retorna:
+    - Dicionário com 'bounds', 'dates', 'products' (calculados no grupo) e
+      'aois' (nome -> dicionário com 'bounds', 'dates', 'panels' e 'tasks')
+    """
+    flow = SENSOR_FLOWS[sensor]
+    bounds = aoi_shape(group[0]).bounds
+    for aoi in group[1:]:
+        bounds = _merge_bounds(bounds, aoi_shape(aoi).bounds)
+    geometry = ee.Geometry.Rectangle(list(bounds))
+    start_date, end_date = analysis_window(reference_date, dias_anteriores, dias_posteriores)
+    result = {'sensor': sensor, 'bounds': bounds, 'dates': [], 'products': 0, 'aois': {}}
+
+    instrumentation.set_stage('inventory')
+    collection, image_count, unique_dates, scene_counts = inventory(
+        flow, geometry, start_date, end_date, scene_index, bounds
+    )
+    result['dates'] = [date for date, _ in unique_dates]
+
+    aoi_dates = {}
+    for aoi in group:
+        if scene_index is not None and image_count:
+            dates_list, _ = scene_index.inventory(
+                flow.get('collections', flow['collection']), aoi_bounds(aoi['lon'], aoi['lat'], aoi['buffer_degrees']),
+                start_date, end_date, refresh=False, **flow['index_query']
+            )
+            aoi_dates[aoi['name']] = set(dates_list)
+        else:
+            aoi_dates[aoi['name']] = set(result['dates'])
+    if image_count == 0:
+        result['aois'] = {
+            aoi['name']: {'bounds': aoi_shape(aoi).bounds, 'dates': [], 'panels': [], 'tasks': []} for aoi in group
+        }
+        return result
+
+    instrumentation.set_stage('baseline')
+    panels = []
+    base_image, base_date_str = baseline(flow, geometry, reference_date)
+    if base_image is not None:
+        collection = harmonize(flow, collection, geometry, reference_date)
+        base_rgb, base_vis = build_rgb(flow, base_image, geometry)
+        panels.append({
+            'date': base_date_str,
+            'base': True,
+            'rgb': base_rgb,
+            'vis_params': base_vis,
+            'flood': flow['water'](base_image).selfMask().visualize(**FLOOD_VIS)
+        })
+
+    instrumentation.set_stage('dates')
+    # Mosaicos diários do grupo em uma única expressão
+    daily = daily_composites(flow, collection, [date for date, _ in unique_dates])
+    images = [
+        (date, image_for_date(daily, date),
+         collection.filterDate(f"{date}T00:00:00", f"{date}T23:59:59").first())
+        for date, _ in unique_dates
+    ]
+
+    instrumentation.set_stage('stretch')
+    stretches = daily_stretches(flow, daily, geometry)
+    for date, image, reference_scene in images:
+        rgb_image, vis_params = build_rgb(flow, image, geometry, stretches.get(date))
+        water = flow['water'](image)
+        panels.append({
+            'date': date,
+            'base': False,
+            'image': image,
+            'water': water,
+            'reference_scene': reference_scene,
+            'rgb': rgb_image,
+            'vis_params': vis_params,
+            'flood': water.selfMask().visualize(**FLOOD_VIS)
+        })
+    result['products'] = len(panels)
+
+    if render:
+        instrumentation.set_stage('render')
+        # Um map ID por camada do grupo; os mapas das AOIs usam as mesmas camadas
+        aoi_layer = ee.FeatureCollection([
+            ee.Feature(aoi_geometry(aoi['lon'], aoi['lat'], aoi['buffer_degrees'])) for aoi in group
+        ]).style(**AOI_STYLE)
+        aoi_layer.getMapId({})
+        for panel in panels:
+            panel['rgb_map'] = panel['rgb'].getMapId({})
+            panel['flood_map'] = panel['flood'].getMapId({})
+
+    grids = {}  # data -> grade nativa da cena de referência (uma consulta por data)
+    for aoi in group:
+        aoi_geom = aoi_geometry(aoi['lon'], aoi['lat'], aoi['buffer_degrees'])
+        own = [p for p in panels if p['base'] or p['date'] in aoi_dates[aoi['name']]]
+        aoi_result = {
+            'bounds': aoi_shape(aoi).bounds,
+            'dates': [p['date'] for p in own if not p['base']],
+            'panels': [dict(p) for p in own],
+            'tasks': []
+        }
+        last = next((p for p in reversed(own) if not p['base']), None)
+        if export and last is not None:
+            instrumentation.set_stage('export')
+            if last['date'] not in grids:
+                grids[last['date']] = export_grid_params(last['reference_scene'], flow['collection'])
+            grid = grids[last['date']]
+            aoi_result['tasks'] = [
+                export_image_to_drive(last['rgb'], f"RGB_inundacao_{aoi['name']}", aoi_geom,
+                                      last['reference_scene'], flow['collection'], grid=grid),
+                export_image_to_drive(analytic_flood_mask(last['water']), f"areas_inundadas_{aoi['name']}",
+                                      aoi_geom, last['reference_scene'], flow['collection'], nodata=MASK_NODATA,
+                                      grid=grid),
+                export_image_to_drive(scaled_index(last['image'], flow['collection']), f"indice_agua_{aoi['name']}",
+                                      aoi_geom, last['reference_scene'], flow['collection'], nodata=INDEX_NODATA,
+                                      grid=grid)
+            ]
+        result['aois'][aoi['name']] = aoi_result
+    return result
+
+
+def savings(group_results, groups):
+    """
+    Economia da deduplicação em relação a processar cada AOI separadamente.
+
+    Produtos são painéis (base + uma data cada): cada um custa um mosaico, um
+    stretch (reduceRegion) e dois map IDs. Sem agrupamento, cada AOI calcularia
+    os seus; a área é a processada pelas reduções de todos os produtos.
+
+    Retorna:
+    - Dicionário com 'aois', 'groups', 'products_naive', 'products_shared',
+      'area_naive_km2', 'area_shared_km2' e 'saved_fraction'
+    """
+    products_naive = products_shared = 0
+    area_naive = area_shared = 0.0
+    for result, group in zip(group_results, groups):
+        products_shared += result['products']
+        area_shared += result['products'] * _area_km2(result['bounds'])
+        for aoi in group:
+            panels = len(result['aois'][aoi['name']]['panels'])
+            products_naive += panels
+            area_naive += panels * _area_km2(aoi_shape(aoi).bounds)
+    return {
+        'aois': sum(len(group) for group in groups),
+        'groups': len(groups),
+        'products_naive': products_naive,
+        'products_shared': products_shared,
+        'area_naive_km2': round(area_naive, 1),
+        'area_shared_km2': round(area_shared, 1),
+        'saved_fraction': round(1 - products_shared / products_naive, 4) if products_naive else 0.0
+    }
+
+
+def format_savings(report):
+    """Resumo de uma linha da economia."""
+    return (
+        f"{report['aois']} AOIs em {report['groups']} grupo(s): "
+        f"{report['products_shared']} produtos calculados em vez de {report['products_naive']} "
+        f"({report['saved_fraction']:.0%} a menos); área processada "
+        f"{report['area_shared_km2']:.0f} km² em vez de {report['area_naive_km2']:.0f} km²"
+    )
+
+
+def run_batch(sensor, aois, reference_date, max_group_degrees=1.0, **kwargs):
+    """
+    Planeja os grupos e executa o fluxo do sensor para todas as AOIs.
+
+    Parâmetros:
+    - sensor: Chave de pipeline.SENSOR_FLOWS
+    - aois: Lista de dicionários com 'name', 'lon', 'lat' e 'buffer_degrees'
+    - reference_date: Data de referência (YYYY-MM-DD)
+    - max_group_degrees: Ver plan_groups
+    - kwargs: Repassados a run_group
+
+    Retorna:
+    - Dicionário com 'groups' (resultados de run_group), 'aois' (nome -> resultado) e 'savings'
+    """
+    groups = plan_groups(aois, max_group_degrees)
+    results = [run_group(sensor, group, reference_date, **kwargs) for group in groups]
+    return {
+        'groups': results,
+        'aois': {name: r for result in results for name, r in result['aois'].items()},
+        'savings': savings(results, groups)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fluxo de inundação em lote com AOIs sobrepostas agrupadas')
+    parser.add_argument('aois', help='arquivo JSON com a lista de AOIs (name, lon, lat, buffer_degrees)')
+    parser.add_argument('sensor', choices=list(SENSOR_FLOWS))
+    parser.add_argument('reference_date', help='data de referência (YYYY-MM-DD)')
+    parser.add_argument('--before', type=int, default=20, help='dias antes da data de referência')
+    parser.add_argument('--after', type=int, default=20, help='dias depois da data de referência')
+    parser.add_argument('--max-group-degrees', type=float, default=1.0)
+    parser.add_argument('--no-export', action='store_true')
+    parser.add_argument('--project', default=None, help='projeto do Earth Engine')
+    args = parser.parse_args(argv)
+
+    with open(args.aois, encoding='utf-8') as f:
+        aois = json.load(f)
+
+    ee.Initialize(project=args.project)
+    batch = run_batch(args.sensor, aois, args.reference_date, args.max_group_degrees,
+                      dias_anteriores=args.before, dias_posteriores=args.after,
+                      render=False, export=not args.no_export)
+    for result in batch['groups']:
+        print(f"Grupo {', '.join(result['aois'])}: {len(result['dates'])} data(s)")
+    print(format_savings(batch['savings']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime
+
+from script_runner import SCRIPT_FLOWS, read_settings, run_script
+
+# Benchmark offline dos seis scripts dos sensores contra o backend local
+# (ee_standin), com latência simulada. Cada script roda como está, sem
+# interface (script_runner), e cada caso mede tempo de parede, nº de chamadas
+# ao servidor, pico de memória e bytes transferidos; os resultados são
+# gravados em JSON Lines para comparação entre versões.
+
+# Pasta padrão dos resultados (um arquivo .jsonl por execução da suíte)
+RESULTS_DIR = 'benchmarks'
+
+# Tolerâncias da comparação com a execução de referência
+WALL_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.25
+
+
+def aoi_centers(count, center, spacing=0.5):
+    """Centros de 'count' AOIs em grade ao redor de 'center' (espaçamento em graus)."""
+    side = max(1, int(count ** 0.5 + 0.999))
+    lon, lat = center
+    return [
+        (lon + (i % side) * spacing, lat + (i // side) * spacing)
+        for i in range(count)
+    ]
+
+
+def run_case(script, window_days, buffer_degrees, aoi_count, latency=0.05, pixel_latency=0.0):
+    """
+    Executa um caso do benchmark (um script, uma janela, um buffer, N AOIs).
+
+    Cada AOI é uma execução do script em um processo separado (script_runner),
+    ao redor da coordenada configurada no próprio script.
+
+    Parâmetros:
+    - script: Chave de script_runner.SCRIPT_FLOWS (ex.: 'Sentinel_2.py')
+    - window_days: Dias antes e depois da data de referência (dias_anteriores = dias_posteriores)
+    - buffer_degrees: Buffer da AOI em graus
+    - aoi_count: Número de AOIs processadas em sequência
+    - latency: Latência simulada por chamada ao servidor em segundos
+    - pixel_latency: Custo simulado por pixel reduzido em segundos
+
+    Retorna:
+    - Dicionário com parâmetros e métricas do caso
+    """
+    settings = read_settings(script, ['lon', 'lat'])
+    row = {
+        'script': script,
+        'window_days': window_days,
+        'buffer_degrees': buffer_degrees,
+        'aoi_count': aoi_count,
+        'latency': latency,
+        'dates': 0,
+        'wall_s': 0.0,
+        'rpc_count': 0,
+        'bytes': 0,
+        'peak_memory_bytes': 0,
+        'stages': {}
+    }
+    for lon, lat in aoi_centers(aoi_count, (settings['lon'], settings['lat'])):
+        result = run_script(
+            script,
+            {
+                'lon': lon,
+                'lat': lat,
+                'dias_anteriores': window_days,
+                'dias_posteriores': window_days,
+                'buffer_degrees': buffer_degrees
+            },
+            latency=latency,
+            pixel_latency=pixel_latency
+        )
+        row['dates'] += len(result['dates'])
+        row['wall_s'] += result['wall_s']
+        row['rpc_count'] += result['rpc_count']
+        row['bytes'] += result['bytes']
+        row['peak_memory_bytes'] = max(row['peak_memory_bytes'], result['peak_memory_bytes'])
+        for stage in result['stages']:
+            totals = row['stages'].setdefault(stage['stage'], {'rpc_count': 0, 'wall_s': 0.0})
+            totals['rpc_count'] += stage['rpc_count']
+            totals['wall_s'] += stage['wall_s']
+
+    row['wall_s'] = round(row['wall_s'], 4)
+    for totals in row['stages'].values():
+        totals['wall_s'] = round(totals['wall_s'], 4)
+    return row
+
+
+def run_suite(scripts=None, windows=(10, 20, 40), buffers=(0.05, 0.1, 0.2), aoi_counts=(1, 4),
+              latency=0.05, pixel_latency=0.0, verbose=True):
+    """
+    Varre scripts x janelas x buffers x nº de AOIs.
+
+    Retorna:
+    - Lista de resultados (ver run_case)
+    """
+    scripts = scripts or list(SCRIPT_FLOWS)
+    results = []
+    for script, window, buffer_degrees, aoi_count in itertools.product(scripts, windows, buffers, aoi_counts):
+        row = run_case(script, window, buffer_degrees, aoi_count, latency=latency, pixel_latency=pixel_latency)
+        results.append(row)
+        if verbose:
+            print(
+                f"{script:<15} janela={window:>3}d buffer={buffer_degrees:<5} AOIs={aoi_count:<3}"
+                f" {row['wall_s']:>8.2f}s {row['rpc_count']:>5} RPCs"
+                f" {row['bytes']:>9} B {row['peak_memory_bytes'] / 1e6:>7.2f} MB"
+            )
+    return results
+
+
+def case_key(row):
+    """Identifica um caso para comparação entre execuções."""
+    return (row.get('script'), row['window_days'], row['buffer_degrees'], row['aoi_count'], row['latency'])
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecida'
+
+
+def save_results(results, results_dir=RESULTS_DIR):
+    """
+    Grava os resultados em <results_dir>/<data>_<revisão>.jsonl (um caso por linha).
+
+    Retorna:
+    - Caminho do arquivo gravado
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    revision = _git_revision()
+    created = datetime.now().strftime('%Y%m%dT%H%M%S')
+    filename = os.path.join(results_dir, f"{created}_{revision}.jsonl")
+    meta = {'revision': revision, 'created': created, 'python': platform.python_version()}
+    with open(filename, 'w', encoding='utf-8') as f:
+        for row in results:
+            f.write(json.dumps(dict(row, **meta)) + '\n')
+    return filename
+
+
+def load_results(filename):
+    """Lê um arquivo de resultados .jsonl."""
+    with open(filename, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def latest_results(results_dir=RESULTS_DIR, exclude=None):
+    """Arquivo de resultados mais recente (opcionalmente ignorando 'exclude')."""
+    if not os.path.isdir(results_dir):
+        return None
+    files = sorted(
+        os.path.join(results_dir, name) for name in os.listdir(results_dir)
+        if name.endswith('.jsonl')
+    )
+    files = [f for f in files if exclude is None or os.path.abspath(f) != os.path.abspath(exclude)]
+    return files[-1] if files else None
+
+
+def compare(results, baseline, wall_tolerance=WALL_TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    """
+    Compara os resultados com uma execução de referência.
+
+    Mais chamadas ao servidor ou mais bytes são sempre regressão (o backend é
+    determinístico); tempo e memória usam as tolerâncias relativas.
+
+    Retorna:
+    - Lista de mensagens de regressão (vazia se não houver)
+    """
+    previous = {case_key(row): row for row in baseline}
+    regressions = []
+    for row in results:
+        old = previous.get(case_key(row))
+        if old is None:
+            continue
+        label = f"{row['script']} janela={row['window_days']}d buffer={row['buffer_degrees']} AOIs={row['aoi_count']}"
+        if row['rpc_count'] > old['rpc_count']:
+            regressions.append(f"{label}: RPCs {old['rpc_count']} -> {row['rpc_count']}")
+        if row['bytes'] > old['bytes']:
+            regressions.append(f"{label}: bytes {old['bytes']} -> {row['bytes']}")
+        if row['wall_s'] > old['wall_s'] * (1 + wall_tolerance):
+            regressions.append(f"{label}: tempo {old['wall_s']:.2f}s -> {row['wall_s']:.2f}s")
+        if row['peak_memory_bytes'] > old['peak_memory_bytes'] * (1 + memory_tolerance):
+            regressions.append(
+                f"{label}: memória {old['peak_memory_bytes']} -> {row['peak_memory_bytes']} bytes"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark offline dos scripts de inundação')
+    parser.add_argument('--scripts', nargs='+', choices=list(SCRIPT_FLOWS), default=None)
+    parser.add_argument('--windows', nargs='+', type=int, default=[10, 20, 40],
+                        help='dias_anteriores/dias_posteriores')
+    parser.add_argument('--buffers', nargs='+', type=float, default=[0.05, 0.1, 0.2],
+                        help='buffer_degrees')
+    parser.add_argument('--aois', nargs='+', type=int, default=[1, 4], help='número de AOIs')
+    parser.add_argument('--latency', type=float, default=0.05, help='latência por chamada (s)')
+    parser.add_argument('--pixel-latency', type=float, default=0.0, help='custo por pixel reduzido (s)')
+    parser.add_argument('--results-dir', default=RESULTS_DIR)
+    parser.add_argument('--baseline', default=None,
+                        help='arquivo .jsonl de referência (padrão: o mais recente em --results-dir)')
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.scripts, args.windows, args.buffers, args.aois,
+                        latency=args.latency, pixel_latency=args.pixel_latency)
+    filename = save_results(results, args.results_dir)
+    print(f"Resultados gravados em: {filename}")
+
+    baseline_file = args.baseline or latest_results(args.results_dir, exclude=filename)
+    if baseline_file is None:
+        return 0
+    regressions = compare(results, load_results(baseline_file))
+    if regressions:
+        print(f"Regressões em relação a {baseline_file}:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print(f"Sem regressões em relação a {baseline_file}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,105 @@
+import ee
+
+from export_utils import NATIVE_GRID_BANDS
+
+
+# Pré-filtro de nuvens na AOI: CLOUDY_PIXEL_PERCENTAGE e CLOUD_COVER valem
+# para a cena inteira. Aqui a fração sem nuvens é calculada só sobre a AOI,
+# para todas as cenas candidatas em uma única chamada ao servidor, e só as
+# cenas utilizáveis seguem para o stretch e a renderização.
+
+# Fração mínima da AOI sem nuvens (e coberta pela cena) para usar a cena
+MIN_CLEAR_FRACTION = 0.6
+
+# Com o pré-filtro, o limite por cena é relaxado: uma cena 40% nublada pode
+# estar limpa sobre a AOI
+SCENE_CLOUD_MAX = 80
+
+# Resolução mínima da redução (m): a fração não precisa da grade nativa
+PREFILTER_SCALE = 60
+
+# Classes do SCL do Sentinel-2 que não são superfície utilizável:
+# 3 sombra de nuvem, 8 e 9 nuvem (média/alta probabilidade), 10 cirrus
+S2_SCL_CLOUD_CLASSES = (3, 8, 9, 10)
+
+# Bits do QA_PIXEL do Landsat Collection 2: 1 nuvem dilatada, 2 cirrus,
+# 3 nuvem, 4 sombra de nuvem
+LANDSAT_QA_CLOUD_BITS = (1, 2, 3, 4)
+
+
+def s2_clear(image):
+    """Pixels sem nuvens do Sentinel-2 (MSK_CLDPRB <= 20, como em Sentinel_2.py, e SCL fora das classes de nuvem)."""
+    scl = image.select('SCL')
+    clear = image.select('MSK_CLDPRB').lte(20)
+    for value in S2_SCL_CLOUD_CLASSES:
+        clear = clear.And(scl.neq(value))
+    return clear
+
+
+def landsat_clear(image):
+    """Pixels sem nuvens do Landsat (bits de nuvem, cirrus e sombra do QA_PIXEL zerados)."""
+    mask = sum(1 << bit for bit in LANDSAT_QA_CLOUD_BITS)
+    return image.select('QA_PIXEL').bitwiseAnd(mask).eq(0)
+
+
+# Máscara de pixels sem nuvens de cada coleção óptica
+CLEAR_MASKS = {
+    'COPERNICUS/S2_SR_HARMONIZED': s2_clear,
+    'LANDSAT/LC08/C02/T1_L2': landsat_clear,
+    'LANDSAT/LT05/C02/T1_L2': landsat_clear,
+}
+
+
+def clear_fractions(collection, collection_id, geometry, scale=None):
+    """
+    Fração da AOI sem nuvens em cada cena, em uma única chamada ao servidor.
+
+    Pixels fora da cena contam como não utilizáveis (a máscara é preenchida
+    com 0), então a fração também reflete a cobertura da AOI pela cena.
+
+    Parâmetros:
+    - collection: Coleção já filtrada (bandas de nuvem originais)
+    - collection_id: ID da coleção (chave de CLEAR_MASKS)
+    - geometry: Geometria da AOI
+    - scale: Resolução da redução em metros (padrão: maior entre a nativa e PREFILTER_SCALE)
+
+    Retorna:
+    - Dicionário system:index -> fração sem nuvens (0 a 1)
+    """
+    clear_mask = CLEAR_MASKS[collection_id]
+    scale = scale or max(NATIVE_GRID_BANDS[collection_id][1], PREFILTER_SCALE)
+
+    def get_clear_info(image):
+        fraction = clear_mask(image).unmask(0).rename('clear').reduceRegion(
+            reducer=ee.Reducer.mean(),
+            geometry=geometry,
+            scale=scale,
+            maxPixels=1e9
+        ).get('clear')
+        return ee.Feature(None, {'system:index': image.get('system:index'), 'clear': fraction})
+
+    clear_info = collection.map(get_clear_info)
+    info = ee.Dictionary({
+        'system:index': clear_info.aggregate_array('system:index'),
+        'clear': clear_info.aggregate_array('clear')
+    }).getInfo()
+    return dict(zip(info['system:index'], info['clear']))
+
+
+def usable_scenes(dates_list, indices_list, fractions, min_clear=MIN_CLEAR_FRACTION):
+    """
+    Remove do inventário as cenas abaixo de min_clear.
+
+    Retorna:
+    - Tupla (dates_list, indices_list) só com as cenas utilizáveis
+    """
+    kept = [
+        (date, idx) for date, idx in zip(dates_list, indices_list)
+        if fractions.get(idx, 0.0) >= min_clear
+    ]
+    return [date for date, _ in kept], [idx for _, idx in kept]
+
+
+def keep_only(collection, indices_list):
+    """Restringe a coleção às cenas do inventário (filtro no servidor, sem chamada)."""
+    return collection.filter(ee.Filter.inList('system:index', indices_list))
@@ -0,0 +1,132 @@
+import dask
+import dask.array as da
+import numpy as np
+import xarray as xr
+
+from download_utils import grid_window
+from export_utils import INDEX_BANDS, INDEX_NODATA, MASK_NODATA, NATIVE_GRID_BANDS, native_grid
+from fetch_utils import band_encoding, fetch_quantized_window, index_flood_mask
+
+
+def _stretch_triplet(values):
+    """Normaliza min/max de visualização (escalar ou lista) para 3 canais."""
+    if isinstance(values, (list, tuple)):
+        return [float(v) for v in values] + [float(values[-1])] * (3 - len(values))
+    return [float(values)] * 3
+
+
+def _fetch_index(image, grid, window, sensor):
+    """Busca o índice quantizado de uma imagem na janela comum e calcula a máscara de água local."""
+    band = INDEX_BANDS[sensor][0]
+    index = fetch_quantized_window(image, grid, *window, sensor, [band])[band]
+    mask = index_flood_mask(index, sensor).astype(np.uint8)
+    mask[index.raw == index.attrs['_FillValue']] = MASK_NODATA
+    return index.raw, mask
+
+
+def _lazy_date(image, grid, window, sensor, chunk_size):
+    """Índice int16 e máscara uint8 de uma data como blocos Dask (buscados só na gravação)."""
+    _, width, height = window
+    fetched = dask.delayed(_fetch_index)(image, grid, window, sensor)
+    index = da.from_delayed(fetched[0], shape=(height, width), dtype=np.int16)
+    mask = da.from_delayed(fetched[1], shape=(height, width), dtype=np.uint8)
+    chunks = (chunk_size, chunk_size)
+    return index.rechunk(chunks), mask.rechunk(chunks)
+
+
+def build_datacube(sensor, dated_images, region, reference_image, stretches=None,
+                   base_image=None, base_stretch=None, chunk_size=512):
+    """
+    Monta o datacube (time x y x) de um sensor com índice, máscara, base e stretch.
+
+    O índice é mantido em int16 com scale_factor/add_offset (convenção CF) e a
+    máscara em uint8 (1 = água, 0 = seco, 255 = sem dado); todas as datas usam
+    a grade nativa da mesma cena de referência, resolvida uma única vez. O
+    dataset é preguiçoso: cada data é um bloco Dask buscado só na gravação
+    (write_datacube), então a memória não cresce com o número de datas.
+
+    Parâmetros:
+    - sensor: Nome da coleção
+    - dated_images: Lista de (data 'YYYY-MM-DD', ee.Image com o índice calculado)
+    - region: Região de interesse
+    - reference_image: Cena original do sensor (define a grade comum)
+    - stretches: Dicionário data -> parâmetros de visualização {'min', 'max'} (opcional)
+    - base_image: Imagem de base (opcional)
+    - base_stretch: Parâmetros de visualização da imagem de base (opcional)
+    - chunk_size: Tamanho dos chunks espaciais (padrão: 512)
+
+    Retorna:
+    - xarray.Dataset em chunks Dask (time=1, y=chunk_size, x=chunk_size)
+    """
+    stretches = stretches or {}
+    band = INDEX_BANDS[sensor][0]
+
+    # Grade e janela comuns a todas as datas (duas chamadas, em vez de duas por data)
+    grid = native_grid(reference_image, NATIVE_GRID_BANDS[sensor][0])
+    window = grid_window(region, grid)
+    transform, width, height = window
+    crs = grid['crs']
+    dates = [_lazy_date(image, grid, window, sensor, chunk_size) for _, image in dated_images]
+
+    x = transform.c + (np.arange(width) + 0.5) * transform.a
+    y = transform.f + (np.arange(height) + 0.5) * transform.e
+    time = np.array([np.datetime64(date) for date, _ in dated_images])
+    encoding = band_encoding(sensor, band)
+    index_attrs = {
+        'long_name': band,
+        'scale_factor': encoding['scale_factor'],
+        'add_offset': encoding['add_offset']
+    }
+    mask_attrs = {'flag_values': [0, 1], 'flag_meanings': 'seco agua'}
+
+    default_stretch = {'min': [np.nan] * 3, 'max': [np.nan] * 3}
+    stretch_min = [_stretch_triplet(stretches.get(date, default_stretch)['min']) for date, _ in dated_images]
+    stretch_max = [_stretch_triplet(stretches.get(date, default_stretch)['max']) for date, _ in dated_images]
+
+    ds = xr.Dataset(
+        {
+            'index': (('time', 'y', 'x'), da.stack([index for index, _ in dates]), index_attrs),
+            'flood_mask': (('time', 'y', 'x'), da.stack([mask for _, mask in dates]), mask_attrs),
+            'stretch_min': (('time', 'channel'), np.array(stretch_min, dtype=np.float32)),
+            'stretch_max': (('time', 'channel'), np.array(stretch_max, dtype=np.float32)),
+        },
+        coords={'time': time, 'y': y, 'x': x, 'channel': ['R', 'G', 'B']},
+        attrs={'sensor': sensor, 'crs': crs, 'transform': list(transform)[:6]}
+    )
+
+    if base_image is not None:
+        base_stretch = base_stretch or default_stretch
+        base_index, base_mask = _lazy_date(base_image, grid, window, sensor, chunk_size)
+        ds['baseline_index'] = (('y', 'x'), base_index, index_attrs)
+        ds['baseline_flood_mask'] = (('y', 'x'), base_mask, mask_attrs)
+        ds['baseline_stretch_min'] = (('channel',), np.array(_stretch_triplet(base_stretch['min']), dtype=np.float32))
+        ds['baseline_stretch_max'] = (('channel',), np.array(_stretch_triplet(base_stretch['max']), dtype=np.float32))
+
+    # nodata declarado via encoding para que o Zarr grave os inteiros sem conversão
+    ds['index'].encoding['_FillValue'] = INDEX_NODATA
+    ds['flood_mask'].encoding['_FillValue'] = MASK_NODATA
+    if base_image is not None:
+        ds['baseline_index'].encoding['_FillValue'] = INDEX_NODATA
+        ds['baseline_flood_mask'].encoding['_FillValue'] = MASK_NODATA
+
+    return ds.chunk({'time': 1, 'y': chunk_size, 'x': chunk_size})
+
+
+def write_datacube(ds, path, max_workers=4):
+    """
+    Grava o datacube em Zarr (um store por sensor), com metadados consolidados.
+
+    As datas são buscadas durante a gravação, até max_workers ao mesmo tempo;
+    cada uma é liberada da memória depois que os seus chunks são gravados.
+
+    Parâmetros:
+    - ds: Dataset retornado por build_datacube
+    - path: Caminho do store .zarr
+    - max_workers: Número de datas buscadas simultaneamente (padrão: 4)
+
+    Retorna:
+    - Caminho do store gravado
+    """
+    with dask.config.set(scheduler='threads', num_workers=max_workers):
+        ds.to_zarr(path, mode='w', consolidated=True)
+    return path
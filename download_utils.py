@@ -0,0 +1,182 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import ee
+import numpy as np
+from rasterio.crs import CRS
+from rasterio.io import MemoryFile
+from rasterio.shutil import copy as rio_copy
+from rasterio.transform import Affine
+
+from export_utils import NATIVE_GRID_BANDS, native_grid
+
+
+def grid_window(region, grid):
+    """
+    Calcula a janela da região alinhada à grade nativa do sensor.
+
+    Parâmetros:
+    - region: Geometria da área de interesse
+    - grid: Dicionário com 'crs' e 'crsTransform' (ver export_utils.native_grid)
+
+    Retorna:
+    - Tupla (Affine da origem alinhada, largura, altura) em pixels
+    """
+    sx, _, x0, _, sy, y0 = grid['crsTransform']
+    ring = region.bounds(1, ee.Projection(grid['crs'])).getInfo()['coordinates'][0]
+    xs = [p[0] for p in ring]
+    ys = [p[1] for p in ring]
+
+    # Alinha a janela às bordas dos pixels da cena original
+    col_min = math.floor((min(xs) - x0) / sx)
+    col_max = math.ceil((max(xs) - x0) / sx)
+    row_min = math.floor((max(ys) - y0) / sy)
+    row_max = math.ceil((min(ys) - y0) / sy)
+
+    transform = Affine(sx, 0, x0 + col_min * sx, 0, sy, y0 + row_min * sy)
+    return transform, col_max - col_min, row_max - row_min
+
+
+def pixel_request(image, grid, transform, col, row, width, height, file_format='GEO_TIFF'):
+    """
+    Monta a requisição computePixels de um bloco da janela alinhada.
+
+    Parâmetros:
+    - image: Imagem a buscar
+    - grid: Dicionário com 'crs' e 'crsTransform' da grade nativa
+    - transform: Affine da origem da janela (ver grid_window)
+    - col, row: Deslocamento do bloco em pixels
+    - width, height: Dimensões do bloco em pixels
+    - file_format: Formato da resposta ('GEO_TIFF' ou 'NPY')
+
+    Retorna:
+    - Dicionário da requisição para ee.data.computePixels
+    """
+    # Projeções sem código EPSG (ex.: sinusoidal do MODIS) vêm como WKT
+    crs_key = 'crsWkt' if '[' in grid['crs'] else 'crsCode'
+    return {
+        'expression': image,
+        'fileFormat': file_format,
+        'grid': {
+            'dimensions': {'width': width, 'height': height},
+            'affineTransform': {
+                'scaleX': transform.a,
+                'shearX': 0,
+                'translateX': transform.c + col * transform.a,
+                'shearY': 0,
+                'scaleY': transform.e,
+                'translateY': transform.f + row * transform.e
+            },
+            crs_key: grid['crs']
+        }
+    }
+
+
+def _fetch_tile(image, grid, transform, col, row, width, height):
+    """Busca um bloco de pixels via computePixels (GeoTIFF) e devolve (bandas, linhas, colunas)."""
+    data = ee.data.computePixels(pixel_request(image, grid, transform, col, row, width, height))
+    with MemoryFile(data) as mem, mem.open() as ds:
+        return ds.read()
+
+
+def tile_layout(width, height, tile_size):
+    """Lista os blocos (coluna, linha, largura, altura) que cobrem a janela."""
+    return [
+        (col, row, min(tile_size, width - col), min(tile_size, height - row))
+        for row in range(0, height, tile_size)
+        for col in range(0, width, tile_size)
+    ]
+
+
+def fetch_region(image, grid, transform, width, height, tile_size=512, max_workers=8):
+    """
+    Busca em paralelo todos os blocos da janela e monta o array completo.
+
+    Parâmetros:
+    - image: Imagem a buscar
+    - grid: Dicionário com 'crs' e 'crsTransform' da grade nativa
+    - transform, width, height: Janela alinhada (ver grid_window)
+    - tile_size: Tamanho dos blocos de download (padrão: 512)
+    - max_workers: Número de requisições simultâneas (padrão: 8)
+
+    Retorna:
+    - Array numpy (bandas, linhas, colunas)
+    """
+    tiles = tile_layout(width, height, tile_size)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        blocks = list(executor.map(
+            lambda t: _fetch_tile(image, grid, transform, *t), tiles
+        ))
+
+    count, dtype = blocks[0].shape[0], blocks[0].dtype
+    array = np.empty((count, height, width), dtype=dtype)
+    for (col, row, w, h), block in zip(tiles, blocks):
+        array[:, row:row + h, col:col + w] = block
+
+    return array
+
+
+def download_image_to_cog(image, filename, region, reference_image, sensor,
+                          tile_size=512, max_workers=8, compress='DEFLATE',
+                          predictor='YES', overview_resampling='NEAREST', nodata=None):
+    """
+    Baixa a imagem diretamente (sem fila do Drive) e grava um Cloud-Optimized GeoTIFF.
+
+    Os blocos são buscados em paralelo com computePixels na grade nativa do
+    sensor e montados localmente; o COG sai com tiles internos, overviews e
+    compressão configurável.
+
+    Parâmetros:
+    - image: Imagem a baixar
+    - filename: Caminho do arquivo .tif de saída
+    - region: Região de recorte (área de interesse)
+    - reference_image: Cena original do sensor (define crs/crsTransform)
+    - sensor: Nome da coleção (chave de NATIVE_GRID_BANDS)
+    - tile_size: Tamanho dos blocos de download e dos tiles internos (padrão: 512)
+    - max_workers: Número de requisições simultâneas (padrão: 8)
+    - compress: 'DEFLATE', 'ZSTD' ou 'LZW' (padrão: 'DEFLATE')
+    - predictor: Preditor da compressão ('YES', 'NO', 'STANDARD', 'FLOATING_POINT')
+    - overview_resampling: Reamostragem das overviews ('NEAREST' para máscaras, 'AVERAGE' para contínuos)
+    - nodata: Valor nodata gravado no arquivo (opcional)
+
+    Retorna:
+    - Caminho do arquivo gravado
+    """
+    band, _ = NATIVE_GRID_BANDS[sensor]
+    grid = native_grid(reference_image, band)
+    transform, width, height = grid_window(region, grid)
+
+    array = fetch_region(image, grid, transform, width, height,
+                         tile_size=tile_size, max_workers=max_workers)
+    count, dtype = array.shape[0], array.dtype
+
+    profile = {
+        'driver': 'GTiff',
+        'width': width,
+        'height': height,
+        'count': count,
+        'dtype': dtype,
+        'crs': CRS.from_user_input(grid['crs']),
+        'transform': transform,
+        'nodata': nodata,
+        'tiled': True,
+        'blockxsize': tile_size,
+        'blockysize': tile_size
+    }
+
+    # Grava em memória e converte para COG (tiles internos + overviews automáticas)
+    with MemoryFile() as mem:
+        with mem.open(**profile) as tmp:
+            tmp.write(array)
+        with mem.open() as tmp:
+            rio_copy(
+                tmp, filename, driver='COG',
+                COMPRESS=compress,
+                PREDICTOR=predictor,
+                BLOCKSIZE=tile_size,
+                OVERVIEWS='AUTO',
+                OVERVIEW_RESAMPLING=overview_resampling
+            )
+
+    return filename
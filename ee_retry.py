@@ -0,0 +1,280 @@
+import functools
+import random
+import re
+import threading
+import time
+
+import ee
+
+from instrumentation import EE_CALLS
+
+
+# Classificação dos erros do Earth Engine: pelo status HTTP quando o erro o
+# traz e, senão, pela mensagem (o cliente costuma expor só ee.EEException com
+# o texto do servidor). Padrões são expressões regulares (sem distinção de
+# maiúsculas), verificadas na ordem abaixo; códigos só casam como palavra
+# inteira, para não pegar números de pixels, nomes de bandas ou assets.
+FATAL_PATTERNS = (
+    r'Computation timed out',     # determinístico: repetir não ajuda
+    r'User memory limit exceeded',
+)
+CONCURRENCY_PATTERNS = (
+    r'Too many concurrent aggregations',
+    r'Too many concurrent requests',
+    r'Too many tasks',
+)
+RATE_LIMIT_PATTERNS = (
+    r'\b429\b',
+    r'Too Many Requests',
+    r'Quota exceeded',
+    r'rate limit',
+    r'RESOURCE_EXHAUSTED',
+)
+TRANSIENT_PATTERNS = (
+    r'\b50[0234]\b',
+    r'Internal error',
+    r'Service Unavailable',
+    r'Backend Error',
+    r'Deadline exceeded',
+    r'Connection reset',
+    r'timed out',
+)
+
+# Status HTTP transitórios
+TRANSIENT_STATUS = (500, 502, 503, 504)
+
+# Chamadas não idempotentes: nunca repetidas (repetir o start de uma
+# exportação pode criar tarefas duplicadas no Drive)
+NON_IDEMPOTENT_CALLS = ('export_start',)
+
+# Tipos de erro que indicam sobrecarga (reduzem a concorrência)
+THROTTLE_KINDS = ('rate_limit', 'concurrency')
+
+
+class RetriesExhausted(Exception):
+    """
+    Erro transitório que persistiu após todas as tentativas.
+
+    Não é ee.EEException de propósito: os fallbacks de stretch
+    (except ee.EEException) não devem mascarar falta de cota.
+    """
+
+    def __init__(self, kind, attempts, error):
+        self.kind = kind
+        self.attempts = attempts
+        self.error = error
+        super().__init__(f"{kind} após {attempts} tentativa(s): {error}")
+
+
+def classify_error(error):
+    """
+    Classifica um erro de chamada ao EE.
+
+    Retorna:
+    - 'concurrency', 'rate_limit', 'transient' ou 'fatal'
+    """
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return 'transient'
+    message = str(error)
+    status = http_status(error)
+    if status == 429:
+        return 'concurrency' if _matches(CONCURRENCY_PATTERNS, message) else 'rate_limit'
+    if status in TRANSIENT_STATUS:
+        return 'transient'
+    if status is not None and 400 <= status < 500:
+        # Erro do cliente: só a mensagem de concorrência justifica repetir
+        return 'concurrency' if _matches(CONCURRENCY_PATTERNS, message) else 'fatal'
+    for kind, patterns in (
+        ('fatal', FATAL_PATTERNS),
+        ('concurrency', CONCURRENCY_PATTERNS),
+        ('rate_limit', RATE_LIMIT_PATTERNS),
+        ('transient', TRANSIENT_PATTERNS),
+    ):
+        if _matches(patterns, message):
+            return kind
+    return 'fatal'
+
+
+def http_status(error):
+    """Status HTTP do erro (resp.status, status_code ou code), ou None."""
+    for status in (
+        getattr(getattr(error, 'resp', None), 'status', None),
+        getattr(error, 'status_code', None),
+        getattr(error, 'code', None),
+    ):
+        try:
+            return int(status)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def _matches(patterns, message):
+    return any(re.search(pattern, message, re.IGNORECASE) for pattern in patterns)
+
+
+class ConcurrencyController:
+    """
+    Limita as chamadas simultâneas ao EE e repete as transitórias.
+
+    O limite segue AIMD: cresce ~1 a cada janela de chamadas bem-sucedidas e é
+    multiplicado por 'decrease' quando o servidor sinaliza sobrecarga (429 ou
+    "Too many concurrent aggregations"). Só uma redução por janela: erros de
+    chamadas iniciadas antes da última redução não reduzem de novo, o que evita
+    despencar para 1 em uma rajada de falhas e manter o throughput perto do teto.
+    As repetições usam backoff exponencial com jitter completo.
+    """
+
+    def __init__(self, initial_limit=8, min_limit=1, max_limit=64, decrease=0.7,
+                 max_retries=6, base_delay=1.0, max_delay=60.0, seed=None):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._epoch = 0
+        self._cond = threading.Condition()
+        self._random = random.Random(seed)
+        self._metrics = {
+            'calls': 0, 'attempts': 0, 'successes': 0, 'retries': 0,
+            'rate_limit': 0, 'concurrency': 0, 'transient': 0, 'fatal': 0,
+            'exhausted': 0, 'decreases': 0, 'backoff_s': 0.0, 'wait_s': 0.0,
+            'peak_in_flight': 0, 'min_limit_seen': self._limit, 'max_limit_seen': self._limit,
+        }
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def _acquire(self):
+        start = time.perf_counter()
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+            self._metrics['attempts'] += 1
+            self._metrics['peak_in_flight'] = max(self._metrics['peak_in_flight'], self._in_flight)
+            self._metrics['wait_s'] += time.perf_counter() - start
+            return self._epoch
+
+    def _release(self, epoch, kind):
+        with self._cond:
+            self._in_flight -= 1
+            if kind == 'ok':
+                self._metrics['successes'] += 1
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+            else:
+                self._metrics[kind] += 1
+                if kind in THROTTLE_KINDS and epoch == self._epoch:
+                    self._limit = max(self.min_limit, self._limit * self.decrease)
+                    self._epoch += 1
+                    self._metrics['decreases'] += 1
+            self._metrics['min_limit_seen'] = min(self._metrics['min_limit_seen'], self._limit)
+            self._metrics['max_limit_seen'] = max(self._metrics['max_limit_seen'], self._limit)
+            self._cond.notify_all()
+
+    def backoff(self, attempt):
+        """Espera da tentativa 'attempt' (jitter completo sobre o exponencial)."""
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, func, *args, **kwargs):
+        """
+        Executa 'func' respeitando o limite de concorrência e repetindo erros transitórios.
+
+        Erros fatais são relançados na hora; transitórios que persistem após
+        max_retries viram RetriesExhausted.
+        """
+        with self._cond:
+            self._metrics['calls'] += 1
+        attempt = 0
+        while True:
+            epoch = self._acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as error:
+                kind = classify_error(error)
+                self._release(epoch, kind)
+                if kind == 'fatal':
+                    raise
+                if attempt >= self.max_retries:
+                    with self._cond:
+                        self._metrics['exhausted'] += 1
+                    raise RetriesExhausted(kind, attempt + 1, error) from error
+                delay = self.backoff(attempt)
+                with self._cond:
+                    self._metrics['retries'] += 1
+                    self._metrics['backoff_s'] += delay
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._release(epoch, 'ok')
+            return result
+
+    def metrics(self):
+        """Métricas de throttling (contadores, limite atual e esperas)."""
+        with self._cond:
+            return dict(self._metrics, limit=self._limit, in_flight=self._in_flight)
+
+    def summary(self):
+        """Resumo de uma linha das métricas."""
+        m = self.metrics()
+        return (
+            f"Chamadas: {m['calls']} ({m['attempts']} tentativas, {m['retries']} repetições) | "
+            f"429: {m['rate_limit']} | concorrência: {m['concurrency']} | transitórios: {m['transient']} | "
+            f"esgotadas: {m['exhausted']} | limite: {m['limit']:.1f} "
+            f"(mín. {m['min_limit_seen']:.1f}, máx. {m['max_limit_seen']:.1f}, pico em uso {m['peak_in_flight']}) | "
+            f"backoff: {m['backoff_s']:.1f}s"
+        )
+
+
+controller = ConcurrencyController()
+
+
+def _wrap(method):
+    """Faz a chamada ao EE passar pelo controlador global."""
+    if getattr(method, '_retried', False):
+        return method
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        return controller.call(method, *args, **kwargs)
+
+    wrapper._retried = True
+    return wrapper
+
+
+def install(ee_module=ee, **kwargs):
+    """
+    Passa as chamadas bloqueantes ao EE (as mesmas da instrumentação, exceto
+    NON_IDEMPOTENT_CALLS) pelo controlador de concorrência e repetição.
+
+    Chamar depois de instrumentation.install() para que cada tentativa
+    apareça no trace.
+
+    Parâmetros:
+    - ee_module: Módulo a envolver (padrão: ee)
+    - kwargs: Configuração do controlador (initial_limit, max_limit, max_retries...)
+
+    Retorna:
+    - O controlador global
+    """
+    global controller
+    if kwargs:
+        controller = ConcurrencyController(**kwargs)
+    for path, attr, kind in EE_CALLS:
+        if kind in NON_IDEMPOTENT_CALLS:
+            continue
+        target = ee_module
+        try:
+            for part in path.split('.'):
+                target = getattr(target, part)
+        except AttributeError:
+            continue
+        method = getattr(target, attr, None)
+        if method is None:
+            continue
+        setattr(target, attr, _wrap(method))
+    return controller
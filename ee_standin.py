@@ -0,0 +1,921 @@
+import io
+import math
+import random
+import sys
+import threading
+import time
+import types
+import zlib
+from datetime import datetime, timedelta
+
+
+# Backend local que imita a API do Earth Engine usada pelos scripts, para
+# benchmarks e testes offline. As expressões são montadas localmente sem custo;
+# cada chamada bloqueante (getInfo, getMapId, miniaturas, computePixels,
+# exportação) passa por Backend.rpc, que simula a latência e conta bytes.
+
+# Coleções simuladas: revisita (dias), grade de tiles (graus), bandas e resolução (m).
+# Tiles vizinhos se sobrepõem em TILE_OVERLAP graus, como as cenas reais
+COLLECTIONS = {
+    'COPERNICUS/S2_SR_HARMONIZED': {
+        'revisit': 5, 'tile_deg': 1.0, 'scale': 10,
+        'bands': ['B2', 'B3', 'B4', 'B8', 'B11', 'B12', 'MSK_CLDPRB', 'SCL'],
+    },
+    'COPERNICUS/S1_GRD': {
+        'revisit': 6, 'tile_deg': 2.0, 'scale': 10,
+        'bands': ['VV', 'VH', 'angle'],
+    },
+    'LANDSAT/LC08/C02/T1_L2': {
+        'revisit': 16, 'tile_deg': 1.8, 'scale': 30,
+        'bands': ['SR_B1', 'SR_B2', 'SR_B3', 'SR_B4', 'SR_B5', 'SR_B6', 'SR_B7', 'QA_PIXEL'],
+    },
+    'LANDSAT/LT05/C02/T1_L2': {
+        'revisit': 16, 'tile_deg': 1.8, 'scale': 30,
+        'bands': ['SR_B1', 'SR_B2', 'SR_B3', 'SR_B4', 'SR_B5', 'SR_B7', 'QA_PIXEL'],
+    },
+    'MODIS/061/MOD09GQ': {
+        'revisit': 1, 'tile_deg': 10.0, 'scale': 250,
+        'bands': ['sur_refl_b01', 'sur_refl_b02', 'QC_250m'],
+    },
+    'MODIS/061/MYD09GQ': {
+        'revisit': 1, 'tile_deg': 10.0, 'scale': 250,
+        'bands': ['sur_refl_b01', 'sur_refl_b02', 'QC_250m'],
+    },
+}
+
+# Metros por grau (aproximação usada para estimar pixels da AOI)
+METERS_PER_DEGREE = 111320
+
+TILE_OVERLAP = 0.05
+
+# Datas do backend são UTC sem fuso (naive); época de referência em ms
+_ANCHOR = datetime(2000, 1, 1)
+_ANCHOR_MS = 946684800000
+
+
+def _millis(value):
+    return _ANCHOR_MS + int((value - _ANCHOR).total_seconds() * 1000)
+
+
+def _from_millis(millis):
+    return _ANCHOR + timedelta(milliseconds=millis - _ANCHOR_MS)
+
+
+class Backend:
+    """
+    Simula o servidor: latência por chamada, custo proporcional aos pixels
+    processados e contadores de chamadas e bytes transferidos.
+    """
+
+    def __init__(self, latency=0.0, pixel_latency=0.0, jitter=0.0, seed=0, failures=None,
+                 max_concurrent=None):
+        self.latency = latency
+        self.pixel_latency = pixel_latency
+        self.jitter = jitter
+        self.seed = seed
+        # Lista de exceções a lançar nas próximas chamadas (simulação de erros)
+        self.failures = list(failures or [])
+        # Cota de chamadas simultâneas (acima dela: "Too many concurrent aggregations")
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.rejected = 0
+        self.rpc_count = 0
+        self.bytes = 0
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def rpc(self, kind, value, payload_bytes=0, pixels=0):
+        """Executa uma chamada bloqueante simulada e devolve 'value'."""
+        with self._lock:
+            self.rpc_count += 1
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+            failure = self.failures.pop(0) if self.failures else None
+            if failure is None and self.max_concurrent is not None and self.in_flight >= self.max_concurrent:
+                self.rejected += 1
+                failure = EEException('Too many concurrent aggregations.')
+            self.in_flight += 1
+            delay = self.latency + pixels * self.pixel_latency
+            if self.jitter:
+                delay += self._random.uniform(0, self.jitter)
+        try:
+            if delay > 0:
+                time.sleep(delay)
+            if failure is not None:
+                raise failure
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        with self._lock:
+            self.bytes += payload_bytes
+        return value
+
+
+backend = Backend()
+
+
+def configure(**kwargs):
+    """Recria o backend com nova configuração (latency, pixel_latency, jitter, seed, failures, max_concurrent)."""
+    global backend
+    backend = Backend(**kwargs)
+    return backend
+
+
+def activate(**kwargs):
+    """
+    Instala este módulo como 'ee' em sys.modules.
+
+    Deve ser chamado antes de importar os módulos do projeto, que fazem 'import ee'.
+
+    Retorna:
+    - O backend configurado
+    """
+    sys.modules['ee'] = sys.modules[__name__]
+    return configure(**kwargs)
+
+
+def Authenticate(*args, **kwargs):
+    return True
+
+
+def Initialize(*args, **kwargs):
+    return None
+
+
+class EEException(Exception):
+    """Mesma classe de erro exposta pelo cliente do Earth Engine."""
+
+
+def _seeded(*parts):
+    """Gerador aleatório determinístico para uma combinação de chaves."""
+    key = '|'.join(str(p) for p in (backend.seed,) + parts)
+    return random.Random(zlib.crc32(key.encode('utf-8')))
+
+
+def _parse_date(value):
+    if isinstance(value, Date):
+        return value._value
+    if isinstance(value, Value):
+        value = value._evaluate()
+    if isinstance(value, (int, float)):
+        return _from_millis(value)
+    value = str(value)
+    for fmt in ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise EEException(f"Data inválida: {value}")
+
+
+def _tiles(spec, region):
+    """Tiles da grade da coleção que intersectam a região (minx, miny, maxx, maxy)."""
+    if region is None:
+        # Sem filterBounds: um único tile representativo
+        return [(0, 0)]
+    size = spec['tile_deg']
+    minx, miny, maxx, maxy = region
+    return [
+        (i, j)
+        for i in range(math.floor((minx - TILE_OVERLAP) / size), math.floor((maxx + TILE_OVERLAP) / size) + 1)
+        for j in range(math.floor((miny - TILE_OVERLAP) / size), math.floor((maxy + TILE_OVERLAP) / size) + 1)
+    ]
+
+
+def _generate_scenes(collection_id, start, end, region=None):
+    """Gera de forma determinística as cenas da coleção entre start e end que cobrem a região."""
+    spec = COLLECTIONS[collection_id]
+    size = spec['tile_deg']
+    scenes = []
+    first_day = (start - _ANCHOR).days - 1
+    last_day = (end - _ANCHOR).days + 1
+    for day in range(first_day, last_day + 1):
+        if day % spec['revisit'] != 0:
+            continue
+        for n, (i, j) in enumerate(_tiles(spec, region)):
+            acquired = _ANCHOR + timedelta(days=day, hours=10, minutes=n % 60)
+            if not (start <= acquired < end):
+                continue
+            rng = _seeded(collection_id, day, i, j)
+            cloud = rng.uniform(0, 100)
+            orbit = 'ASCENDING' if (day // spec['revisit'] + i) % 2 else 'DESCENDING'
+            scenes.append({
+                'system:index': f"{acquired.strftime('%Y%m%dT%H%M%S')}_T{i:+04d}{j:+04d}",
+                'system:time_start': _millis(acquired),
+                'date': acquired.strftime('%Y-%m-%d'),
+                'CLOUDY_PIXEL_PERCENTAGE': cloud,
+                'CLOUD_COVER': cloud,
+                'orbitProperties_pass': orbit,
+                'relativeOrbitNumber_start': (day // spec['revisit'] + i) % 175 + 1,
+                'resolution_meters': 10,
+                'instrumentMode': 'IW',
+                'transmitterReceiverPolarisation': ['VV', 'VH'],
+                '_collection': collection_id,
+                '_bbox': (i * size - TILE_OVERLAP, j * size - TILE_OVERLAP,
+                          (i + 1) * size + TILE_OVERLAP, (j + 1) * size + TILE_OVERLAP),
+            })
+    return scenes
+
+
+def _intersects(a, b):
+    return not (a[2] < b[0] or b[2] < a[0] or a[3] < b[1] or b[3] < a[1])
+
+
+def _polygon(bbox):
+    minx, miny, maxx, maxy = bbox
+    ring = [[minx, miny], [maxx, miny], [maxx, maxy], [minx, maxy], [minx, miny]]
+    return {'type': 'Polygon', 'coordinates': [ring]}
+
+
+def _resolve(value):
+    """Avalia recursivamente objetos do backend (para getInfo de dicionários/listas)."""
+    if isinstance(value, ComputedObject):
+        return value._evaluate()
+    if isinstance(value, dict):
+        return {k: _resolve(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_resolve(v) for v in value]
+    return value
+
+
+def _payload_size(value):
+    return len(repr(value).encode('utf-8'))
+
+
+class _Signature:
+    """Imita ee.Function.getSignature() para a instrumentação."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def getSignature(self):
+        return {'name': self.name}
+
+
+class ComputedObject:
+    """Base das expressões: serialização e getInfo (uma chamada ao backend)."""
+
+    _type = 'Object'
+
+    def __init__(self, op='constant', parent=None, args=''):
+        prefix = parent._expr if parent is not None else self._type
+        self._expr = f"{prefix}.{op}({args})"
+        self.func = _Signature(f"{self._type}.{op}")
+
+    def serialize(self):
+        return self._expr
+
+    def _evaluate(self):
+        return None
+
+    def _pixels(self):
+        return 0
+
+    def getInfo(self):
+        value = self._evaluate()
+        return backend.rpc('getInfo', value, _payload_size(value), self._pixels())
+
+    def __repr__(self):
+        return f"<{self._type} {self._expr[:80]}>"
+
+
+class Value(ComputedObject):
+    """Valor calculado (número, lista, dicionário...) avaliado sob demanda."""
+
+    _type = 'Value'
+
+    def __init__(self, evaluator, op='constant', parent=None, args='', pixels=0):
+        super().__init__(op, parent, args)
+        self._evaluator = evaluator
+        self._pixel_count = pixels
+
+    def _evaluate(self):
+        return self._evaluator()
+
+    def _pixels(self):
+        return self._pixel_count
+
+    def _derive(self, op, func, *args):
+        return Value(lambda: func(self._evaluate(), *[_resolve(a) for a in args]),
+                     op, self, _args_repr(args, {}), self._pixel_count)
+
+    def get(self, key, default=None):
+        return self._derive('get', lambda d, k: (d or {}).get(k, default), key)
+
+    def values(self, keys=None):
+        return self._derive('values', lambda d: list((d or {}).values()))
+
+    def divide(self, other):
+        return self._derive('divide', lambda a, b: a / b if a is not None else None, other)
+
+    def multiply(self, other):
+        return self._derive('multiply', lambda a, b: a * b if a is not None else None, other)
+
+    def add(self, other):
+        return self._derive('add', lambda a, b: a + b if a is not None else None, other)
+
+    def subtract(self, other):
+        return self._derive('subtract', lambda a, b: a - b if a is not None else None, other)
+
+    def distinct(self):
+        return self._derive('distinct', lambda items: list(dict.fromkeys(items or [])))
+
+    def map(self, func):
+        # Avaliação local (sem chamada ao backend) para montar os elementos mapeados
+        items = [func(item) for item in self._evaluate() or []]
+        value = Value(lambda: _resolve(items), 'map', self, getattr(func, '__name__', 'func'), self._pixel_count)
+        value._items = items
+        return value
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def op(*args, **kwargs):
+            return Value(lambda: None, name, self, _args_repr(args, kwargs), self._pixel_count)
+        return op
+
+
+def _args_repr(args, kwargs):
+    parts = [getattr(a, '_expr', repr(a)) for a in args]
+    parts += [f"{k}={getattr(v, '_expr', repr(v))}" for k, v in sorted(kwargs.items())]
+    return ', '.join(parts)
+
+
+def Dictionary(value=None):
+    return Value(lambda: _resolve(value or {}), 'Dictionary', None, repr(value))
+
+
+def List(value=None):
+    return Value(lambda: _resolve(value or []), 'List', None, repr(value))
+
+
+def Number(value):
+    return Value(lambda: value, 'Number', None, repr(value))
+
+
+def String(value):
+    return Value(lambda: value, 'String', None, repr(value))
+
+
+class Date(ComputedObject):
+    _type = 'Date'
+
+    def __init__(self, value, parent=None):
+        super().__init__('Date', parent, repr(value))
+        self._value = value if isinstance(value, datetime) else _parse_date(value)
+
+    def format(self, pattern=None):
+        return Value(lambda: self._value.strftime('%Y-%m-%d'), 'format', self, repr(pattern))
+
+    def millis(self):
+        return Value(lambda: _millis(self._value), 'millis', self)
+
+    def advance(self, delta, unit):
+        units = {'day': 'days', 'hour': 'hours', 'minute': 'minutes', 'second': 'seconds'}
+        return Date(self._value + timedelta(**{units[unit]: delta}), self)
+
+    def _evaluate(self):
+        return {'type': 'Date', 'value': _millis(self._value)}
+
+
+class Projection(ComputedObject):
+    _type = 'Projection'
+
+    def __init__(self, crs='EPSG:4326', transform=None, parent=None):
+        super().__init__('Projection', parent, repr(crs))
+        self.crs = crs
+        self.transform = transform or [1, 0, 0, 0, 1, 0]
+
+    def _evaluate(self):
+        return {'type': 'Projection', 'crs': self.crs, 'transform': self.transform}
+
+
+class Geometry(ComputedObject):
+    _type = 'Geometry'
+
+    def __init__(self, coords=None, parent=None, op='Geometry'):
+        super().__init__(op, parent, repr(coords))
+        self.coords = coords or [0, 0, 0, 0]
+
+    @staticmethod
+    def Rectangle(coords, *args, **kwargs):
+        return Geometry(list(coords), op='Rectangle')
+
+    @staticmethod
+    def Point(coords, *args, **kwargs):
+        lon, lat = coords
+        return Geometry([lon, lat, lon, lat], op='Point')
+
+    def area_m2(self):
+        minx, miny, maxx, maxy = self.coords
+        mean_lat = math.radians((miny + maxy) / 2)
+        width = (maxx - minx) * METERS_PER_DEGREE * math.cos(mean_lat)
+        return abs(width * (maxy - miny) * METERS_PER_DEGREE)
+
+    def bounds(self, maxError=None, proj=None):
+        geometry = Geometry(self.coords, self, 'bounds')
+        geometry._proj = proj
+        return geometry
+
+    def intersects(self, other, *args):
+        a, b = self.coords, other.coords
+        return Value(lambda: not (a[2] < b[0] or b[2] < a[0] or a[3] < b[1] or b[3] < a[1]), 'intersects', self)
+
+    def _evaluate(self):
+        minx, miny, maxx, maxy = self.coords
+        proj = getattr(self, '_proj', None)
+        if proj is not None and getattr(proj, 'crs', 'EPSG:4326') != 'EPSG:4326':
+            # Aproximação métrica para projeções nativas (UTM/sinusoidal)
+            minx, maxx = minx * METERS_PER_DEGREE, maxx * METERS_PER_DEGREE
+            miny, maxy = miny * METERS_PER_DEGREE, maxy * METERS_PER_DEGREE
+        ring = [[minx, miny], [maxx, miny], [maxx, maxy], [minx, maxy], [minx, miny]]
+        return {'type': 'Polygon', 'coordinates': [ring]}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def op(*args, **kwargs):
+            return Geometry(self.coords, self, name)
+        return op
+
+
+class Algorithms:
+    @staticmethod
+    def If(condition, trueCase=None, falseCase=None):
+        """Condicional do servidor: os dois ramos são avaliados localmente só quando o resultado é lido."""
+        return Value(lambda: _resolve(trueCase if _resolve(condition) else falseCase), 'If', None,
+                     _args_repr((condition, trueCase, falseCase), {}))
+
+
+class Filter:
+    """Filtro de propriedades aplicado localmente às cenas simuladas."""
+
+    def __init__(self, predicate, expr):
+        self.predicate = predicate
+        self._expr = expr
+
+    @staticmethod
+    def lt(prop, value):
+        return Filter(lambda s: s.get(prop) is not None and s.get(prop) < value, f"lt({prop},{value})")
+
+    @staticmethod
+    def lte(prop, value):
+        return Filter(lambda s: s.get(prop) is not None and s.get(prop) <= value, f"lte({prop},{value})")
+
+    @staticmethod
+    def gt(prop, value):
+        return Filter(lambda s: s.get(prop) is not None and s.get(prop) > value, f"gt({prop},{value})")
+
+    @staticmethod
+    def gte(prop, value):
+        return Filter(lambda s: s.get(prop) is not None and s.get(prop) >= value, f"gte({prop},{value})")
+
+    @staticmethod
+    def eq(prop, value):
+        # O valor pode vir do servidor (ex.: image.get dentro de um map)
+        return Filter(lambda s: s.get(prop) == _resolve(value), f"eq({prop},{value!r})")
+
+    @staticmethod
+    def neq(prop, value):
+        return Filter(lambda s: s.get(prop) != value, f"neq({prop},{value!r})")
+
+    @staticmethod
+    def inList(prop, values):
+        values = list(values)
+        return Filter(lambda s: s.get(prop) in values, f"inList({prop},{values!r})")
+
+    @staticmethod
+    def listContains(prop, value):
+        return Filter(lambda s: value in (s.get(prop) or []), f"listContains({prop},{value!r})")
+
+    @staticmethod
+    def And(*filters):
+        return Filter(lambda s: all(f.predicate(s) for f in filters), 'And(' + ','.join(f._expr for f in filters) + ')')
+
+    @staticmethod
+    def Or(*filters):
+        return Filter(lambda s: any(f.predicate(s) for f in filters), 'Or(' + ','.join(f._expr for f in filters) + ')')
+
+
+class Reducer:
+    def __init__(self, kind, percentiles=None):
+        self.kind = kind
+        self.percentiles = percentiles or []
+        self._expr = f"Reducer.{kind}({self.percentiles})"
+
+    @staticmethod
+    def percentile(percentiles, *args, **kwargs):
+        return Reducer('percentile', list(percentiles))
+
+    @staticmethod
+    def sum():
+        return Reducer('sum')
+
+    @staticmethod
+    def mean():
+        return Reducer('mean')
+
+    @staticmethod
+    def count():
+        return Reducer('count')
+
+    @staticmethod
+    def min():
+        return Reducer('min')
+
+    @staticmethod
+    def max():
+        return Reducer('max')
+
+
+class Image(ComputedObject):
+    """Imagem simulada: acompanha as cenas de origem e os nomes das bandas."""
+
+    _type = 'Image'
+
+    def __init__(self, value=None, scenes=None, bands=None, op='constant', parent=None, args=''):
+        super().__init__(op, parent, args if args else repr(value) if value is not None else '')
+        self._scenes = list(scenes or [])
+        self._bands = list(bands) if bands is not None else ['constant']
+        # Propriedades definidas com set (têm precedência sobre as da cena)
+        self._props = {}
+
+    def _derive(self, op, bands=None, args=''):
+        image = Image(scenes=self._scenes, bands=self._bands if bands is None else bands,
+                      op=op, parent=self, args=args)
+        image._props = dict(self._props)
+        return image
+
+    def set(self, *args):
+        props = args[0] if len(args) == 1 else {args[0]: args[1]}
+        image = self._derive('set', args=_args_repr((props,), {}))
+        image._props.update(props)
+        return image
+
+    @staticmethod
+    def pixelArea():
+        return Image(bands=['area'], op='pixelArea')
+
+    @staticmethod
+    def cat(*images):
+        if len(images) == 1 and isinstance(images[0], (list, tuple)):
+            images = images[0]
+        bands = [b for image in images for b in image._bands]
+        scenes = [s for image in images for s in image._scenes]
+        return Image(scenes=scenes, bands=bands, op='cat', args=_args_repr(images, {}))
+
+    def select(self, *selectors, **kwargs):
+        if len(selectors) == 1 and isinstance(selectors[0], (list, tuple)):
+            selectors = selectors[0]
+        return self._derive('select', [str(s) for s in selectors], repr(list(selectors)))
+
+    def rename(self, *names):
+        if len(names) == 1 and isinstance(names[0], (list, tuple)):
+            names = names[0]
+        return self._derive('rename', list(names), repr(list(names)))
+
+    def addBands(self, other, names=None, overwrite=False):
+        bands = [b for b in self._bands if overwrite is False or b not in other._bands]
+        return Image(scenes=self._scenes, bands=bands + other._bands, op='addBands',
+                     parent=self, args=other._expr)
+
+    def normalizedDifference(self, bands=None):
+        return self._derive('normalizedDifference', ['nd'], repr(bands))
+
+    def visualize(self, *args, **kwargs):
+        return self._derive('visualize', ['vis-red', 'vis-green', 'vis-blue'], _args_repr(args, kwargs))
+
+    def date(self):
+        if 'system:time_start' in self._props:
+            return Date(_parse_date(self._props['system:time_start']), self)
+        scenes = self._scenes
+        return Date(_from_millis(scenes[0]['system:time_start']) if scenes else _ANCHOR, self)
+
+    def get(self, prop):
+        if prop in self._props:
+            value = self._props[prop]
+            return Value(lambda: _resolve(value), 'get', self, repr(prop))
+        scenes = self._scenes
+        return Value(lambda: scenes[0].get(prop) if scenes else None, 'get', self, repr(prop))
+
+    def geometry(self, *args, **kwargs):
+        boxes = [s['_bbox'] for s in self._scenes if '_bbox' in s]
+        coords = None
+        if boxes:
+            coords = [min(b[0] for b in boxes), min(b[1] for b in boxes),
+                      max(b[2] for b in boxes), max(b[3] for b in boxes)]
+        return Geometry(coords, self, 'geometry')
+
+    def projection(self):
+        crs, scale = 'EPSG:4326', 1
+        if self._scenes:
+            crs = 'EPSG:32723'
+            scale = COLLECTIONS[self._scenes[0]['_collection']]['scale']
+        return Projection(crs, [scale, 0, 0, 0, -scale, 0], self)
+
+    def reduceRegion(self, reducer=None, geometry=None, scale=None, maxPixels=None, **kwargs):
+        bands = list(self._bands)
+        rng = _seeded(self._expr)
+        pixels = 0
+        if geometry is not None and scale:
+            pixels = int(geometry.area_m2() / (scale * scale))
+
+        def evaluate():
+            result = {}
+            for band in bands:
+                if reducer.kind == 'percentile':
+                    low, high = sorted((rng.uniform(0, 1500), rng.uniform(1500, 4000)))
+                    for p in reducer.percentiles:
+                        result[f"{band}_p{p}"] = low if p < 50 else high
+                elif reducer.kind == 'mean':
+                    # Médias de máscaras e índices normalizados ficam entre 0 e 1
+                    result[band] = rng.uniform(0, 1)
+                else:
+                    result[band] = rng.uniform(0, 1000)
+            return result
+        return Value(evaluate, 'reduceRegion', self, _args_repr((), {'reducer': reducer._expr}), pixels)
+
+    def getMapId(self, vis_params=None):
+        mapid = f"standin-{zlib.crc32(self._expr.encode('utf-8')):08x}"
+        url = f"https://standin.local/map/{mapid}/{{z}}/{{x}}/{{y}}"
+        result = {'mapid': mapid, 'token': '', 'tile_fetcher': types.SimpleNamespace(url_format=url)}
+        return backend.rpc('getMapId', result, len(url))
+
+    def getThumbURL(self, params=None):
+        url = f"https://standin.local/thumb/{zlib.crc32(self._expr.encode('utf-8')):08x}.png"
+        return backend.rpc('getThumbURL', url, len(url))
+
+    def _evaluate(self):
+        return {'type': 'Image', 'bands': [{'id': b} for b in self._bands]}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def op(*args, **kwargs):
+            return self._derive(name, args=_args_repr(args, kwargs))
+        return op
+
+
+class Feature(ComputedObject):
+    _type = 'Feature'
+
+    def __init__(self, geometry=None, properties=None):
+        super().__init__('Feature', None, _args_repr((geometry, properties), {}))
+        self.geometry = geometry
+        self.properties = properties or {}
+
+    def _evaluate(self):
+        geometry = self.geometry._evaluate() if isinstance(self.geometry, Geometry) else None
+        return {'type': 'Feature', 'geometry': geometry, 'properties': _resolve(self.properties)}
+
+
+class FeatureCollection(ComputedObject):
+    _type = 'FeatureCollection'
+
+    def __init__(self, features=None, scenes=None, parent=None, op='FeatureCollection', func=None):
+        super().__init__(op, parent, _args_repr(features or (), {}) if isinstance(features, list) else '')
+        self._features = features if isinstance(features, list) else []
+        self._scenes = scenes
+        self._func = func
+
+    def aggregate_array(self, prop):
+        scenes = self._scenes or []
+        if self._func is not None:
+            # Propriedades calculadas pela função do map (valores nulos são omitidos, como no EE)
+            def evaluate():
+                values = [f['properties'].get(prop) for f in self._evaluate()['features']]
+                return [v for v in values if v is not None]
+            return Value(evaluate, 'aggregate_array', self, repr(prop))
+        return Value(lambda: [s.get(prop) for s in scenes], 'aggregate_array', self, repr(prop))
+
+    def size(self):
+        n = len(self._scenes) if self._scenes is not None else len(self._features)
+        return Value(lambda: n, 'size', self)
+
+    def style(self, *args, **kwargs):
+        return Image(bands=['vis-red', 'vis-green', 'vis-blue'], op='style', args=_args_repr(args, kwargs))
+
+    def draw(self, *args, **kwargs):
+        return self.style(*args, **kwargs)
+
+    def _evaluate(self):
+        if self._scenes is not None and self._func is not None:
+            # Coleção de imagens mapeada para Feature: a função é aplicada a cada cena
+            features = []
+            for s in self._scenes:
+                feature = _resolve(self._func(Image(scenes=[s], op='scene', args=repr(s['system:index']))))
+                feature['id'] = s['system:index']
+                features.append(feature)
+            return {'type': 'FeatureCollection', 'features': features}
+        return {'type': 'FeatureCollection', 'features': [_resolve(f) for f in self._features]}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def op(*args, **kwargs):
+            return FeatureCollection(self._features, self._scenes, self, name, self._func)
+        return op
+
+
+class ImageCollection(ComputedObject):
+    """Coleção simulada; filterDate materializa as cenas da coleção."""
+
+    _type = 'ImageCollection'
+
+    def __init__(self, source=None, scenes=None, bands=None, parent=None, op='load', args=''):
+        if isinstance(source, str):
+            super().__init__(op, parent, repr(source))
+            self._id = source
+            self._scenes = scenes
+            self._bands = bands if bands is not None else list(COLLECTIONS[source]['bands'])
+            self._images = None
+        else:
+            images = list(source or [])
+            super().__init__('fromImages', parent, _args_repr(images, {}) if images else args)
+            self._id = None
+            self._images = images
+            self._scenes = scenes if scenes is not None else [s for i in images for s in i._scenes]
+            self._bands = bands if bands is not None else (images[0]._bands if images else [])
+        # Região de filterBounds (minx, miny, maxx, maxy) e filtros anteriores ao filterDate
+        self._region = None
+        self._pending = []
+
+    def _derive(self, op, scenes=None, bands=None, args=''):
+        images = self._images
+        if images is not None and scenes is not None:
+            kept = {id(s) for s in scenes}
+            images = [i for i in images if any(id(s) in kept for s in i._scenes)]
+        collection = ImageCollection(self._id if self._id else images,
+                                     scenes=self._scenes if scenes is None else scenes,
+                                     bands=self._bands if bands is None else bands,
+                                     parent=self, op=op, args=args)
+        collection._region = self._region
+        collection._pending = self._pending
+        return collection
+
+    def _require_scenes(self):
+        if self._scenes is None:
+            raise EEException(f"Coleção sem filterDate no backend local: {self._id}")
+        return self._scenes
+
+    @staticmethod
+    def fromImages(images):
+        return ImageCollection(getattr(images, '_items', images))
+
+    @staticmethod
+    def merge_all(*collections):
+        scenes = [s for c in collections for s in c._require_scenes()]
+        return ImageCollection([], scenes=scenes, bands=collections[0]._bands)
+
+    def merge(self, other):
+        scenes = sorted(self._require_scenes() + other._require_scenes(), key=lambda s: s['system:time_start'])
+        return self._derive('merge', scenes, args=other._expr)
+
+    def filterBounds(self, geometry):
+        region = list(geometry.coords)
+        scenes = None
+        if self._scenes is not None:
+            scenes = [s for s in self._scenes if '_bbox' not in s or _intersects(s['_bbox'], region)]
+        collection = self._derive('filterBounds', scenes, args=geometry._expr)
+        if self._region is not None:
+            region = [max(self._region[0], region[0]), max(self._region[1], region[1]),
+                      min(self._region[2], region[2]), min(self._region[3], region[3])]
+        collection._region = region
+        return collection
+
+    def filterDate(self, start, end=None):
+        start_dt = _parse_date(start)
+        end_dt = _parse_date(end) if end is not None else start_dt + timedelta(days=1)
+        if self._scenes is None:
+            scenes = _generate_scenes(self._id, start_dt, end_dt, self._region)
+            for flt in self._pending:
+                scenes = [s for s in scenes if flt.predicate(s)]
+        else:
+            scenes = [
+                s for s in self._scenes
+                if start_dt <= _from_millis(s['system:time_start']) < end_dt
+            ]
+        return self._derive('filterDate', scenes, args=f"{start!r}, {end!r}")
+
+    def filter(self, flt):
+        scenes = [s for s in self._require_scenes() if flt.predicate(s)] if self._scenes is not None else None
+        collection = self._derive('filter', scenes, args=flt._expr)
+        if scenes is None:
+            # Filtros antes do filterDate são reaplicados quando as cenas forem geradas
+            collection._pending = self._pending + [flt]
+        return collection
+
+    def select(self, *selectors, **kwargs):
+        if len(selectors) == 1 and isinstance(selectors[0], (list, tuple)):
+            selectors = selectors[0]
+        return self._derive('select', bands=[str(s) for s in selectors], args=repr(list(selectors)))
+
+    def map(self, func, *args, **kwargs):
+        if self._images is not None:
+            # Coleção de imagens montadas (ex.: mosaicos diários): a função é aplicada a cada imagem
+            mapped = [func(image) for image in self._images]
+            if mapped and isinstance(mapped[0], Feature):
+                return FeatureCollection(mapped, parent=self, op='map')
+            if mapped and isinstance(mapped[0], Image):
+                return ImageCollection(mapped, parent=self, op='map', args=getattr(func, '__name__', 'func'))
+        probe = func(Image(scenes=self._scenes[:1] if self._scenes else [], bands=self._bands, op='probe'))
+        if isinstance(probe, (Feature, FeatureCollection)):
+            return FeatureCollection(scenes=self._scenes, parent=self, op='map', func=func)
+        bands = probe._bands if isinstance(probe, Image) else self._bands
+        return self._derive('map', bands=bands, args=getattr(func, '__name__', 'func'))
+
+    def size(self):
+        scenes = self._scenes
+        return Value(lambda: len(scenes if scenes is not None else self._require_scenes()), 'size', self)
+
+    def aggregate_array(self, prop):
+        scenes = self._scenes
+        return Value(lambda: [s.get(prop) for s in (scenes if scenes is not None else self._require_scenes())],
+                     'aggregate_array', self, repr(prop))
+
+    def first(self):
+        if self._images:
+            return self._images[0]._derive('first')
+        return Image(scenes=(self._scenes or [])[:1], bands=self._bands, op='first', parent=self)
+
+    def mosaic(self):
+        return Image(scenes=self._scenes or [], bands=self._bands, op='mosaic', parent=self)
+
+    def qualityMosaic(self, qualityBand):
+        return Image(scenes=self._scenes or [], bands=self._bands, op='qualityMosaic', parent=self,
+                     args=repr(qualityBand))
+
+    def median(self):
+        return Image(scenes=self._scenes or [], bands=self._bands, op='median', parent=self)
+
+    def mean(self):
+        return Image(scenes=self._scenes or [], bands=self._bands, op='mean', parent=self)
+
+    def toList(self, count, offset=0):
+        return Value(lambda: list(self._scenes or [])[offset:offset + count], 'toList', self)
+
+    def getVideoThumbURL(self, params=None):
+        url = f"https://standin.local/video/{zlib.crc32(self._expr.encode('utf-8')):08x}.gif"
+        return backend.rpc('getVideoThumbURL', url, len(url))
+
+    def _evaluate(self):
+        scenes = self._require_scenes()
+        return {
+            'type': 'ImageCollection',
+            'features': [{'type': 'Image', 'id': s['system:index'],
+                          'properties': {k: v for k, v in s.items() if not k.startswith('_')}}
+                         for s in scenes]
+        }
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def op(*args, **kwargs):
+            return self._derive(name, args=_args_repr(args, kwargs))
+        return op
+
+
+class Task:
+    """Tarefa de exportação simulada."""
+
+    def __init__(self, config):
+        self.config = config
+        self.id = f"standin-task-{zlib.crc32(repr(sorted(config)).encode('utf-8')):08x}"
+
+    def start(self):
+        return backend.rpc('export_start', None)
+
+    def status(self):
+        return backend.rpc('export_status', {'id': self.id, 'state': 'COMPLETED'}, 64)
+
+
+def _to_drive(image=None, description='myExportImageTask', **kwargs):
+    return Task(dict(kwargs, image=image._expr if image is not None else None, description=description))
+
+
+batch = types.SimpleNamespace(
+    Task=Task,
+    Export=types.SimpleNamespace(image=types.SimpleNamespace(toDrive=_to_drive, toCloudStorage=_to_drive))
+)
+
+
+def _compute_pixels(request):
+    """Devolve um bloco NPY (int16, um campo por banda) do tamanho pedido."""
+    import numpy as np
+
+    grid = request['grid']['dimensions']
+    image = request['expression']
+    dtype = np.dtype([(band, '<i2') for band in image._bands])
+    block = np.zeros((grid['height'], grid['width']), dtype=dtype)
+    buffer = io.BytesIO()
+    np.save(buffer, block)
+    data = buffer.getvalue()
+    return backend.rpc('computePixels', data, len(data), grid['width'] * grid['height'])
+
+
+data = types.SimpleNamespace(computePixels=_compute_pixels)
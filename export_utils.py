@@ -0,0 +1,160 @@
+import ee
+
+
+# Grade nativa de cada sensor: banda usada como referência de projeção e resolução (m)
+NATIVE_GRID_BANDS = {
+    'COPERNICUS/S2_SR_HARMONIZED': ('B4', 10),
+    'COPERNICUS/S1_GRD': ('VV', 10),
+    'LANDSAT/LC08/C02/T1_L2': ('SR_B2', 30),
+    'LANDSAT/LT05/C02/T1_L2': ('SR_B2', 30),
+    'MODIS/061/MOD09GQ': ('sur_refl_b01', 250),
+    'MODIS/061/MYD09GQ': ('sur_refl_b01', 250),
+}
+
+# Índice contínuo de cada sensor e fator de escala para int16
+# (MNDWI/NDWI x 10000; VV em centi-dB)
+INDEX_BANDS = {
+    'COPERNICUS/S2_SR_HARMONIZED': ('MNDWI', 10000),
+    'COPERNICUS/S1_GRD': ('VV', 100),
+    'LANDSAT/LC08/C02/T1_L2': ('MNDWI', 10000),
+    'LANDSAT/LT05/C02/T1_L2': ('MNDWI', 10000),
+    'MODIS/061/MOD09GQ': ('NDWI', 10000),
+    'MODIS/061/MYD09GQ': ('NDWI', 10000),
+}
+
+# Valores nodata dos produtos analíticos
+MASK_NODATA = 255
+INDEX_NODATA = -32768
+
+
+def native_grid(reference_image, band):
+    """
+    Obtém a projeção nativa (crs + crsTransform) de uma banda da cena original.
+
+    Mosaicos e composições perdem a projeção da fonte (passam a WGS84 1°),
+    por isso a referência deve ser uma cena da coleção (ex.: collection.first()).
+
+    Parâmetros:
+    - reference_image: Imagem do Earth Engine com a projeção de origem
+    - band: Banda usada como referência da grade
+
+    Retorna:
+    - Dicionário com 'crs' e 'crsTransform' prontos para o Export
+    """
+    proj = reference_image.select(band).projection().getInfo()
+    # MODIS (sinusoidal) não possui código EPSG, apenas WKT
+    crs = proj.get('crs') or proj.get('wkt')
+    return {'crs': crs, 'crsTransform': proj['transform']}
+
+
+def export_grid_params(reference_image, sensor, scale=None, crs=None):
+    """
+    Define a grade de exportação: nativa por padrão, reamostrada apenas se pedido.
+
+    Parâmetros:
+    - reference_image: Cena original do sensor (define a grade nativa)
+    - sensor: Nome da coleção (chave de NATIVE_GRID_BANDS)
+    - scale: Resolução em metros para reamostragem explícita (padrão: None = nativa)
+    - crs: CRS para reprojeção explícita (padrão: None = CRS nativo)
+
+    Retorna:
+    - Dicionário com 'crs' e 'crsTransform' ou 'crs' e 'scale'
+    """
+    band, _ = NATIVE_GRID_BANDS[sensor]
+    grid = native_grid(reference_image, band)
+    if scale is None and crs is None:
+        return grid
+    return {
+        'crs': crs if crs is not None else grid['crs'],
+        'scale': scale if scale is not None else NATIVE_GRID_BANDS[sensor][1]
+    }
+
+
+def analytic_flood_mask(water_mask, nodata=MASK_NODATA):
+    """
+    Converte a máscara de água em raster analítico de 1 banda uint8.
+
+    Substitui o RGB visualizado (3 bandas de 8 bits) na exportação:
+    1 = água, 0 = seco, nodata = sem observação (fora da cena ou nuvem).
+
+    Parâmetros:
+    - water_mask: Imagem booleana (ex.: MNDWI > 0), com máscara de nuvens/cobertura
+    - nodata: Valor para pixels sem observação (padrão: 255)
+
+    Retorna:
+    - Imagem uint8 de banda única 'FLOOD'
+    """
+    return water_mask.rename('FLOOD').toUint8().unmask(nodata)
+
+
+def quantize_band(image, band, scale, offset=0, nodata=INDEX_NODATA):
+    """
+    Quantiza uma banda contínua em int16: valor = round(banda * scale + offset).
+
+    Parâmetros:
+    - image: Imagem do Earth Engine
+    - band: Banda a quantizar (ex.: 'MNDWI', 'NDWI', 'VV')
+    - scale: Fator de escala (ex.: 10000 para índices, 100 para dB)
+    - offset: Deslocamento somado após a escala (padrão: 0)
+    - nodata: Valor para pixels mascarados (padrão: -32768)
+
+    Retorna:
+    - Imagem int16 de banda única
+    """
+    return image.select(band).multiply(scale).add(offset).round().toInt16().unmask(nodata)
+
+
+def scaled_index(image, sensor):
+    """
+    Retorna o índice contínuo do sensor (MNDWI/NDWI/VV) como int16 escalado.
+
+    Parâmetros:
+    - image: Imagem com a banda de índice já calculada
+    - sensor: Nome da coleção (chave de INDEX_BANDS)
+
+    Retorna:
+    - Imagem int16 (índice x 10000 ou VV em centi-dB)
+    """
+    band, scale = INDEX_BANDS[sensor]
+    return quantize_band(image, band, scale)
+
+
+def export_image_to_drive(image, description, region, reference_image, sensor,
+                          scale=None, crs=None, resampling=None, nodata=None, maxPixels=1e9, grid=None):
+    """
+    Cria a tarefa de exportação para o Drive na grade nativa do sensor.
+
+    A reamostragem só acontece quando scale/crs são informados; nesse caso
+    'resampling' ('bilinear' ou 'bicubic') define o método (padrão do EE: vizinho
+    mais próximo, adequado para máscaras).
+
+    Parâmetros:
+    - image: Imagem a exportar
+    - description: Nome da tarefa/arquivo exportado
+    - region: Região de recorte da exportação
+    - reference_image: Cena original do sensor (define a grade nativa)
+    - sensor: Nome da coleção (chave de NATIVE_GRID_BANDS)
+    - scale, crs, resampling: Reamostragem explícita (opcional)
+    - nodata: Valor nodata gravado no GeoTIFF (opcional)
+    - grid: Resultado de export_grid_params já obtido para a mesma cena (evita
+      uma chamada ao servidor por exportação; opcional)
+
+    Retorna:
+    - ee.batch.Task (não iniciada)
+    """
+    if grid is None:
+        grid = export_grid_params(reference_image, sensor, scale=scale, crs=crs)
+    if resampling is not None and (scale is not None or crs is not None):
+        image = image.resample(resampling)
+
+    format_options = {'noData': nodata} if nodata is not None else None
+
+    return ee.batch.Export.image.toDrive(
+        image=image,
+        description=description,
+        fileFormat='GeoTIFF',
+        region=region,
+        maxPixels=maxPixels,
+        formatOptions=format_options,
+        **grid
+    )
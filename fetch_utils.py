@@ -0,0 +1,332 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import ee
+import numpy as np
+
+from download_utils import grid_window, pixel_request, tile_layout
+from export_utils import INDEX_BANDS, INDEX_NODATA, NATIVE_GRID_BANDS, native_grid, quantize_band
+
+
+# Codificação int16 das reflectâncias de cada sensor: (a, b) tal que
+# bruto = round(banda * a + b) representa a reflectância x 10000
+REFLECTANCE_ENCODING = {
+    'COPERNICUS/S2_SR_HARMONIZED': (1, 0),            # DN já é reflectância x 10000
+    'LANDSAT/LC08/C02/T1_L2': (0.275, -2000),         # DN * 2.75e-5 - 0.2
+    'LANDSAT/LT05/C02/T1_L2': (0.275, -2000),
+    'MODIS/061/MOD09GQ': (1, 0),                      # Já em reflectância x 10000
+    'MODIS/061/MYD09GQ': (1, 0),
+}
+
+# Sentinel-1: todas as bandas (VV, VH, angle) em centésimos (dB x 100), como o índice
+BACKSCATTER_ENCODING = {
+    'COPERNICUS/S1_GRD': 100,
+}
+
+# Bandas do índice de água calculado localmente (mesmas do servidor)
+LOCAL_INDEX_BANDS = {
+    'COPERNICUS/S2_SR_HARMONIZED': ('B3', 'B11'),
+    'LANDSAT/LC08/C02/T1_L2': ('SR_B2', 'SR_B5'),
+    'LANDSAT/LT05/C02/T1_L2': ('SR_B2', 'SR_B5'),
+    'MODIS/061/MOD09GQ': ('sur_refl_b01', 'sur_refl_b02'),
+    'MODIS/061/MYD09GQ': ('sur_refl_b01', 'sur_refl_b02'),
+}
+
+# Limiar de água do Sentinel-1 (VV em dB)
+S1_VV_THRESHOLD = -17
+
+
+def band_encoding(sensor, band):
+    """
+    Retorna a codificação int16 de uma banda do sensor.
+
+    Parâmetros:
+    - sensor: Nome da coleção
+    - band: Nome da banda (índice ou reflectância)
+
+    Retorna:
+    - Dicionário com 'a', 'b' (codificação no servidor: round(banda * a + b)) e
+      'scale_factor', 'add_offset' (valor físico = bruto * scale_factor + add_offset)
+    """
+    if sensor not in INDEX_BANDS:
+        raise ValueError(f"sensor sem codificação int16: {sensor!r}")
+    index_band, index_scale = INDEX_BANDS[sensor]
+    if band == index_band:
+        # MNDWI/NDWI x 10000; VV em centi-dB
+        return {'a': index_scale, 'b': 0, 'scale_factor': 1 / index_scale, 'add_offset': 0}
+
+    if sensor in BACKSCATTER_ENCODING:
+        scale = BACKSCATTER_ENCODING[sensor]
+        return {'a': scale, 'b': 0, 'scale_factor': 1 / scale, 'add_offset': 0}
+    if sensor not in REFLECTANCE_ENCODING:
+        raise ValueError(f"sem codificação int16 para a banda {band!r} de {sensor!r}")
+    a, b = REFLECTANCE_ENCODING[sensor]
+    return {'a': a, 'b': b, 'scale_factor': 1e-4, 'add_offset': 0}
+
+
+class QuantizedArray:
+    """
+    Array int16 quantizado com desquantização preguiçosa no cliente.
+
+    Os metadados seguem a convenção CF (scale_factor, add_offset, _FillValue);
+    'values' só é calculado (em float32, nodata -> NaN) no primeiro acesso.
+    """
+
+    def __init__(self, raw, scale_factor, add_offset=0, nodata=INDEX_NODATA, band=None):
+        self.raw = raw
+        self.attrs = {
+            'band': band,
+            'scale_factor': scale_factor,
+            'add_offset': add_offset,
+            '_FillValue': nodata
+        }
+        self._values = None
+
+    @property
+    def values(self):
+        if self._values is None:
+            values = self.raw.astype(np.float32) * np.float32(self.attrs['scale_factor'])
+            values += np.float32(self.attrs['add_offset'])
+            values[self.raw == self.attrs['_FillValue']] = np.nan
+            self._values = values
+        return self._values
+
+    @property
+    def shape(self):
+        return self.raw.shape
+
+    @property
+    def nbytes(self):
+        return self.raw.nbytes
+
+    def __array__(self, dtype=None):
+        return self.values if dtype is None else self.values.astype(dtype)
+
+    def __repr__(self):
+        return f"QuantizedArray(band={self.attrs['band']!r}, shape={self.raw.shape}, dtype={self.raw.dtype})"
+
+
+def encode_bands(image, sensor, bands):
+    """
+    Monta a imagem int16 a ser transferida, quantizando cada banda no servidor.
+
+    Parâmetros:
+    - image: Imagem com as bandas de reflectância e o índice já calculado
+    - sensor: Nome da coleção
+    - bands: Lista de bandas a buscar
+
+    Retorna:
+    - ee.Image com todas as bandas em int16 (nodata = INDEX_NODATA)
+    """
+    encoded = []
+    for band in bands:
+        enc = band_encoding(sensor, band)
+        encoded.append(quantize_band(image, band, enc['a'], enc['b']).rename(band))
+    return ee.Image.cat(encoded)
+
+
+def npy_view(data):
+    """
+    Interpreta a resposta NPY do computePixels sem copiar os bytes.
+
+    Parâmetros:
+    - data: Bytes de um arquivo .npy (array estruturado, um campo por banda)
+
+    Retorna:
+    - Array estruturado (linhas, colunas) apoiado diretamente em 'data'
+    """
+    header = io.BytesIO(data)
+    version = np.lib.format.read_magic(header)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(header)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(header)
+    array = np.frombuffer(data, dtype=dtype, offset=header.tell())
+    return array.reshape(shape, order='F' if fortran_order else 'C')
+
+
+def band_views(structured):
+    """Retorna um dicionário banda -> view (sem cópia) de um array estruturado."""
+    return {name: structured[name] for name in structured.dtype.names}
+
+
+def fetch_structured(image, grid, transform, width, height, tile_size=512, max_workers=8):
+    """
+    Busca a janela em blocos NPY e devolve um único array estruturado.
+
+    Com um único bloco o array é a própria resposta (zero cópia); com vários,
+    cada bloco é copiado uma vez para o destino e descartado, de modo que o pico
+    de memória fica em torno de uma cópia dos bytes brutos.
+
+    Parâmetros:
+    - image: Imagem a buscar (todas as bandas do mesmo tipo ou tipos mistos)
+    - grid: Dicionário com 'crs' e 'crsTransform' da grade nativa
+    - transform, width, height: Janela alinhada (ver grid_window)
+    - tile_size: Tamanho dos blocos de download (padrão: 512)
+    - max_workers: Número de requisições simultâneas (padrão: 8)
+
+    Retorna:
+    - Array estruturado (linhas, colunas), um campo por banda
+    """
+    def fetch_block(tile):
+        col, row, w, h = tile
+        request = pixel_request(image, grid, transform, col, row, w, h, file_format='NPY')
+        return npy_view(ee.data.computePixels(request))
+
+    tiles = tile_layout(width, height, tile_size)
+    if len(tiles) == 1:
+        return fetch_block(tiles[0])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        structured = None
+        for (col, row, w, h), block in zip(tiles, executor.map(fetch_block, tiles)):
+            if structured is None:
+                structured = np.empty((height, width), dtype=block.dtype)
+            structured[row:row + h, col:col + w] = block
+    return structured
+
+
+def normalized_difference(first, second, nodata=INDEX_NODATA):
+    """
+    Equivalente local de ee.Image.normalizedDifference: (a - b) / (a + b).
+
+    Aceita views de bandas inteiras (ex.: band_views(...)['B3']) ou QuantizedArray
+    sem copiá-las: a razão não depende da escala, então usa os valores brutos e
+    calcula diretamente em float32. Pixels com nodata em qualquer das bandas
+    ficam NaN (como a máscara do servidor).
+
+    Parâmetros:
+    - first, second: Bandas (views int16 ou QuantizedArray)
+    - nodata: Valor bruto de nodata das views (QuantizedArray usa o seu _FillValue)
+    """
+    invalid = _nodata_mask(first, nodata) | _nodata_mask(second, nodata)
+    first = getattr(first, 'raw', first)
+    second = getattr(second, 'raw', second)
+    numerator = np.subtract(first, second, dtype=np.float32)
+    denominator = np.add(first, second, dtype=np.float32)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.divide(numerator, denominator, out=numerator)
+    result[invalid] = np.nan
+    return result
+
+
+def _nodata_mask(band, nodata):
+    """Pixels nodata de uma banda (view int16 ou QuantizedArray)."""
+    if isinstance(band, QuantizedArray):
+        return band.raw == band.attrs['_FillValue']
+    return np.asarray(band) == nodata
+
+
+def local_water_index(views, sensor):
+    """
+    Calcula localmente o índice de água (MNDWI/NDWI) a partir das views das bandas.
+
+    Parâmetros:
+    - views: Dicionário banda -> array (ver band_views)
+    - sensor: Nome da coleção (chave de LOCAL_INDEX_BANDS)
+
+    Retorna:
+    - Array float32 do índice (NaN onde alguma banda é nodata)
+    """
+    first, second = LOCAL_INDEX_BANDS[sensor]
+    return normalized_difference(views[first], views[second])
+
+
+def local_flood_mask(views, sensor):
+    """
+    Calcula localmente a máscara de água com os mesmos limiares dos scripts.
+
+    Sentinel-2/Landsat: MNDWI > 0; MODIS: NDWI < 0; Sentinel-1: VV < -17 dB.
+    Pixels nodata nunca são marcados como água.
+
+    Retorna:
+    - Array booleano
+    """
+    if sensor == 'COPERNICUS/S1_GRD':
+        vv = views['VV']
+        if not isinstance(vv, QuantizedArray):
+            # View bruta (centi-dB): o limiar é comparado no domínio quantizado
+            enc = band_encoding(sensor, 'VV')
+            vv = QuantizedArray(vv, enc['scale_factor'], enc['add_offset'], band='VV')
+        return index_flood_mask(vv, sensor)
+    return index_flood_mask(local_water_index(views, sensor), sensor)
+
+
+def index_flood_mask(index, sensor):
+    """
+    Aplica o limiar de água do sensor a um índice já calculado (MNDWI/NDWI/VV).
+
+    Para QuantizedArray compara no domínio quantizado, sem desquantizar, e
+    pixels nodata nunca são marcados como água.
+
+    Parâmetros:
+    - index: Array do índice (float) ou QuantizedArray
+    - sensor: Nome da coleção
+
+    Retorna:
+    - Array booleano
+    """
+    if sensor == 'COPERNICUS/S1_GRD':
+        threshold, is_water = S1_VV_THRESHOLD, np.less
+    elif sensor.startswith('MODIS/'):
+        threshold, is_water = 0, np.less
+    else:
+        threshold, is_water = 0, np.greater
+
+    if isinstance(index, QuantizedArray):
+        raw_threshold = (threshold - index.attrs['add_offset']) / index.attrs['scale_factor']
+        return is_water(index.raw, raw_threshold) & (index.raw != index.attrs['_FillValue'])
+    return is_water(index, threshold)
+
+
+def fetch_quantized(image, region, reference_image, sensor, bands,
+                    tile_size=512, max_workers=8):
+    """
+    Busca pixels para processamento local em int16 (4x menos que float64).
+
+    Parâmetros:
+    - image: Imagem com as bandas de reflectância e o índice já calculado
+    - region: Região de interesse
+    - reference_image: Cena original do sensor (define a grade nativa)
+    - sensor: Nome da coleção
+    - bands: Lista de bandas (ex.: ['B4', 'B3', 'B2', 'MNDWI'])
+    - tile_size, max_workers: Parâmetros do download paralelo
+
+    Retorna:
+    - Tupla (dicionário banda -> QuantizedArray, Affine, crs)
+    """
+    grid = native_grid(reference_image, NATIVE_GRID_BANDS[sensor][0])
+    transform, width, height = grid_window(region, grid)
+    arrays = fetch_quantized_window(image, grid, transform, width, height, sensor, bands,
+                                    tile_size=tile_size, max_workers=max_workers)
+    return arrays, transform, grid['crs']
+
+
+def fetch_quantized_window(image, grid, transform, width, height, sensor, bands,
+                           tile_size=512, max_workers=8):
+    """
+    Como fetch_quantized, para uma janela já calculada (sem chamadas para a grade).
+
+    Útil para buscar várias imagens na mesma grade: native_grid e grid_window
+    são resolvidos uma vez e reaproveitados.
+
+    Parâmetros:
+    - image: Imagem com as bandas de reflectância e o índice já calculado
+    - grid: Dicionário com 'crs' e 'crsTransform' da grade nativa
+    - transform, width, height: Janela alinhada (ver grid_window)
+    - sensor: Nome da coleção
+    - bands: Lista de bandas
+    - tile_size, max_workers: Parâmetros do download paralelo
+
+    Retorna:
+    - Dicionário banda -> QuantizedArray
+    """
+    structured = fetch_structured(encode_bands(image, sensor, bands), grid, transform, width, height,
+                                  tile_size=tile_size, max_workers=max_workers)
+
+    # Cada QuantizedArray é uma view do array estruturado (sem cópia)
+    arrays = {}
+    for band, raw in band_views(structured).items():
+        enc = band_encoding(sensor, band)
+        arrays[band] = QuantizedArray(raw, enc['scale_factor'], enc['add_offset'], band=band)
+    return arrays
@@ -0,0 +1,244 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import ee
+
+import instrumentation
+from export_utils import NATIVE_GRID_BANDS
+from mosaic_utils import image_for_date
+from pipeline import (
+    AOI_STYLE, FLOOD_VIS, SENSOR_FLOWS, aoi_bounds, aoi_geometry, analysis_window, build_rgb, daily_composites,
+    daily_stretches, harmonize, source_collection, with_index
+)
+from scene_index import CLOUD_PROPERTIES
+
+
+# Linha do tempo multissensor: os inventários de todos os sensores rodam em
+# paralelo e, para cada dia, só a melhor observação disponível (nuvens,
+# resolução e latência de disponibilização) é processada e renderizada.
+
+# Sensores da fusão (Landsat 5 fica de fora: só dados históricos). MODIS entra
+# como Terra + Aqua combinados: um composto melhor pixel por dia
+FUSION_SENSORS = ('sentinel1', 'sentinel2', 'landsat8', 'modis')
+
+# Latência típica entre a aquisição e a disponibilização no EE (horas)
+LATENCY_HOURS = {
+    'sentinel1': 12,
+    'sentinel2': 24,
+    'landsat8': 24,
+    'landsat5': 24,
+    'modis_terra': 6,
+    'modis_aqua': 6,
+    'modis': 6,
+}
+
+# Fração sem nuvens assumida quando a coleção não informa nuvens (radar: 1)
+DEFAULT_CLEAR = {
+    'sentinel1': 1.0,
+    'modis_terra': 0.5,
+    'modis_aqua': 0.5,
+    'modis': 0.5,
+}
+
+# Pesos da pontuação de cada observação (soma 1)
+WEIGHTS = {'clear': 0.5, 'resolution': 0.3, 'latency': 0.2}
+
+
+def score(sensor, clear):
+    """
+    Pontuação de uma observação (0 a 1; maior é melhor).
+
+    Parâmetros:
+    - sensor: Chave de pipeline.SENSOR_FLOWS
+    - clear: Fração sem nuvens (0 a 1)
+    """
+    resolution = NATIVE_GRID_BANDS[SENSOR_FLOWS[sensor]['collection']][1]
+    return (
+        WEIGHTS['clear'] * clear
+        + WEIGHTS['resolution'] * min(1.0, 10 / resolution)
+        + WEIGHTS['latency'] / (1 + LATENCY_HOURS[sensor] / 24)
+    )
+
+
+def sensor_observations(sensor, geometry, bounds, start_date, end_date, scene_index=None):
+    """
+    Coleção (com índice de água) e observações de um sensor, em uma única chamada ao servidor.
+
+    Retorna:
+    - Tupla (coleção, lista de dicionários com 'sensor', 'date', 'system:index',
+      'time_start', 'clear' e 'scenes', uma entrada por dia)
+    """
+    flow = SENSOR_FLOWS[sensor]
+    collection = flow['filters'](source_collection(flow, geometry, start_date, end_date))
+    index_collection = with_index(flow, collection)
+    cloud_property = CLOUD_PROPERTIES.get(flow['collection'])
+
+    if scene_index is not None:
+        rows = []
+        for collection_id in flow.get('collections', [flow['collection']]):
+            scene_index.sync(collection_id, bounds, start_date, end_date)
+            rows += scene_index.query(collection_id, bounds, start_date, end_date, **flow['index_query'])
+        scenes = [(r['date'], r['system_index'], r['time_start'], r['cloud']) for r in rows]
+    else:
+        def get_image_info(image):
+            return ee.Feature(None, {
+                'date': image.date().format('YYYY-MM-dd'),
+                'system:index': image.get('system:index'),
+                'system:time_start': image.get('system:time_start'),
+                'cloud': image.get(cloud_property) if cloud_property else None
+            })
+
+        image_info = collection.map(get_image_info)
+        info = ee.Dictionary({
+            key: image_info.aggregate_array(key)
+            for key in ('date', 'system:index', 'system:time_start', 'cloud')
+        }).getInfo()
+        # aggregate_array ignora valores nulos: sem nuvens em todas as cenas, não há como alinhar
+        cloud = info['cloud'] if len(info['cloud']) == len(info['date']) else [None] * len(info['date'])
+        scenes = list(zip(info['date'], info['system:index'], info['system:time_start'], cloud))
+
+    by_date = {}
+    for date, idx, time_start, cloud in scenes:
+        clear = DEFAULT_CLEAR.get(sensor, 0.5) if cloud is None else max(0.0, 1 - cloud / 100)
+        obs = by_date.get(date)
+        if obs is None:
+            by_date[date] = {'sensor': sensor, 'date': date, 'system:index': idx,
+                             'time_start': time_start, 'clear': clear, 'scenes': 1}
+        else:
+            # Mosaico do dia: primeira aquisição e a fração média sem nuvens
+            obs['clear'] = (obs['clear'] * obs['scenes'] + clear) / (obs['scenes'] + 1)
+            obs['scenes'] += 1
+            if time_start < obs['time_start']:
+                obs.update({'system:index': idx, 'time_start': time_start})
+    observations = sorted(by_date.values(), key=lambda o: o['time_start'])
+    for obs in observations:
+        obs['score'] = score(sensor, obs['clear'])
+    return index_collection, observations
+
+
+def build_timeline(observations):
+    """
+    Escolhe a melhor observação de cada dia.
+
+    Empates na pontuação ficam com a aquisição mais cedo.
+
+    Retorna:
+    - Lista por dia (ordem cronológica) de dicionários com a observação
+      escolhida e 'alternatives' (as demais, da melhor para a pior)
+    """
+    by_day = {}
+    for obs in observations:
+        by_day.setdefault(obs['date'], []).append(obs)
+    timeline = []
+    for date in sorted(by_day):
+        ranked = sorted(by_day[date], key=lambda o: (-o['score'], o['time_start']))
+        timeline.append(dict(ranked[0], alternatives=[
+            {'sensor': o['sensor'], 'score': o['score'], 'clear': o['clear']} for o in ranked[1:]
+        ]))
+    return timeline
+
+
+def run_fusion(lon, lat, reference_date, dias_anteriores=20, dias_posteriores=20, buffer_degrees=0.1,
+               sensors=FUSION_SENSORS, render=True, scene_index=None):
+    """
+    Linha do tempo fundida dos sensores com o mapa de inundação da melhor observação de cada dia.
+
+    Os inventários rodam em paralelo (um por sensor); só as observações
+    escolhidas passam pelo mosaico, stretch (um lote por sensor) e renderização.
+
+    Parâmetros:
+    - lon, lat: Coordenada de interesse
+    - reference_date: Data de referência (YYYY-MM-DD)
+    - dias_anteriores, dias_posteriores: Janela de análise em dias
+    - buffer_degrees: Buffer da AOI em graus
+    - sensors: Chaves de pipeline.SENSOR_FLOWS consideradas
+    - render: Obtém os map IDs das camadas escolhidas
+    - scene_index: scene_index.SceneIndex para os inventários (opcional)
+
+    Retorna:
+    - Dicionário com 'timeline' (ver build_timeline) e 'panels'
+    """
+    geometry = aoi_geometry(lon, lat, buffer_degrees)
+    bounds = aoi_bounds(lon, lat, buffer_degrees)
+    start_date, end_date = analysis_window(reference_date, dias_anteriores, dias_posteriores)
+
+    instrumentation.set_stage('inventory')
+    with ThreadPoolExecutor(max_workers=len(sensors)) as executor:
+        futures = {
+            sensor: executor.submit(sensor_observations, sensor, geometry, bounds, start_date, end_date, scene_index)
+            for sensor in sensors
+        }
+        inventories = {sensor: future.result() for sensor, future in futures.items()}
+
+    timeline = build_timeline([obs for _, observations in inventories.values() for obs in observations])
+
+    instrumentation.set_stage('stretch')
+    # Mosaicos diários e stretch em lote por sensor (só os dias escolhidos);
+    # o Sentinel-1 é corrigido por trilha antes do mosaico, como em run_flow
+    chosen = {}
+    for day in timeline:
+        chosen.setdefault(day['sensor'], []).append(day['date'])
+    daily = {
+        sensor: daily_composites(
+            SENSOR_FLOWS[sensor],
+            harmonize(SENSOR_FLOWS[sensor], inventories[sensor][0], geometry, reference_date),
+            dates
+        )
+        for sensor, dates in chosen.items()
+    }
+    stretches = {sensor: daily_stretches(SENSOR_FLOWS[sensor], daily[sensor], geometry) for sensor in chosen}
+
+    panels = []
+    for day in timeline:
+        flow = SENSOR_FLOWS[day['sensor']]
+        image = image_for_date(daily[day['sensor']], day['date'])
+        rgb_image, vis_params = build_rgb(flow, image, geometry, stretches[day['sensor']].get(day['date']))
+        panels.append({
+            'date': day['date'],
+            'sensor': day['sensor'],
+            'rgb': rgb_image,
+            'vis_params': vis_params,
+            'flood': flow['water'](image).selfMask().visualize(**FLOOD_VIS)
+        })
+
+    if render and panels:
+        instrumentation.set_stage('render')
+        aoi_layer = ee.FeatureCollection([ee.Feature(geometry)]).style(**AOI_STYLE)
+        aoi_layer.getMapId({})
+        for panel in panels:
+            panel['rgb'].getMapId({})
+            panel['flood'].getMapId({})
+    return {'timeline': timeline, 'panels': panels}
+
+
+def format_timeline(timeline):
+    """Tabela da linha do tempo (uma linha por dia)."""
+    lines = [f"{'Data':<12}{'Sensor':<13}{'Sem nuvens':>11}{'Pontuação':>11}  Alternativas"]
+    for day in timeline:
+        alternatives = ', '.join(f"{a['sensor']} ({a['score']:.2f})" for a in day['alternatives'])
+        lines.append(
+            f"{day['date']:<12}{day['sensor']:<13}{day['clear']:>11.0%}{day['score']:>11.2f}  {alternatives or '-'}"
+        )
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Linha do tempo multissensor de inundação')
+    parser.add_argument('lon', type=float)
+    parser.add_argument('lat', type=float)
+    parser.add_argument('reference_date', help='data de referência (YYYY-MM-DD)')
+    parser.add_argument('--before', type=int, default=20, help='dias antes da data de referência')
+    parser.add_argument('--after', type=int, default=20, help='dias depois da data de referência')
+    parser.add_argument('--buffer', type=float, default=0.1, help='buffer da AOI em graus')
+    parser.add_argument('--sensors', nargs='+', choices=list(SENSOR_FLOWS), default=list(FUSION_SENSORS))
+    parser.add_argument('--project', default=None, help='projeto do Earth Engine')
+    args = parser.parse_args(argv)
+
+    ee.Initialize(project=args.project)
+    result = run_fusion(args.lon, args.lat, args.reference_date, args.before, args.after, args.buffer,
+                        sensors=args.sensors, render=False)
+    print(format_timeline(result['timeline']))
+
+
+if __name__ == '__main__':
+    main()
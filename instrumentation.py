@@ -0,0 +1,289 @@
+import functools
+import json
+import os
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+import ee
+
+
+# Chamadas bloqueantes ao Earth Engine instrumentadas: (objeto, atributo, tipo)
+EE_CALLS = [
+    ('ComputedObject', 'getInfo', 'getInfo'),
+    ('Image', 'getMapId', 'getMapId'),
+    ('Image', 'getThumbURL', 'getThumbURL'),
+    ('ImageCollection', 'getVideoThumbURL', 'getVideoThumbURL'),
+    ('data', 'computePixels', 'computePixels'),
+    ('batch.Task', 'start', 'export_start'),
+    ('batch.Task', 'status', 'export_status'),
+]
+
+
+class Tracer:
+    """
+    Registra tempo de parede, bytes e contagem de chamadas por etapa do pipeline.
+
+    Cada evento é uma tupla simples guardada em lista (sob lock), o que mantém
+    o custo baixo o suficiente para ficar ligado em produção. Com
+    capture_sites=True também guarda o ponto do código que fez cada chamada
+    (usado pelo controle de orçamento de RPCs).
+    """
+
+    def __init__(self, capture_sites=False):
+        self.capture_sites = capture_sites
+        self.events = []
+        self.stages = []
+        self._lock = threading.Lock()
+        self._stage = 'setup'
+        self._stage_start = time.perf_counter()
+        self._origin = self._stage_start
+
+    @property
+    def current_stage(self):
+        return self._stage
+
+    def record(self, kind, name, wall, payload_bytes=0, stage=None, site=None):
+        """Registra um evento (chamada ao EE ou etapa local)."""
+        with self._lock:
+            self.events.append((stage or self._stage, kind, name, wall, payload_bytes, site))
+
+    def set_stage(self, name):
+        """Encerra a etapa atual e inicia 'name' (uso linear, como nos scripts)."""
+        now = time.perf_counter()
+        with self._lock:
+            self.stages.append((self._stage, self._stage_start - self._origin, now - self._stage_start))
+            self._stage = name
+            self._stage_start = now
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager de etapa; volta à etapa anterior ao sair."""
+        previous = self._stage
+        self.set_stage(name)
+        try:
+            yield
+        finally:
+            self.set_stage(previous)
+
+    def finish(self):
+        """Fecha a etapa corrente (chamado antes do resumo)."""
+        self.set_stage(self._stage)
+
+    def summary_rows(self):
+        """
+        Agrega os eventos por etapa.
+
+        Retorna:
+        - Lista de dicionários com 'stage', 'wall_s', 'rpc_count', 'rpc_wall_s', 'bytes' e 'calls'
+        """
+        rows = {}
+        with self._lock:
+            stages = list(self.stages)
+            events = list(self.events)
+        for name, _, wall in stages:
+            row = rows.setdefault(name, {'stage': name, 'wall_s': 0.0, 'rpc_count': 0,
+                                         'rpc_wall_s': 0.0, 'bytes': 0, 'calls': {}})
+            row['wall_s'] += wall
+        for stage, kind, _, wall, payload, _ in events:
+            row = rows.setdefault(stage, {'stage': stage, 'wall_s': 0.0, 'rpc_count': 0,
+                                          'rpc_wall_s': 0.0, 'bytes': 0, 'calls': {}})
+            row['calls'][kind] = row['calls'].get(kind, 0) + 1
+            if kind == 'local':
+                continue
+            row['rpc_count'] += 1
+            row['rpc_wall_s'] += wall
+            row['bytes'] += payload
+        return [row for row in rows.values() if row['wall_s'] > 0 or row['rpc_count'] > 0]
+
+    def summary(self):
+        """Tabela de texto com o resumo por etapa."""
+        lines = [f"{'Etapa':<14}{'Tempo (s)':>11}{'RPCs':>7}{'RPC (s)':>10}{'Bytes':>12}  Chamadas"]
+        for row in self.summary_rows():
+            calls = ', '.join(f"{k}={v}" for k, v in sorted(row['calls'].items()))
+            lines.append(
+                f"{row['stage']:<14}{row['wall_s']:>11.2f}{row['rpc_count']:>7}"
+                f"{row['rpc_wall_s']:>10.2f}{row['bytes']:>12}  {calls}"
+            )
+        return '\n'.join(lines)
+
+    def trace(self):
+        """Trace legível por máquina: etapas, eventos e resumo."""
+        with self._lock:
+            stages = list(self.stages)
+            events = list(self.events)
+        return {
+            'stages': [{'stage': s, 'start_s': start, 'wall_s': wall} for s, start, wall in stages],
+            'events': [
+                {'stage': s, 'kind': k, 'name': n, 'wall_s': w, 'bytes': b, 'site': site}
+                for s, k, n, w, b, site in events
+            ],
+            'summary': self.summary_rows()
+        }
+
+    def write_trace(self, filename):
+        """Grava o trace em JSON."""
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.trace(), f, indent=2)
+        return filename
+
+
+tracer = Tracer()
+
+# Etapa atribuída às chamadas da thread corrente (ver attributed)
+_local = threading.local()
+
+
+def _payload_size(result):
+    """Tamanho aproximado da resposta em bytes."""
+    if isinstance(result, (bytes, bytearray)):
+        return len(result)
+    if isinstance(result, str):
+        return len(result)
+    try:
+        return len(json.dumps(result, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _call_name(obj):
+    """Nome da função do EE que gerou o objeto (ex.: 'Image.reduceRegion')."""
+    func = getattr(obj, 'func', None)
+    try:
+        return func.getSignature()['name']
+    except Exception:
+        return type(obj).__name__
+
+
+# Arquivos ignorados ao procurar o ponto de chamada (instrumentação, cliente do
+# EE e camadas que só repassam a chamada: repetições e mapa sem interface)
+_SKIP_FILES = (os.path.abspath(__file__),)
+_SKIP_NAMES = ('ee_standin.py', 'ee_retry.py', 'script_runner.py')
+
+
+def _call_site():
+    """Primeiro quadro da pilha fora da instrumentação e do cliente do EE ('arquivo:linha em função')."""
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        filename = os.path.abspath(frame.filename)
+        if filename in _SKIP_FILES or f"{os.sep}ee{os.sep}" in filename or filename.endswith(_SKIP_NAMES):
+            continue
+        return f"{os.path.basename(frame.filename)}:{frame.lineno} em {frame.name}"
+    return None
+
+
+def _wrap(method, kind, is_method):
+    """Envolve uma chamada ao EE medindo tempo de parede e tamanho da resposta."""
+    if getattr(method, '_instrumented', False):
+        return method
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        name = _call_name(args[0]) if is_method and args else kind
+        site = _call_site() if tracer.capture_sites else None
+        stage = getattr(_local, 'stage', None)
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except Exception:
+            tracer.record(kind, f"{name} (erro)", time.perf_counter() - start, stage=stage, site=site)
+            raise
+        tracer.record(kind, name, time.perf_counter() - start, _payload_size(result), stage=stage, site=site)
+        return result
+
+    wrapper._instrumented = True
+    return wrapper
+
+
+def _resolve(ee_module, path):
+    """Resolve 'batch.Task' -> ee.batch.Task."""
+    target = ee_module
+    for part in path.split('.'):
+        target = getattr(target, part)
+    return target
+
+
+def install(ee_module=ee):
+    """
+    Instrumenta as chamadas bloqueantes do Earth Engine (getInfo, getMapId,
+    miniaturas, computePixels, início/status de exportação).
+
+    Parâmetros:
+    - ee_module: Módulo a instrumentar (padrão: ee)
+
+    Retorna:
+    - O tracer global
+    """
+    for path, attr, kind in EE_CALLS:
+        try:
+            target = _resolve(ee_module, path)
+        except AttributeError:
+            continue
+        method = getattr(target, attr, None)
+        if method is None:
+            continue
+        is_method = isinstance(target, type)
+        setattr(target, attr, _wrap(method, kind, is_method))
+    return tracer
+
+
+def reset(capture_sites=False):
+    """Substitui o tracer global por um novo (ex.: entre execuções de benchmark)."""
+    global tracer
+    tracer = Tracer(capture_sites)
+    return tracer
+
+
+def set_stage(name):
+    """Inicia uma nova etapa no tracer global."""
+    tracer.set_stage(name)
+
+
+def stage(name):
+    """Context manager de etapa no tracer global."""
+    return tracer.stage(name)
+
+
+@contextmanager
+def attributed(stage_name):
+    """
+    Atribui a 'stage_name' as chamadas ao EE feitas por esta thread no bloco.
+
+    Diferente de stage, não encerra a etapa corrente: serve para chamadas de
+    outra natureza intercaladas numa etapa (ex.: map IDs dos painéis criados
+    durante o stretch contam como 'render').
+    """
+    previous = getattr(_local, 'stage', None)
+    _local.stage = stage_name
+    try:
+        yield
+    finally:
+        _local.stage = previous
+
+
+def timed(stage_name):
+    """Decorador que mede uma etapa de processamento local."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                tracer.record('local', func.__name__, time.perf_counter() - start, stage=stage_name)
+        return wrapper
+    return decorator
+
+
+def report(filename=None):
+    """
+    Fecha a etapa corrente, imprime o resumo e (opcionalmente) grava o trace JSON.
+
+    Parâmetros:
+    - filename: Caminho do trace JSON (opcional)
+    """
+    tracer.finish()
+    print(tracer.summary())
+    if filename:
+        tracer.write_trace(filename)
+        print(f"Trace gravado em: {filename}")
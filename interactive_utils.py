@@ -0,0 +1,204 @@
+import threading
+
+import anywidget
+import geemap
+import traitlets
+from ipywidgets import HTML, Button, HBox, SelectionSlider, VBox
+
+from render_utils import resolve_rgb
+from tile_cache import add_cached_layer, cached_tile_layer
+
+
+# Estilo do contorno da área de interesse (igual ao dos mapas por data)
+AOI_STYLE = {'color': 'blue', 'fillColor': '00000000', 'weight': 2}
+
+# Mesmo estilo do cabeçalho dos painéis
+LABEL_TEMPLATE = (
+    '<div style="display: flex; justify-content: space-between; padding: 8px 12px; '
+    'background-color: #f5f5f5; border-bottom: 1px solid #ddd; font-weight: bold; font-size: 13px;">'
+    '<span>{header}</span><span>{date}</span></div>'
+)
+
+
+class ViewportTrigger(anywidget.AnyWidget):
+    """
+    Marcador sem conteúdo que avisa o kernel quando entra na área visível.
+
+    Usa um IntersectionObserver no navegador (com margem, para abrir o painel
+    um pouco antes de ele aparecer) e marca 'in_view' uma única vez.
+    """
+
+    _esm = """
+    function render({ model, el }) {
+      el.style.height = '1px';
+      const observer = new IntersectionObserver((entries) => {
+        if (entries.some((entry) => entry.isIntersecting)) {
+          observer.disconnect();
+          model.set('in_view', true);
+          model.save_changes();
+        }
+      }, { rootMargin: '200px' });
+      observer.observe(el);
+      return () => observer.disconnect();
+    }
+    export default { render };
+    """
+    in_view = traitlets.Bool(False).tag(sync=True)
+
+
+def clean_map():
+    """Cria um geemap.Map sem controles extras (mesma configuração dos painéis)."""
+    return geemap.Map(
+        toolbar_control=False,  # Remove toolbar
+        draw_control=False,     # Remove controles de desenho
+        measure_control=False,   # Remove controles de medida
+        fullscreen_control=False, # Remove controle de tela cheia
+        attribution_control=False # Remove créditos do ipyleaflet
+    )
+
+
+def time_slider_map(panels, geometry, header, zoom=12, height='700px', bounds=None):
+    """
+    Exibe todas as datas em um único mapa com seletor de data.
+
+    As camadas de uma data (RGB e áreas inundadas) só são criadas — e o
+    map ID só é obtido (ou lido do cache em disco) — quando a data é
+    selecionada pela primeira vez; depois apenas têm a visibilidade alternada.
+
+    Parâmetros:
+    - panels: Lista de dicionários com 'date', 'rgb' (ou 'build_rgb') e 'flood' (como maps_list)
+    - geometry: Área de interesse
+    - header: Texto do cabeçalho (ex.: f"{cidade_uf} - {sensor_name}")
+    - zoom: Nível de zoom inicial (padrão: 12)
+    - height: Altura do mapa (padrão: '700px')
+    - bounds: (oeste, sul, leste, norte) da AOI, usados na validação do cache de map IDs
+
+    Retorna:
+    - Widget VBox (cabeçalho, seletor de data e mapa)
+    """
+    Map = clean_map()
+    Map.layout.height = height
+    Map.addLayer(geometry, AOI_STYLE, 'Área de interesse')
+    Map.centerObject(geometry, zoom)
+
+    label = HTML()
+    slider = SelectionSlider(
+        options=[(panel['date'], i) for i, panel in enumerate(panels)],
+        description='Data',
+        continuous_update=False
+    )
+    slider.layout.width = '100%'
+
+    layers = {}  # índice do painel -> (camada RGB, camada de áreas inundadas)
+    current = {'index': None}
+
+    def show(index):
+        previous = current['index']
+        if previous is not None:
+            for layer in layers[previous]:
+                layer.visible = False
+
+        if index not in layers:
+            panel = panels[index]
+            rgb_layer = cached_tile_layer(resolve_rgb(panel), {}, f"RGB {panel['date']}", bounds=bounds)
+            flood_layer = cached_tile_layer(panel['flood'], {}, f"Áreas inundadas {panel['date']}", bounds=bounds)
+            Map.add(rgb_layer)
+            Map.add(flood_layer)
+            layers[index] = (rgb_layer, flood_layer)
+        else:
+            for layer in layers[index]:
+                layer.visible = True
+
+        current['index'] = index
+        label.value = LABEL_TEMPLATE.format(header=header, date=panels[index]['date'])
+
+    slider.observe(lambda change: show(change['new']), names='value')
+    show(0)
+
+    return VBox([label, slider, Map])
+
+
+def lazy_map_grid(panels, geometry, header, zoom=12, height='700px', eager=1, bounds=None):
+    """
+    Exibe a grade de painéis (2 por linha) com mapas criados sob demanda.
+
+    Cada painel começa como um marcador com botão; o geemap.Map, os addLayer e
+    o cálculo do stretch só acontecem quando o painel é aberto — ao rolar a
+    página até ele (ViewportTrigger) ou pelo botão. Os 'eager' primeiros
+    painéis (por padrão, só a base) são abertos em segundo plano, na ordem,
+    para que a grade seja devolvida imediatamente. Se o servidor falhar, o
+    botão volta com a mensagem de erro para uma nova tentativa.
+
+    Parâmetros:
+    - panels: Lista de dicionários com 'date', 'rgb' (ou 'build_rgb') e 'flood' (como maps_list)
+    - geometry: Área de interesse
+    - header: Texto do cabeçalho (ex.: f"{cidade_uf} - {sensor_name}")
+    - zoom: Nível de zoom inicial (padrão: 12)
+    - height: Altura dos mapas (padrão: '700px')
+    - eager: Número de painéis abertos automaticamente em segundo plano (padrão: 1)
+    - bounds: (oeste, sul, leste, norte) da AOI, usados na validação do cache de map IDs
+
+    Retorna:
+    - Widget VBox com a grade
+    """
+    containers = []
+    locks = [threading.Lock() for _ in panels]
+    loaded = set()
+
+    def materialize(i):
+        with locks[i]:
+            if i in loaded:
+                return
+            panel = panels[i]
+            label, button = containers[i].children[:2]
+            button.description = 'Carregando...'
+            button.disabled = True
+
+            try:
+                Map = clean_map()
+                Map.layout.width = '100%'
+                Map.layout.height = height
+                Map.addLayer(geometry, AOI_STYLE, 'Área de interesse')
+                add_cached_layer(Map, resolve_rgb(panel), {}, 'RGB', bounds=bounds)
+                add_cached_layer(Map, panel['flood'], {}, 'Áreas inundadas', bounds=bounds)
+                Map.centerObject(geometry, zoom)
+                Map.addLayerControl()
+            except Exception as e:
+                # Painel continua fechado: o botão mostra o erro e permite tentar de novo
+                message = str(e).splitlines()[0] if str(e) else type(e).__name__
+                button.description = f'Erro: {message} (clique para tentar novamente)'
+                button.tooltip = str(e)
+                button.disabled = False
+                return
+            loaded.add(i)
+            containers[i].children = [label, Map]
+
+    def materialize_in_background(i):
+        threading.Thread(target=materialize, args=(i,), daemon=True).start()
+
+    for i, panel in enumerate(panels):
+        label = HTML(LABEL_TEMPLATE.format(header=header, date=panel['date']))
+        label.layout.width = '100%'
+        button = Button(description='Abrir mapa', icon='map')
+        button.layout.width = '100%'
+        button.layout.height = height
+        button.on_click(lambda _, i=i: materialize(i))
+        trigger = ViewportTrigger()
+        trigger.observe(lambda change, i=i: materialize_in_background(i) if change['new'] else None, names='in_view')
+        container = VBox([label, button, trigger])
+        container.layout.width = '50%'
+        containers.append(container)
+
+    # Organiza em linhas de 2 painéis
+    rows = [HBox(containers[i:i + 2]) for i in range(0, len(containers), 2)]
+    if len(containers) == 1:
+        containers[0].layout.width = '100%'
+
+    # Abre os primeiros painéis (base primeiro) sem bloquear a exibição da grade
+    if eager:
+        threading.Thread(
+            target=lambda: [materialize(i) for i in range(min(eager, len(panels)))],
+            daemon=True
+        ).start()
+
+    return VBox(rows)
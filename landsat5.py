@@ -1,4 +1,9 @@
+import os
 import ee
+import instrumentation
+import cloud_prefilter
+import ee_retry
+import scene_index
 import geopandas as gpd
 import geemap
 from shapely.geometry import Point
@@ -6,6 +11,14 @@ from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from ipywidgets import HBox, VBox, HTML, VBox as VBoxWidget
 from IPython.display import display
+from export_utils import NATIVE_GRID_BANDS, export_image_to_drive, analytic_flood_mask, scaled_index, MASK_NODATA, INDEX_NODATA
+from download_utils import download_image_to_cog
+from datacube import build_datacube, write_datacube
+from mosaic_utils import bulk_stretch, daily_mosaics, image_for_date
+from render_utils import render_thumbnails, render_timelapse, resolve_rgb
+from report_utils import build_report
+from interactive_utils import time_slider_map, lazy_map_grid
+from tile_cache import add_cached_layer
 
 # Trigger the authentication flow.
 ee.Authenticate() #force=True)
@@ -26,6 +39,51 @@ dias_posteriores = 10  # Número de dias depois da data de referência
 # Definir o buffer em graus
 buffer_degrees = 0.1  # 5 km em graus
 
+# Grade de exportação: por padrão usa a projeção e resolução nativas do sensor.
+# Reamostragem é opcional: informe export_scale (m) e/ou export_crs explicitamente
+export_scale = None       # Ex.: 30 para reamostrar para 30 m
+export_crs = None         # Ex.: 'EPSG:4326'
+export_resampling = None  # 'bilinear' ou 'bicubic' (None = vizinho mais próximo)
+
+# Modo de exportação: 'drive' (tarefa em lote) ou 'local' (download direto em COG)
+export_mode = 'drive'
+output_dir = 'saidas'          # Pasta dos COGs no modo 'local'
+cog_compression = 'DEFLATE'    # 'DEFLATE' ou 'ZSTD' (com preditor)
+write_cube = False             # Grava o datacube Zarr (time x y x) do sensor em output_dir
+
+# Modo de exibição: 'interactive' (um mapa geemap por data), 'lazy' (grade com
+# painéis criados ao clicar, base primeiro), 'slider' (um único mapa com seletor
+# de data), 'thumbnails' (PNGs estáticos renderizados em paralelo) ou 'report'
+# (relatório HTML estático). Fora do modo 'interactive' o stretch de cada data
+# só é calculado quando o painel é renderizado
+display_mode = 'interactive'
+thumbnail_size = 768           # Maior dimensão das miniaturas em pixels
+make_timelapse = False         # Gera um único timelapse (base + todas as datas)
+timelapse_format = 'gif'       # 'gif' ou 'mp4'
+report_pdf = False             # No modo 'report', também gera PDF
+
+# Instrumentação: tempo, nº de chamadas ao EE e bytes por etapa
+# (tabela-resumo no fim da execução + trace JSON em output_dir)
+instrument = True
+if instrument:
+    instrumentation.install()
+
+# Controle de cota: repete erros transitórios (429, "Too many concurrent
+# aggregations") com backoff exponencial e ajusta as chamadas simultâneas (AIMD)
+retry_calls = True
+if retry_calls:
+    ee_retry.install()
+
+# Inventário pelo índice local de cenas (SQLite em ~/.cache/satelite): só o
+# trecho do período ainda não sincronizado é buscado no servidor
+use_scene_index = True
+
+# Pré-filtro de nuvens na AOI: fração sem nuvens (QA_PIXEL) de cada cena
+# sobre a AOI, em uma única chamada; o limite de nuvens por cena é relaxado
+aoi_cloud_prefilter = True
+min_clear_fraction = cloud_prefilter.MIN_CLEAR_FRACTION
+scene_cloud_max = cloud_prefilter.SCENE_CLOUD_MAX if aoi_cloud_prefilter else 50
+
 ponto = Point(lon, lat)
 poligono_buffer = ponto.buffer(buffer_degrees)
 area_interesse = gpd.GeoDataFrame([{'id': 0, 'geometry': poligono_buffer}], crs='EPSG:4326')
@@ -103,10 +161,43 @@ print(f"Período de busca da imagem de base: {base_start_date} a {base_end_date}
 landsat5_collection = ee.ImageCollection('LANDSAT/LT05/C02/T1_L2') \
     .filterBounds(geometry) \
     .filterDate(start_date, end_date) \
-    .filter(ee.Filter.lt('CLOUD_COVER', 50))
+    .filter(ee.Filter.lt('CLOUD_COVER', scene_cloud_max))
+
+instrumentation.set_stage('inventory')
+
+# Obtém data e system:index de todas as cenas em uma única chamada ao servidor
+def get_image_info(image):
+    return ee.Feature(None, {
+        'date': image.date().format('YYYY-MM-dd'),
+        'system:index': image.get('system:index')
+    })
+
+if use_scene_index:
+    dates_list, indices_list = scene_index.SceneIndex().inventory(
+        'LANDSAT/LT05/C02/T1_L2', (minx, miny, maxx, maxy), start_date, end_date, cloud_lt=scene_cloud_max
+    )
+else:
+    image_info = landsat5_collection.map(get_image_info)
+    inventory = ee.Dictionary({
+        'date': image_info.aggregate_array('date'),
+        'system:index': image_info.aggregate_array('system:index')
+    }).getInfo()
+    dates_list = inventory['date']
+    indices_list = inventory['system:index']
+
+if aoi_cloud_prefilter and indices_list:
+    instrumentation.set_stage('prefilter')
+    clear_by_scene = cloud_prefilter.clear_fractions(
+        cloud_prefilter.keep_only(landsat5_collection, indices_list), 'LANDSAT/LT05/C02/T1_L2', geometry
+    )
+    dates_list, indices_list = cloud_prefilter.usable_scenes(
+        dates_list, indices_list, clear_by_scene, min_clear_fraction
+    )
+    landsat5_collection = cloud_prefilter.keep_only(landsat5_collection, indices_list)
+    print(f"Cenas com a AOI sem nuvens (>= {min_clear_fraction:.0%}): {len(indices_list)} de {len(clear_by_scene)}")
 
 # Verifica quantas imagens existem
-image_count = landsat5_collection.size().getInfo()
+image_count = len(dates_list)
 print(f"Número de imagens encontradas: {image_count}")
 
 if image_count == 0:
@@ -121,17 +212,6 @@ else:
     # Aplica MNDWI a todas as imagens
     mndwi_collection = landsat5_collection.map(calculate_mndwi_landsat5)
 
-    # Obtém informações das datas das imagens
-    def get_image_info(image):
-        return ee.Feature(None, {
-            'date': image.date().format('YYYY-MM-dd'),
-            'system:index': image.get('system:index')
-        })
-
-    image_info = mndwi_collection.map(get_image_info)
-    dates_list = image_info.aggregate_array('date').getInfo()
-    indices_list = image_info.aggregate_array('system:index').getInfo()
-
     # Remove duplicatas mantendo a ordem
     unique_dates = []
     seen = set()
@@ -208,6 +288,7 @@ else:
         print(f"  {date}: {filename}")
 
     # Busca e processa imagem de base
+    instrumentation.set_stage('baseline')
     print(f"\n=== Processando imagem de base  ===")
     base_collection = ee.ImageCollection('LANDSAT/LT05/C02/T1_L2') \
         .filterBounds(geometry) \
@@ -220,6 +301,10 @@ else:
     # Cria mapas individuais para cada imagem
     maps_list = []
 
+    # Imagens e parâmetros de visualização por data (para o datacube)
+    cube_images = []
+    stretches = {}
+
     # Processa imagem de base se encontrada
     if base_count > 0:
         base_mndwi_collection = base_collection.map(calculate_mndwi_landsat5)
@@ -239,7 +324,7 @@ else:
         # Calcula parâmetros de visualização automaticamente
         try:
             base_vis_params = calculate_rgb_vis_params_landsat5(base_image, bands=['SR_B3', 'SR_B2', 'SR_B1'])
-        except:
+        except ee.EEException:
             base_vis_params = {'min': [0, 0, 0], 'max': [10000, 10000, 10000]}
 
         # Cria composição RGB (Landsat 5: SR_B3, SR_B2, SR_B1)
@@ -253,20 +338,22 @@ else:
             'max': 1
         })
 
-        # Cria mapa da imagem de base
-        base_map = geemap.Map(
-            toolbar_control=False,
-            draw_control=False,
-            measure_control=False,
-            fullscreen_control=False,
-            attribution_control=False
-        )
-
-        base_map.addLayer(geometry, {'color': 'blue', 'fillColor': '00000000', 'weight': 2}, 'Área de interesse')
-        base_map.addLayer(base_rgb_image, {}, 'RGB')
-        base_map.addLayer(base_flooded_area, {}, 'Áreas inundadas')
-        base_map.centerObject(geometry, 12)
-        base_map.addLayerControl()
+        base_map = None
+        if display_mode == 'interactive':
+            # Cria mapa da imagem de base
+            base_map = geemap.Map(
+                toolbar_control=False,
+                draw_control=False,
+                measure_control=False,
+                fullscreen_control=False,
+                attribution_control=False
+            )
+
+            base_map.addLayer(geometry, {'color': 'blue', 'fillColor': '00000000', 'weight': 2}, 'Área de interesse')
+            add_cached_layer(base_map, base_rgb_image, {}, 'RGB', bounds=bounds)
+            add_cached_layer(base_map, base_flooded_area, {}, 'Áreas inundadas', bounds=bounds)
+            base_map.centerObject(geometry, 12)
+            base_map.addLayerControl()
 
         # Gera nome de arquivo para imagem de base
         base_filename = generate_filename(cidade_uf, lon, lat, base_date_str, sensor_name)
@@ -275,42 +362,56 @@ else:
         maps_list.append({
             'map': base_map,
             'date': f"{base_date_str} (Base)",
-            'filename': base_filename
+            'filename': base_filename,
+            'rgb': base_rgb_image,
+            'flood': base_flooded_area,
+            'mask': base_water_threshold
         })
         print(f"  Imagem de base adicionada ao primeiro painel")
     else:
         print(f"  Aviso: Nenhuma imagem encontrada para o período de base")
 
+    # Calcula o stretch automático (percentis) e a composição RGB de uma imagem
+    def build_rgb(image, vis_params=None):
+        try:
+            # Stretch já calculado em lote para a data (ou calculado aqui)
+            if vis_params is None:
+                vis_params = calculate_rgb_vis_params_landsat5(image, bands=['SR_B3', 'SR_B2', 'SR_B1'])
+        except ee.EEException:
+            # Fallback para valores padrão se o cálculo falhar (falta de cota não cai aqui)
+            vis_params = {'min': [0, 0, 0], 'max': [10000, 10000, 10000]}
+
+        # Cria composição RGB (Landsat 5: SR_B3, SR_B2, SR_B1)
+        rgb_image = image.select(['SR_B3', 'SR_B2', 'SR_B1']).visualize(**vis_params)
+        return rgb_image, vis_params
+
+    instrumentation.set_stage('stretch')
+    # Mosaicos diários montados no servidor (uma expressão para todas as datas)
+    daily_collection = daily_mosaics(mndwi_collection, [d[0] for d in unique_dates])
+    # Stretch de todas as datas em uma única chamada (só no modo 'interactive')
+    daily_stretches = {}
+    if display_mode == 'interactive':
+        daily_stretches = bulk_stretch(daily_collection, ['SR_B3', 'SR_B2', 'SR_B1'], geometry, 30, (2, 98), 10000)
     for date, idx in unique_dates:
         # Filtra TODAS as imagens da data específica (não apenas por system:index)
         date_start = f"{date}T00:00:00"
         date_end = f"{date}T23:59:59"
         date_collection = mndwi_collection.filterDate(date_start, date_end)
+        # Cena original da data (preserva a grade nativa para exportação)
+        reference_scene = date_collection.first()
 
-        # Verifica quantas cenas existem para esta data
-        scene_count = date_collection.size().getInfo()
+        # Nº de cenas da data (já conhecido pelo inventário, sem nova chamada ao servidor)
+        scene_count = dates_list.count(date)
         print(f"  Data {date}: {scene_count} cena(s) encontrada(s)")
 
-        # Processa as imagens baseado no número de cenas
-        if scene_count > 1:
-            # Múltiplas cenas: faz mosaico para combinar todas
-            image = date_collection.mosaic()#.clip(geometry)
-        elif scene_count == 1:
-            # Uma única cena: usa ela diretamente
-            image = date_collection.first()#.clip(geometry)
-        else:
-            print(f"  Aviso: Nenhuma cena encontrada para {date}, pulando...")
-            continue
+        # Mosaico do dia (uma ou mais cenas) da coleção diária
+        image = image_for_date(daily_collection, date)
 
-        # Calcula parâmetros de visualização automaticamente
-        try:
-            vis_params = calculate_rgb_vis_params_landsat5(image, bands=['SR_B3', 'SR_B2', 'SR_B1'])
-        except:
-            # Fallback para valores padrão se o cálculo falhar
-            vis_params = {'min': [0, 0, 0], 'max': [10000, 10000, 10000]}
-
-        # Cria composição RGB (Landsat 5: SR_B3, SR_B2, SR_B1)
-        rgb_image = image.select(['SR_B3', 'SR_B2', 'SR_B1']).visualize(**vis_params)
+        # Stretch e composição RGB (adiados até o painel ser renderizado fora do modo 'interactive')
+        if display_mode == 'interactive':
+            rgb_image, vis_params = build_rgb(image, daily_stretches.get(date))
+        else:
+            rgb_image, vis_params = None, None
 
         # Calcula áreas inundadas (MNDWI > 0.0)
         water_threshold = image.select('MNDWI').gt(0.0)
@@ -320,38 +421,96 @@ else:
             'max': 1
         })
 
-        # Cria mapa individual com configurações limpas
-        Map = geemap.Map(
-            toolbar_control=False,  # Remove toolbar
-            draw_control=False,     # Remove controles de desenho
-            measure_control=False,   # Remove controles de medida
-            fullscreen_control=False, # Remove controle de tela cheia
-            attribution_control=False # Remove créditos do ipyleaflet
-        )
-
-        Map.addLayer(geometry, {'color': 'blue', 'fillColor': '00000000', 'weight': 2}, 'Área de interesse')
-        Map.addLayer(rgb_image, {}, 'RGB')
-        Map.addLayer(flooded_area, {}, 'Áreas inundadas')
-        Map.centerObject(geometry, 12)
-
-        # Adiciona controle de layers (para habilitar/desabilitar)
-        Map.addLayerControl()
+        Map = None
+        if display_mode == 'interactive':
+            # Cria mapa individual com configurações limpas
+            Map = geemap.Map(
+                toolbar_control=False,  # Remove toolbar
+                draw_control=False,     # Remove controles de desenho
+                measure_control=False,   # Remove controles de medida
+                fullscreen_control=False, # Remove controle de tela cheia
+                attribution_control=False # Remove créditos do ipyleaflet
+            )
+
+            Map.addLayer(geometry, {'color': 'blue', 'fillColor': '00000000', 'weight': 2}, 'Área de interesse')
+            add_cached_layer(Map, rgb_image, {}, 'RGB', bounds=bounds)
+            add_cached_layer(Map, flooded_area, {}, 'Áreas inundadas', bounds=bounds)
+            Map.centerObject(geometry, 12)
+
+            # Adiciona controle de layers (para habilitar/desabilitar)
+            Map.addLayerControl()
 
         # Armazena mapa, data e nome do arquivo juntos
         maps_list.append({
             'map': Map,
             'date': date,
-            'filename': filenames[date]
+            'filename': filenames[date],
+            'rgb': rgb_image,
+            'build_rgb': lambda image=image: build_rgb(image),
+            'vis_params': vis_params,
+            'flood': flooded_area,
+            'mask': water_threshold
         })
 
+        # Guarda imagem e stretch da data para o datacube
+        cube_images.append((date, image))
+        if vis_params is not None:
+            stretches[date] = vis_params
+
+    instrumentation.set_stage('render')
+
     # Exibe informações
     print(f"\nSensor: {sensor_name}")
     print(f"Período: {start_date} a {end_date}")
     total_images = len(maps_list)
     print(f"Total de imagens processadas: {total_images} ({'1 imagem de base + ' if base_count > 0 else ''}{len(unique_dates)} do período de análise)")
 
+    if make_timelapse:
+        # Um único timelapse substitui os N painéis (uma requisição de vídeo no servidor)
+        os.makedirs(output_dir, exist_ok=True)
+        timelapse_name = f"{cidade_uf.replace(' ', '_')}_{sensor_name.replace('/', '_')}_timelapse.{timelapse_format}"
+        timelapse_file = render_timelapse(
+            maps_list,
+            geometry,
+            os.path.join(output_dir, timelapse_name),
+            header=f"{cidade_uf} - {sensor_name}",
+            dimensions=thumbnail_size
+        )
+        print(f"Timelapse gravado em: {timelapse_file}")
+
+    if display_mode == 'thumbnails':
+        # Renderiza todas as miniaturas (base + datas) em paralelo, com cache por expressão
+        thumbnails = render_thumbnails(
+            maps_list,
+            geometry,
+            cache_dir=os.path.join(output_dir, 'miniaturas'),
+            dimensions=thumbnail_size
+        )
+        for thumb in thumbnails:
+            print(f"  {thumb['date']}: {thumb['png']}")
+    elif display_mode == 'report':
+        # Relatório HTML autocontido, atualizado à medida que os painéis ficam prontos
+        os.makedirs(output_dir, exist_ok=True)
+        report_name = f"{cidade_uf.replace(' ', '_')}_{sensor_name.replace('/', '_')}.html"
+        report_file = build_report(
+            maps_list,
+            geometry,
+            os.path.join(output_dir, report_name),
+            header=f"{cidade_uf} - {sensor_name}",
+            scale=NATIVE_GRID_BANDS[sensor_name][1],
+            cache_dir=os.path.join(output_dir, 'miniaturas'),
+            dimensions=thumbnail_size,
+            pdf=report_pdf
+        )
+        print(f"Relatório gravado em: {report_file}")
+    elif display_mode == 'slider':
+        # Um único mapa; as camadas de cada data são criadas só quando selecionada
+        display(time_slider_map(maps_list, geometry, header=f"{cidade_uf} - {sensor_name}", bounds=bounds))
+    elif display_mode == 'lazy':
+        # Grade retornada na hora; cada mapa (e seu stretch) só é criado ao ser aberto
+        display(lazy_map_grid(maps_list, geometry, header=f"{cidade_uf} - {sensor_name}", bounds=bounds))
     # Exibe mapas lado a lado em painéis múltiplos (máximo 2 por linha)
-    if len(maps_list) == 1:
+    elif len(maps_list) == 1:
         # Se houver apenas um mapa
         map_item = maps_list[0]
         map_item['map'].layout.width = '100%'
@@ -430,25 +589,117 @@ else:
         final_box.layout.border = 'none'
         display(final_box)
 
-# Exportar a imagem RGB do período de inundação
-task1 = ee.batch.Export.image.toDrive(
-    image=rgb_image,                     # A imagem que você quer exportar
-    description='RGB_inundacao',         # Nome do arquivo exportado
-    fileFormat='GeoTIFF',                # Formato de arquivo
-    region=geometry,                     # Define a região de exportação (pode ser a geometria de interesse)
-    scale=10,                            # Define a escala em metros por pixel
-    maxPixels=1e9                        # Define o número máximo de pixels
-)
-
-# Exportar a imagem de áreas inundadas
-task2 = ee.batch.Export.image.toDrive(
-    image=flooded_area,                  # A imagem que você quer exportar
-    description='areas_inundadas',       # Nome do arquivo exportado
-    fileFormat='GeoTIFF',                # Formato de arquivo
-    region=geometry,                     # Define a região de exportação
-    scale=10,                            # Escala em metros por pixel
-    maxPixels=1e9                        # Define o número máximo de pixels
-)
-
-# task1.start()
-# task2.start()
+instrumentation.set_stage('datacube')
+
+# Datacube do sensor (time x y x) em Zarr: índice, máscara, base e stretch
+if write_cube and image_count > 0 and cube_images:
+    os.makedirs(output_dir, exist_ok=True)
+    # Inclui os stretches calculados sob demanda pelos painéis
+    stretches.update({p['date']: p['vis_params'] for p in maps_list if p.get('vis_params') is not None})
+    cube = build_datacube(
+        sensor_name,
+        cube_images,
+        region=geometry,
+        reference_image=reference_scene,
+        stretches=stretches,
+        base_image=base_image if base_count > 0 else None,
+        base_stretch=base_vis_params if base_count > 0 else None
+    )
+    cube_name = f"{cidade_uf.replace(' ', '_')}_{sensor_name.replace('/', '_')}.zarr"
+    write_datacube(cube, os.path.join(output_dir, cube_name))
+
+instrumentation.set_stage('export')
+
+# Produtos da última data (sem imagens no período não há o que exportar)
+if image_count > 0:
+    # Composição RGB da última data (calculada aqui se o stretch foi adiado)
+    if rgb_image is None:
+        rgb_image = resolve_rgb(maps_list[-1])
+
+    # Produtos analíticos da última data: máscara uint8 de banda única (1 = água,
+    # 0 = seco, 255 = sem dado) e índice contínuo em int16 escalado
+    flood_mask = analytic_flood_mask(water_threshold)
+    index_int16 = scaled_index(image, sensor_name)
+
+    if export_mode == 'local':
+        # Download direto em paralelo para COG local (sem fila do Drive)
+        os.makedirs(output_dir, exist_ok=True)
+        download_image_to_cog(
+            rgb_image,
+            os.path.join(output_dir, f"{filenames[date]}_RGB.tif"),
+            region=geometry,
+            reference_image=reference_scene,
+            sensor=sensor_name,
+            compress=cog_compression,
+            overview_resampling='AVERAGE'
+        )
+        download_image_to_cog(
+            flood_mask,
+            os.path.join(output_dir, f"{filenames[date]}_inundacao.tif"),
+            region=geometry,
+            reference_image=reference_scene,
+            sensor=sensor_name,
+            compress=cog_compression,
+            nodata=MASK_NODATA
+        )
+        download_image_to_cog(
+            index_int16,
+            os.path.join(output_dir, f"{filenames[date]}_indice.tif"),
+            region=geometry,
+            reference_image=reference_scene,
+            sensor=sensor_name,
+            compress=cog_compression,
+            overview_resampling='AVERAGE',
+            nodata=INDEX_NODATA
+        )
+    else:
+        # Exportar a imagem RGB do período de inundação (grade nativa do sensor)
+        task1 = export_image_to_drive(
+            image=rgb_image,                     # A imagem que você quer exportar
+            description='RGB_inundacao',         # Nome do arquivo exportado
+            region=geometry,                     # Região de recorte da exportação
+            reference_image=reference_scene,     # Cena original que define crs/crsTransform
+            sensor=sensor_name,
+            scale=export_scale,                  # None = resolução nativa
+            crs=export_crs,                      # None = projeção nativa
+            resampling=export_resampling
+        )
+
+        # Exportar a máscara de áreas inundadas (uint8, grade nativa, sem interpolação)
+        task2 = export_image_to_drive(
+            image=flood_mask,                    # Máscara analítica de banda única
+            description='areas_inundadas',       # Nome do arquivo exportado
+            region=geometry,                     # Região de recorte da exportação
+            reference_image=reference_scene,     # Cena original que define crs/crsTransform
+            sensor=sensor_name,
+            scale=export_scale,
+            crs=export_crs,
+            nodata=MASK_NODATA
+        )
+
+        # Exportar o índice contínuo (int16 escalado)
+        task3 = export_image_to_drive(
+            image=index_int16,                   # Índice x 10000 (VV em centi-dB)
+            description='indice_agua',           # Nome do arquivo exportado
+            region=geometry,                     # Região de recorte da exportação
+            reference_image=reference_scene,     # Cena original que define crs/crsTransform
+            sensor=sensor_name,
+            scale=export_scale,
+            crs=export_crs,
+            resampling=export_resampling,
+            nodata=INDEX_NODATA
+        )
+
+        # task1.start()
+        # task2.start()
+        # task3.start()
+
+# Métricas de throttling (repetições, erros de cota e limite de concorrência)
+if retry_calls:
+    print(ee_retry.controller.summary())
+
+# Resumo por etapa e trace JSON da execução
+if instrument:
+    os.makedirs(output_dir, exist_ok=True)
+    trace_name = f"{cidade_uf.replace(' ', '_')}_{sensor_name.replace('/', '_')}_trace.json"
+    instrumentation.report(os.path.join(output_dir, trace_name))
@@ -0,0 +1,57 @@
+import ee
+
+
+# MODIS Terra (MOD09GQ, passagem ~10h30) e Aqua (MYD09GQ, ~13h30) consultados
+# juntos: as duas passagens do dia viram um único composto "melhor pixel"
+# (qualityMosaic sobre a qualidade do QC_250m), e o NDWI e o stretch são
+# calculados uma vez por composto em vez de uma vez por satélite.
+
+TERRA_COLLECTION = 'MODIS/061/MOD09GQ'
+AQUA_COLLECTION = 'MODIS/061/MYD09GQ'
+MODIS_COLLECTIONS = (TERRA_COLLECTION, AQUA_COLLECTION)
+
+# Nome do produto combinado (nomes de arquivo, cabeçalhos e relatórios).
+# Grade e exportação seguem a do Terra: as duas coleções têm a mesma grade.
+COMBINED_NAME = 'MODIS/061/MOD09GQ+MYD09GQ'
+
+# Banda de qualidade usada no composto (maior é melhor)
+QUALITY_BAND = 'quality'
+
+
+def pixel_quality(image):
+    """
+    Adiciona a banda QUALITY_BAND (0 a 6) a partir do QC_250m.
+
+    Bits 2-3 (estado de nuvem): 0 limpo e 3 não definido valem 2, 2 misto
+    vale 1, 1 nublado vale 0 (peso 2). Bits 0-1 (MODLAND) ideais somam 1 e
+    bits 4-11 (qualidade das bandas 1 e 2) ideais somam 1 (desempates).
+    """
+    qc = image.select('QC_250m')
+    cloud_state = qc.rightShift(2).bitwiseAnd(3)
+    clear = cloud_state.eq(0).Or(cloud_state.eq(3)).multiply(2).add(cloud_state.eq(2))
+    ideal = qc.bitwiseAnd(3).eq(0)
+    bands_ok = qc.rightShift(4).bitwiseAnd(0xFF).eq(0)
+    quality = clear.multiply(2).add(ideal).add(bands_ok)
+    return image.addBands(quality.rename(QUALITY_BAND))
+
+
+def combined_collection(geometry, start_date, end_date):
+    """
+    Cenas do Terra e do Aqua no período em uma única coleção, com a banda de qualidade.
+
+    O merge do EE prefixa o system:index das cenas ('1_', '2_'); use o
+    scene_index ou as datas para o inventário.
+
+    Retorna:
+    - ee.ImageCollection (sem chamadas ao servidor)
+    """
+    collections = [
+        ee.ImageCollection(collection_id).filterBounds(geometry).filterDate(start_date, end_date)
+        for collection_id in MODIS_COLLECTIONS
+    ]
+    return collections[0].merge(collections[1]).map(pixel_quality)
+
+
+def best_pixel(collection):
+    """Composto melhor pixel das cenas da coleção (todas as bandas da cena de maior qualidade)."""
+    return collection.qualityMosaic(QUALITY_BAND)
@@ -0,0 +1,338 @@
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+import ee
+
+import ee_retry
+from aoi_index import AOIIndex
+from export_utils import NATIVE_GRID_BANDS
+from pipeline import SENSOR_FLOWS, aoi_geometry, source_collection
+from scene_index import SceneIndex
+
+
+# Estado do monitor: cenas já processadas por AOI e sensor (sobrevive a reinícios)
+STATE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'satelite', 'monitor_state.json')
+
+# Alertas emitidos (um JSON por linha)
+ALERTS_FILE = 'alertas.jsonl'
+
+# Janela de busca de cenas novas (a ingestão no EE pode atrasar alguns dias)
+LOOKBACK_DAYS = 10
+
+# Sensores monitorados por padrão: os alertas são por cena, então fluxos de
+# compostos de várias coleções (ex.: 'modis', Terra + Aqua) ficam de fora
+MONITOR_SENSORS = tuple(sensor for sensor, flow in SENSOR_FLOWS.items() if 'collections' not in flow)
+
+_lock = threading.Lock()
+
+
+def load_state(state_file=STATE_FILE):
+    """Lê o estado do disco (dicionário vazio se não existir ou estiver corrompido)."""
+    try:
+        with open(state_file, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state, state_file=STATE_FILE):
+    """Grava o estado de forma atômica."""
+    os.makedirs(os.path.dirname(state_file) or '.', exist_ok=True)
+    tmp_file = f"{state_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_file, state_file)
+
+
+def aoi_area_km2(lat, buffer_degrees):
+    """Área aproximada (km²) do quadrado da AOI, sem chamada ao servidor."""
+    height = 2 * buffer_degrees * 110.574
+    width = 2 * buffer_degrees * 111.320 * math.cos(math.radians(lat))
+    return height * width
+
+
+def list_scenes(flow, geometry, start_date, end_date):
+    """
+    Cenas da coleção filtrada no período, em uma única chamada ao servidor.
+
+    Retorna:
+    - Lista de (system:index, system:time_start em ms), em ordem de aquisição
+    """
+    collection = flow['filters'](source_collection(flow, geometry, start_date, end_date))
+    info = ee.Dictionary({
+        'index': collection.aggregate_array('system:index'),
+        'time': collection.aggregate_array('system:time_start')
+    }).getInfo()
+    return sorted(zip(info['index'], info['time']), key=lambda scene: scene[1])
+
+
+def flooded_areas(flow, geometry, indices, start_date, end_date):
+    """
+    Área inundada (km²) de cada cena nova em uma única chamada ao servidor.
+
+    Retorna:
+    - Dicionário system:index -> área inundada em km²
+    """
+    collection = flow['filters'](source_collection(flow, geometry, start_date, end_date)).map(flow['add_index'])
+    scale = NATIVE_GRID_BANDS[flow['collection']][1]
+
+    features = ee.FeatureCollection([
+        ee.Feature(None, {
+            'index': idx,
+            'area_km2': flow['water'](
+                collection.filter(ee.Filter.eq('system:index', idx)).first()
+            ).selfMask().multiply(ee.Image.pixelArea()).rename('area').reduceRegion(
+                reducer=ee.Reducer.sum(),
+                geometry=geometry,
+                scale=scale,
+                maxPixels=1e9
+            ).get('area')
+        })
+        for idx in indices
+    ])
+    info = features.getInfo()
+    return {
+        f['properties']['index']: (f['properties'].get('area_km2') or 0.0) / 1e6
+        for f in info['features']
+    }
+
+
+def check_aoi(aoi, sensor, state, now, lookback_days=LOOKBACK_DAYS, candidates=None):
+    """
+    Processa as cenas novas de uma AOI/sensor e gera os alertas.
+
+    Parâmetros:
+    - aoi: Dicionário com 'name', 'lon', 'lat' e 'buffer_degrees'
+    - sensor: Chave de pipeline.SENSOR_FLOWS
+    - state: Estado do monitor (atualizado in-place)
+    - now: Instante da verificação (datetime UTC)
+    - lookback_days: Janela de busca em dias
+    - candidates: Lista de (system:index, time_start em ms, fração coberta) já
+      atribuída à AOI por dispatch (padrão: lista as cenas no servidor)
+
+    Retorna:
+    - Lista de alertas (um por cena nova)
+    """
+    flow = SENSOR_FLOWS[sensor]
+    key = f"{aoi['name']}|{sensor}"
+    geometry = aoi_geometry(aoi['lon'], aoi['lat'], aoi['buffer_degrees'])
+    start_date = (now - timedelta(days=lookback_days)).strftime('%Y-%m-%d')
+    end_date = (now + timedelta(days=1)).strftime('%Y-%m-%d')
+
+    with _lock:
+        seen = dict(state.get(key, {}))
+    if candidates is None:
+        candidates = [(idx, t, None) for idx, t in list_scenes(flow, geometry, start_date, end_date)]
+    scenes = [(idx, t, coverage) for idx, t, coverage in candidates if idx not in seen]
+    if not scenes:
+        return []
+
+    areas = flooded_areas(flow, geometry, [idx for idx, _, _ in scenes], start_date, end_date)
+    alerted = datetime.now(timezone.utc)
+    total_km2 = aoi_area_km2(aoi['lat'], aoi['buffer_degrees'])
+    alerts = []
+    for idx, time_ms, coverage in scenes:
+        acquired = datetime.fromtimestamp(time_ms / 1000, timezone.utc)
+        flooded_km2 = areas.get(idx, 0.0)
+        alerts.append({
+            'aoi': aoi['name'],
+            'sensor': sensor,
+            'collection': flow['collection'],
+            'system:index': idx,
+            'acquired': acquired.isoformat(),
+            'alerted': alerted.isoformat(),
+            'latency_h': round((alerted - acquired).total_seconds() / 3600, 2),
+            'flooded_km2': round(flooded_km2, 3),
+            'flooded_fraction': round(flooded_km2 / total_km2, 4) if total_km2 else None,
+            'coverage': round(coverage, 4) if coverage is not None else None
+        })
+        seen[idx] = time_ms
+
+    # Esquece cenas fora da janela (não voltam a ser listadas)
+    cutoff = (now - timedelta(days=lookback_days + 1)).timestamp() * 1000
+    with _lock:
+        state[key] = {idx: t for idx, t in seen.items() if t >= cutoff}
+    return alerts
+
+
+def merge_prefix(count, position):
+    """
+    Prefixo que o merge do EE dá ao system:index das cenas da coleção 'position'.
+
+    Segue a ordem de pipeline.source_collection (merges encadeados da
+    esquerda para a direita: '1_' e '2_' a cada merge); uma coleção só não
+    tem prefixo.
+    """
+    if count == 1:
+        return ''
+    if position == 0:
+        return '1_' * (count - 1)
+    return '1_' * (count - 1 - position) + '2_'
+
+
+def dispatch(aois, sensor, scene_index, now, lookback_days=LOOKBACK_DAYS):
+    """
+    Atribui as cenas do período às AOIs que elas intersectam.
+
+    As cenas vêm do índice local (uma sincronização incremental sobre o
+    envelope de todas as AOIs do sensor, por coleção do fluxo) e cada
+    footprint consulta um STRtree das AOIs, em vez de testar cada cena contra
+    cada AOI. Em fluxos de várias coleções (ex.: 'modis') o system:index leva
+    o prefixo do merge (ver merge_prefix), como nas cenas de source_collection.
+
+    Parâmetros:
+    - aois: AOIs que monitoram o sensor
+    - sensor: Chave de pipeline.SENSOR_FLOWS
+    - scene_index: scene_index.SceneIndex
+    - now: Instante da verificação (datetime UTC)
+    - lookback_days: Janela de busca em dias
+
+    Retorna:
+    - Lista de (aoi, candidatas) só das AOIs com alguma cena, onde candidatas
+      é a lista de (system:index, time_start em ms, fração coberta)
+    """
+    flow = SENSOR_FLOWS[sensor]
+    aoi_index = AOIIndex(aois)
+    bounds = aoi_index.bounds()
+    if bounds is None:
+        return []
+    start_date = (now - timedelta(days=lookback_days)).strftime('%Y-%m-%d')
+    end_date = (now + timedelta(days=1)).strftime('%Y-%m-%d')
+    collections = flow.get('collections', [flow['collection']])
+
+    candidates = {}
+    for position, collection_id in enumerate(collections):
+        scene_index.sync(collection_id, bounds, start_date, end_date)
+        prefix = merge_prefix(len(collections), position)
+        for scene in scene_index.query(collection_id, bounds, start_date, end_date, **flow['index_query']):
+            for aoi, coverage in aoi_index.query(json.loads(scene['footprint'])):
+                candidates.setdefault(aoi['name'], (aoi, []))[1].append(
+                    (prefix + scene['system_index'], scene['time_start'], coverage)
+                )
+    for _, scenes in candidates.values():
+        scenes.sort(key=lambda scene: scene[1])
+    return list(candidates.values())
+
+
+def print_alert(alert):
+    """Saída padrão dos alertas."""
+    print(
+        f"[{alert['alerted'][:19]}] {alert['aoi']} - {alert['sensor']} {alert['acquired'][:10]}: "
+        f"{alert['flooded_km2']:.2f} km² inundados ({alert['latency_h']:.1f} h após a aquisição)"
+    )
+
+
+def poll(aois, state_file=STATE_FILE, alerts_file=ALERTS_FILE, now=None,
+         lookback_days=LOOKBACK_DAYS, max_workers=8, on_alert=print_alert, scene_index=None):
+    """
+    Uma rodada do monitor: verifica todas as AOIs e sensores em paralelo.
+
+    O estado é gravado a cada AOI/sensor concluído, depois dos alertas, de modo
+    que um reinício não reprocessa cenas já alertadas.
+
+    Parâmetros:
+    - aois: Lista de dicionários com 'name', 'lon', 'lat', 'buffer_degrees' e 'sensors'
+    - state_file: Caminho do estado local
+    - alerts_file: Arquivo JSON Lines onde os alertas são acrescentados
+    - now: Instante da verificação (padrão: agora, UTC)
+    - lookback_days: Janela de busca em dias
+    - max_workers: Número de AOIs/sensores verificados simultaneamente
+    - on_alert: Função chamada para cada alerta
+    - scene_index: scene_index.SceneIndex; se informado, as cenas novas são
+      distribuídas às AOIs por dispatch e só as AOIs atingidas são processadas
+
+    Retorna:
+    - Lista de alertas emitidos
+    """
+    now = now or datetime.now(timezone.utc)
+    state = load_state(state_file)
+    emitted = []
+    if scene_index is None:
+        jobs = [(aoi, sensor, None) for aoi in aois for sensor in aoi.get('sensors', MONITOR_SENSORS)]
+    else:
+        jobs = []
+        for sensor in SENSOR_FLOWS:
+            watching = [aoi for aoi in aois if sensor in aoi.get('sensors', MONITOR_SENSORS)]
+            jobs += [
+                (aoi, sensor, candidates)
+                for aoi, candidates in dispatch(watching, sensor, scene_index, now, lookback_days)
+            ]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(check_aoi, aoi, sensor, state, now, lookback_days, candidates): (aoi, sensor)
+            for aoi, sensor, candidates in jobs
+        }
+        for future in as_completed(futures):
+            try:
+                alerts = future.result()
+            except Exception as error:
+                # Uma AOI/sensor com erro não impede as demais; é refeita na próxima rodada
+                aoi, sensor = futures[future]
+                print(f"Erro em {aoi['name']} - {sensor}: {error}")
+                continue
+            if not alerts:
+                continue
+            with open(alerts_file, 'a', encoding='utf-8') as f:
+                for alert in alerts:
+                    f.write(json.dumps(alert) + '\n')
+            for alert in alerts:
+                on_alert(alert)
+            with _lock:
+                save_state(state, state_file)
+            emitted += alerts
+    return emitted
+
+
+def run(aois, interval=3600, **kwargs):
+    """
+    Executa o monitor continuamente (uma rodada a cada 'interval' segundos).
+
+    Erros de uma rodada são registrados e não interrompem o monitor.
+    """
+    while True:
+        start = time.monotonic()
+        try:
+            alerts = poll(aois, **kwargs)
+            print(f"Rodada concluída: {len(alerts)} alerta(s) em {time.monotonic() - start:.1f}s")
+        except Exception as error:
+            print(f"Erro na rodada do monitor: {error}")
+        time.sleep(max(0, interval - (time.monotonic() - start)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Monitor de inundação para AOIs observadas')
+    parser.add_argument('aois', help='arquivo JSON com a lista de AOIs (name, lon, lat, buffer_degrees, sensors)')
+    parser.add_argument('--interval', type=int, default=3600, help='segundos entre rodadas')
+    parser.add_argument('--lookback', type=int, default=LOOKBACK_DAYS, help='janela de busca em dias')
+    parser.add_argument('--state', default=STATE_FILE)
+    parser.add_argument('--alerts', default=ALERTS_FILE)
+    parser.add_argument('--once', action='store_true', help='executa uma única rodada')
+    parser.add_argument('--scene-index', action='store_true',
+                        help='distribui as cenas às AOIs pelo índice local de cenas e um STRtree das AOIs')
+    parser.add_argument('--project', default=None, help='projeto do Earth Engine')
+    args = parser.parse_args(argv)
+
+    with open(args.aois, encoding='utf-8') as f:
+        aois = json.load(f)
+
+    ee.Initialize(project=args.project)
+    # Muitas AOIs em paralelo: repetição e controle de concorrência das chamadas
+    ee_retry.install()
+    options = dict(state_file=args.state, alerts_file=args.alerts, lookback_days=args.lookback)
+    if args.scene_index:
+        options['scene_index'] = SceneIndex()
+    if args.once:
+        poll(aois, **options)
+    else:
+        run(aois, args.interval, **options)
+
+
+if __name__ == '__main__':
+    main()
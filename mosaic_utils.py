@@ -0,0 +1,99 @@
+import ee
+
+
+# Mosaicos diários montados no servidor: em vez de um filterDate + mosaic por
+# data no Python, a coleção filtrada vira uma única expressão (ImageCollection
+# de mosaicos, um por dia) sobre a qual stretch, máscaras e estatísticas são
+# mapeados em lote.
+
+
+def daily_mosaics(collection, dates=None, quality_band=None):
+    """
+    Coleção de mosaicos diários (um por data), montada no servidor.
+
+    Cada mosaico recebe 'system:time_start' (início do dia, UTC), 'date'
+    (YYYY-MM-DD) e 'scene_count'.
+
+    Parâmetros:
+    - collection: Coleção filtrada (ex.: com o índice de água)
+    - dates: Lista de datas YYYY-MM-DD já conhecida pelo inventário (opcional;
+      sem ela, as datas distintas são obtidas no servidor)
+    - quality_band: Banda de qualidade para o composto melhor pixel
+      (qualityMosaic); sem ela, mosaic (última cena por cima)
+
+    Retorna:
+    - ee.ImageCollection com os mosaicos em ordem cronológica
+    """
+    if dates is None:
+        dates = collection.aggregate_array('system:time_start') \
+            .map(lambda millis: ee.Date(millis).format('YYYY-MM-dd')).distinct()
+
+    def mosaic_day(date):
+        start = ee.Date(date)
+        day_collection = collection.filterDate(start, start.advance(1, 'day'))
+        if quality_band is None:
+            composite = day_collection.mosaic()
+        else:
+            composite = day_collection.qualityMosaic(quality_band)
+        return composite.set({
+            'system:time_start': start.millis(),
+            'date': date,
+            'scene_count': day_collection.size()
+        })
+
+    return ee.ImageCollection.fromImages(ee.List(dates).map(mosaic_day))
+
+
+def image_for_date(daily, date):
+    """Mosaico de uma data da coleção diária (sem chamada ao servidor)."""
+    return daily.filter(ee.Filter.eq('date', date)).first()
+
+
+def bulk_stretch(daily, bands, geometry, scale, percentiles=(5, 95), default_max=3000):
+    """
+    Stretch por percentis de todos os mosaicos diários em uma única chamada ao servidor.
+
+    Parâmetros:
+    - daily: Coleção de daily_mosaics
+    - bands: Bandas RGB (ex.: ['B4', 'B3', 'B2'])
+    - geometry: Área de interesse
+    - scale: Escala da redução em metros
+    - percentiles: Percentis (mínimo, máximo) do stretch
+    - default_max: Máximo usado quando o percentil não existe (ex.: data toda mascarada)
+
+    Retorna:
+    - Dicionário data -> parâmetros de visualização ({'min': [...], 'max': [...]});
+      vazio se a redução em lote falhar (o chamador volta ao stretch por data)
+    """
+    low, high = percentiles
+    unique_bands = list(dict.fromkeys(bands))
+
+    def get_percentiles(image):
+        return ee.Feature(None, {
+            'date': image.get('date'),
+            'percentiles': image.select(unique_bands).reduceRegion(
+                reducer=ee.Reducer.percentile([low, high]),
+                geometry=geometry,
+                scale=scale,
+                maxPixels=1e9
+            )
+        })
+
+    try:
+        features = daily.map(get_percentiles).getInfo()['features']
+    except ee.EEException:
+        return {}
+
+    def percentile(values, band, p, default):
+        # Percentil ausente ou nulo (data toda mascarada) usa o padrão; 0 é um valor válido
+        value = values.get(f'{band}_p{p}')
+        return default if value is None else value
+
+    stretches = {}
+    for feature in features:
+        values = feature['properties'].get('percentiles') or {}
+        stretches[feature['properties']['date']] = {
+            'min': [percentile(values, band, low, 0) for band in bands],
+            'max': [percentile(values, band, high, default_max) for band in bands]
+        }
+    return stretches
@@ -0,0 +1,472 @@
+from datetime import datetime, timedelta
+
+import ee
+from dateutil.relativedelta import relativedelta
+
+import instrumentation
+from cloud_prefilter import (
+    CLEAR_MASKS, MIN_CLEAR_FRACTION, SCENE_CLOUD_MAX, clear_fractions, keep_only, usable_scenes
+)
+from export_utils import INDEX_NODATA, MASK_NODATA, analytic_flood_mask, export_image_to_drive, scaled_index
+from modis_combined import MODIS_COLLECTIONS, QUALITY_BAND, TERRA_COLLECTION, pixel_quality
+from mosaic_utils import bulk_stretch, daily_mosaics, image_for_date
+from s1_tracks import ORBIT_PASSES, harmonize_tracks
+
+
+# Versão chamável do fluxo dos scripts (inventário, base, datas, renderização e
+# exportação), usada pelo controle de orçamento de RPCs para varrer janelas e
+# buffers contra o backend local (ee_standin). As chamadas ao servidor seguem
+# as dos scripts; o benchmark mede os próprios scripts (script_runner).
+
+
+def mask_clouds_s2(image):
+    """Máscara de nuvens do Sentinel-2 (MSK_CLDPRB <= 20), como em Sentinel_2.py."""
+    cloud_mask = image.select('MSK_CLDPRB').lte(20)
+    return image.updateMask(cloud_mask).copyProperties(image, ['system:time_start'])
+
+
+def mask_border_noise(image):
+    """Remove o ruído de borda do Sentinel-1 (VV < -35 dB), como em Sentinel_1.py."""
+    edge = image.lt(-35)
+    return image.updateMask(edge.Not())
+
+
+def _s1_filters(collection):
+    return (
+        collection
+        .filter(ee.Filter.inList('orbitProperties_pass', ORBIT_PASSES))
+        .filter(ee.Filter.eq('resolution_meters', 10))
+        .filter(ee.Filter.eq('instrumentMode', 'IW'))
+        .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VV'))
+        .select('VV')
+        .map(mask_border_noise)
+    )
+
+
+def _normalized_index(bands, name):
+    def add_index(image):
+        return image.addBands(image.normalizedDifference(bands).rename(name))
+    return add_index
+
+
+def _s1_flood(image):
+    # Sobrescreve FLOOD: o limiar é reaplicado após a correção por trilha (harmonize)
+    return image.addBands(image.select('VV').lt(-17).rename('FLOOD'), None, True)
+
+
+# Diferenças entre os scripts de cada sensor
+SENSOR_FLOWS = {
+    'sentinel1': {
+        'collection': 'COPERNICUS/S1_GRD',
+        'filters': _s1_filters,
+        'index_query': {'orbit_pass': ORBIT_PASSES},  # mesmos filtros, no scene_index
+        'base_filters': _s1_filters,
+        'harmonize': harmonize_tracks,  # base por passagem e órbita relativa (s1_tracks)
+        'add_index': _s1_flood,
+        'water': lambda image: image.select('FLOOD'),
+        'rgb_bands': None,  # stretch fixo (-25 a 0 dB)
+        'baseline': 'previous_year',
+    },
+    'sentinel2': {
+        'collection': 'COPERNICUS/S2_SR_HARMONIZED',
+        'filters': lambda c: c.filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20)),
+        'index_query': {'cloud_lt': 20},
+        # Com o pré-filtro de nuvens na AOI (cloud_prefilter), o limite por cena é relaxado
+        'prefilter_filters': lambda c: c.filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', SCENE_CLOUD_MAX)),
+        'prefilter_query': {'cloud_lt': SCENE_CLOUD_MAX},
+        'base_filters': lambda c: c.filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20)).map(mask_clouds_s2),
+        'add_index': _normalized_index(['B3', 'B11'], 'MNDWI'),
+        'water': lambda image: image.select('MNDWI').gt(0.0),
+        'rgb_bands': ['B4', 'B3', 'B2'],
+        'percentiles': (5, 95),
+        'stretch_scale': 10,
+        'default_max': 3000,
+        'baseline': 'previous_year',
+    },
+    'landsat8': {
+        'collection': 'LANDSAT/LC08/C02/T1_L2',
+        'filters': lambda c: c.filter(ee.Filter.lt('CLOUD_COVER', 50)),
+        'index_query': {'cloud_lt': 50},
+        'prefilter_filters': lambda c: c.filter(ee.Filter.lt('CLOUD_COVER', SCENE_CLOUD_MAX)),
+        'prefilter_query': {'cloud_lt': SCENE_CLOUD_MAX},
+        'base_filters': lambda c: c.filter(ee.Filter.lt('CLOUD_COVER', 100)),
+        'add_index': _normalized_index(['SR_B2', 'SR_B5'], 'MNDWI'),
+        'water': lambda image: image.select('MNDWI').gt(0.0),
+        'rgb_bands': ['SR_B3', 'SR_B2', 'SR_B1'],
+        'percentiles': (2, 98),
+        'stretch_scale': 30,
+        'default_max': 10000,
+        'baseline': 'window',
+        'base_offset': relativedelta(months=3),
+        'base_days': 15,
+    },
+    'landsat5': {
+        'collection': 'LANDSAT/LT05/C02/T1_L2',
+        'filters': lambda c: c.filter(ee.Filter.lt('CLOUD_COVER', 50)),
+        'index_query': {'cloud_lt': 50},
+        'prefilter_filters': lambda c: c.filter(ee.Filter.lt('CLOUD_COVER', SCENE_CLOUD_MAX)),
+        'prefilter_query': {'cloud_lt': SCENE_CLOUD_MAX},
+        'base_filters': lambda c: c.filter(ee.Filter.lt('CLOUD_COVER', 50)),
+        'add_index': _normalized_index(['SR_B2', 'SR_B5'], 'MNDWI'),
+        'water': lambda image: image.select('MNDWI').gt(0.0),
+        'rgb_bands': ['SR_B3', 'SR_B2', 'SR_B1'],
+        'percentiles': (2, 98),
+        'stretch_scale': 30,
+        'default_max': 10000,
+        'baseline': 'window',
+        'base_offset': relativedelta(months=3),
+        'base_days': 15,
+    },
+    'modis_terra': {
+        'collection': 'MODIS/061/MOD09GQ',
+        'filters': lambda c: c,
+        'index_query': {},
+        'base_filters': lambda c: c,
+        'add_index': _normalized_index(['sur_refl_b01', 'sur_refl_b02'], 'NDWI'),
+        'water': lambda image: image.select('NDWI').lt(0),
+        'rgb_bands': ['sur_refl_b02', 'sur_refl_b01', 'sur_refl_b01'],
+        'percentiles': (5, 95),
+        'stretch_scale': 250,
+        'default_max': 4000,
+        'baseline': 'window',
+        'base_offset': relativedelta(years=1),
+        'base_days': 2,
+    },
+    'modis_aqua': {
+        'collection': 'MODIS/061/MYD09GQ',
+        'filters': lambda c: c,
+        'index_query': {},
+        'base_filters': lambda c: c,
+        'add_index': _normalized_index(['sur_refl_b01', 'sur_refl_b02'], 'NDWI'),
+        'water': lambda image: image.select('NDWI').lt(0),
+        'rgb_bands': ['sur_refl_b02', 'sur_refl_b01', 'sur_refl_b01'],
+        'percentiles': (5, 95),
+        'stretch_scale': 250,
+        'default_max': 4000,
+        'baseline': 'window',
+        'base_offset': relativedelta(years=1),
+        'base_days': 2,
+    },
+    # Terra + Aqua juntos (modis_combined): composto diário melhor pixel, com o
+    # NDWI calculado uma vez por composto (ver daily_composites)
+    'modis': {
+        'collection': TERRA_COLLECTION,  # grade e exportação (iguais às do Aqua)
+        'collections': MODIS_COLLECTIONS,
+        'filters': lambda c: c.map(pixel_quality),
+        'index_query': {},
+        'base_filters': lambda c: c.map(pixel_quality),
+        'add_index': _normalized_index(['sur_refl_b01', 'sur_refl_b02'], 'NDWI'),
+        'quality_band': QUALITY_BAND,
+        'water': lambda image: image.select('NDWI').lt(0),
+        'rgb_bands': ['sur_refl_b02', 'sur_refl_b01', 'sur_refl_b01'],
+        'percentiles': (5, 95),
+        'stretch_scale': 250,
+        'default_max': 4000,
+        'baseline': 'window',
+        'base_offset': relativedelta(years=1),
+        'base_days': 2,
+    },
+}
+
+# Estilo das camadas de áreas inundadas e do contorno da AOI
+FLOOD_VIS = {'palette': 'red', 'min': 0, 'max': 1}
+AOI_STYLE = {'color': 'blue', 'fillColor': '00000000', 'width': 2}
+
+
+def aoi_bounds(lon, lat, buffer_degrees):
+    """Limites (minx, miny, maxx, maxy) da área de interesse."""
+    return (lon - buffer_degrees, lat - buffer_degrees, lon + buffer_degrees, lat + buffer_degrees)
+
+
+def aoi_geometry(lon, lat, buffer_degrees):
+    """
+    Retângulo da área de interesse (mesmos limites do buffer do ponto nos scripts).
+
+    O envelope de Point(lon, lat).buffer(buffer_degrees) é exatamente o
+    quadrado de lado 2 * buffer_degrees centrado no ponto.
+    """
+    return ee.Geometry.Rectangle(list(aoi_bounds(lon, lat, buffer_degrees)))
+
+
+def analysis_window(reference_date, dias_anteriores, dias_posteriores):
+    """Datas inicial e final (YYYY-MM-DD) do período de análise."""
+    ref_date = datetime.strptime(reference_date, '%Y-%m-%d')
+    start_date = (ref_date - timedelta(days=dias_anteriores)).strftime('%Y-%m-%d')
+    end_date = (ref_date + timedelta(days=dias_posteriores)).strftime('%Y-%m-%d')
+    return start_date, end_date
+
+
+def rgb_vis_params(flow, image, geometry):
+    """Stretch automático por percentis (calculate_rgb_vis_params dos scripts)."""
+    bands = flow['rgb_bands']
+    low, high = flow['percentiles']
+    default_max = flow['default_max']
+    unique_bands = list(dict.fromkeys(bands))
+    try:
+        percentiles = image.select(unique_bands).reduceRegion(
+            reducer=ee.Reducer.percentile([low, high]),
+            geometry=geometry,
+            scale=flow['stretch_scale'],
+            maxPixels=1e9
+        ).getInfo()
+    except ee.EEException:
+        return {'min': [0, 0, 0], 'max': [default_max] * 3}
+    return {
+        'min': [percentiles.get(f'{band}_p{low}', 0) for band in bands],
+        'max': [percentiles.get(f'{band}_p{high}', default_max) for band in bands]
+    }
+
+
+def build_rgb(flow, image, geometry, vis_params=None):
+    """Composição RGB e parâmetros de visualização de uma imagem (vis_params: stretch já calculado em lote)."""
+    if flow['rgb_bands'] is None:
+        return image.visualize(bands=['VV'], min=-25, max=0), {'min': -25, 'max': 0}
+    if vis_params is None:
+        vis_params = rgb_vis_params(flow, image, geometry)
+    return image.select(flow['rgb_bands']).visualize(**vis_params), vis_params
+
+
+def daily_stretches(flow, daily, geometry):
+    """Stretch de todos os mosaicos diários em uma única chamada (vazio no stretch fixo do radar)."""
+    if flow['rgb_bands'] is None:
+        return {}
+    return bulk_stretch(daily, flow['rgb_bands'], geometry, flow['stretch_scale'],
+                        flow['percentiles'], flow['default_max'])
+
+
+def source_collection(flow, geometry, start_date, end_date):
+    """Coleção do fluxo na AOI e no período, sem filtros (as coleções de 'collections' unidas num merge)."""
+    collections = [
+        ee.ImageCollection(collection_id).filterBounds(geometry).filterDate(start_date, end_date)
+        for collection_id in flow.get('collections', [flow['collection']])
+    ]
+    collection = collections[0]
+    for other in collections[1:]:
+        collection = collection.merge(other)
+    return collection
+
+
+def with_index(flow, collection):
+    """Índice de água em cada cena; com 'quality_band' o índice fica para o composto (daily_composites)."""
+    if 'quality_band' in flow:
+        return collection
+    return collection.map(flow['add_index'])
+
+
+def daily_composites(flow, collection, dates):
+    """
+    Mosaicos diários do fluxo, com o índice de água.
+
+    Com 'quality_band' (fluxo 'modis'), cada dia é o composto melhor pixel
+    das cenas e o índice é calculado uma vez por composto.
+    """
+    if 'quality_band' not in flow:
+        return daily_mosaics(collection, dates)
+    return daily_mosaics(collection, dates, flow['quality_band']).map(flow['add_index'])
+
+
+def inventory(flow, geometry, start_date, end_date, scene_index=None, bounds=None,
+              prefilter=False, min_clear=MIN_CLEAR_FRACTION):
+    """
+    Coleção do período (com o índice de água) e datas únicas, em uma única chamada ao servidor.
+
+    Com scene_index (e os limites da AOI em bounds), as datas vêm do índice
+    local e o servidor só é consultado para o trecho ainda não sincronizado.
+
+    Com prefilter (sensores ópticos), o limite de nuvens por cena é relaxado
+    e uma segunda chamada (etapa 'prefilter') calcula a fração sem nuvens da
+    AOI em cada cena; só as cenas com pelo menos min_clear seguem.
+
+    Retorna:
+    - Tupla (coleção, image_count, lista de (data, system:index), nº de cenas por data)
+    """
+    prefilter = prefilter and flow['collection'] in CLEAR_MASKS
+    filters = flow['prefilter_filters'] if prefilter else flow['filters']
+    collection = filters(source_collection(flow, geometry, start_date, end_date))
+    index_collection = with_index(flow, collection)
+
+    if scene_index is not None:
+        dates_list, indices_list = scene_index.inventory(
+            flow.get('collections', flow['collection']), bounds, start_date, end_date,
+            **(flow['prefilter_query'] if prefilter else flow['index_query'])
+        )
+    else:
+        def get_image_info(image):
+            return ee.Feature(None, {
+                'date': image.date().format('YYYY-MM-dd'),
+                'system:index': image.get('system:index')
+            })
+
+        image_info = index_collection.map(get_image_info)
+        info = ee.Dictionary({
+            'date': image_info.aggregate_array('date'),
+            'system:index': image_info.aggregate_array('system:index')
+        }).getInfo()
+        dates_list = info['date']
+        indices_list = info['system:index']
+
+    if prefilter and indices_list:
+        instrumentation.set_stage('prefilter')
+        fractions = clear_fractions(keep_only(collection, indices_list), flow['collection'], geometry)
+        dates_list, indices_list = usable_scenes(dates_list, indices_list, fractions, min_clear)
+        index_collection = keep_only(index_collection, indices_list)
+
+    unique_dates = []
+    scene_counts = {}
+    for date, idx in zip(dates_list, indices_list):
+        if date not in scene_counts:
+            unique_dates.append((date, idx))
+        scene_counts[date] = scene_counts.get(date, 0) + 1
+    return index_collection, len(dates_list), unique_dates, scene_counts
+
+
+def _baseline_window(flow, ref_date):
+    if flow['baseline'] == 'previous_year':
+        previous_year = ref_date.year - 1
+        return f"{previous_year}-01-01", f"{previous_year}-12-31", None
+    base_date = ref_date - flow['base_offset']
+    return (
+        (base_date - timedelta(days=flow['base_days'])).strftime('%Y-%m-%d'),
+        (base_date + timedelta(days=flow['base_days'])).strftime('%Y-%m-%d'),
+        base_date
+    )
+
+
+def baseline_collection(flow, geometry, reference_date):
+    """Coleção da base do sensor, filtrada (sem chamadas ao servidor)."""
+    base_start_date, base_end_date, _ = _baseline_window(flow, datetime.strptime(reference_date, '%Y-%m-%d'))
+    return flow['base_filters'](source_collection(flow, geometry, base_start_date, base_end_date))
+
+
+def harmonize(flow, collection, geometry, reference_date):
+    """
+    Coleção do período com o índice recalculado após a correção por trilha da base.
+
+    Só para fluxos com 'harmonize' (Sentinel-1, ver s1_tracks); os demais
+    voltam sem mudança. Com a base vazia as cenas ficam sem correção.
+    """
+    if 'harmonize' not in flow:
+        return collection
+    return flow['harmonize'](collection, baseline_collection(flow, geometry, reference_date)).map(flow['add_index'])
+
+
+def baseline(flow, geometry, reference_date):
+    """
+    Imagem de base do sensor (mediana do ano anterior ou janela antes da referência).
+
+    Retorna:
+    - Tupla (imagem de base com índice ou None, descrição da data)
+    """
+    ref_date = datetime.strptime(reference_date, '%Y-%m-%d')
+    base_date = _baseline_window(flow, ref_date)[2]
+    base_collection = baseline_collection(flow, geometry, reference_date)
+    base_count = base_collection.size().getInfo()
+    if base_count == 0:
+        return None, None
+
+    if flow['baseline'] == 'previous_year':
+        return flow['add_index'](base_collection.median()), f"{ref_date.year - 1} (Mediana anual)"
+
+    base_index_collection = base_collection.map(flow['add_index'])
+    if base_count > 1 and 'quality_band' in flow:
+        base_image = flow['add_index'](base_collection.qualityMosaic(flow['quality_band']))
+        return base_image.clip(geometry), base_date.strftime('%Y-%m-%d')
+    if base_count > 1:
+        return base_index_collection.mosaic().clip(geometry), base_date.strftime('%Y-%m-%d')
+    base_date_str = base_index_collection.first().date().format('YYYY-MM-dd').getInfo()
+    return base_index_collection.first().clip(geometry), base_date_str
+
+
+def run_flow(sensor, lon, lat, reference_date, dias_anteriores=20, dias_posteriores=20,
+             buffer_degrees=0.1, render=True, export=True, scene_index=None, prefilter=False):
+    """
+    Executa o fluxo completo de um sensor (equivalente ao script com display_mode='interactive').
+
+    As etapas são marcadas no tracer de instrumentation ('inventory',
+    'baseline', 'dates', 'stretch', 'render' e 'export'); os mosaicos
+    diários ('dates') não fazem chamadas ao servidor e o stretch de todas as
+    datas é uma única chamada.
+
+    Parâmetros:
+    - sensor: Chave de SENSOR_FLOWS (ex.: 'sentinel2')
+    - lon, lat: Coordenada de interesse
+    - reference_date: Data de referência (YYYY-MM-DD)
+    - dias_anteriores, dias_posteriores: Janela de análise em dias
+    - buffer_degrees: Buffer da AOI em graus
+    - render: Obtém os map IDs das camadas (como os addLayer dos mapas)
+    - export: Cria as tarefas de exportação da última data (sem iniciar)
+    - scene_index: scene_index.SceneIndex para o inventário local (opcional)
+    - prefilter: Descarta as cenas com a AOI nublada antes do stretch (ver inventory)
+
+    Retorna:
+    - Dicionário com 'sensor', 'image_count', 'dates', 'panels' e 'tasks'
+    """
+    flow = SENSOR_FLOWS[sensor]
+    geometry = aoi_geometry(lon, lat, buffer_degrees)
+    start_date, end_date = analysis_window(reference_date, dias_anteriores, dias_posteriores)
+    result = {'sensor': sensor, 'image_count': 0, 'dates': [], 'panels': [], 'tasks': []}
+
+    instrumentation.set_stage('inventory')
+    collection, image_count, unique_dates, scene_counts = inventory(
+        flow, geometry, start_date, end_date, scene_index, aoi_bounds(lon, lat, buffer_degrees), prefilter
+    )
+    result['image_count'] = image_count
+    result['dates'] = [date for date, _ in unique_dates]
+    if image_count == 0:
+        return result
+
+    instrumentation.set_stage('baseline')
+    panels = []
+    base_image, base_date_str = baseline(flow, geometry, reference_date)
+    if base_image is not None:
+        collection = harmonize(flow, collection, geometry, reference_date)
+        base_rgb, base_vis = build_rgb(flow, base_image, geometry)
+        panels.append({
+            'date': base_date_str,
+            'rgb': base_rgb,
+            'vis_params': base_vis,
+            'flood': flow['water'](base_image).selfMask().visualize(**FLOOD_VIS)
+        })
+
+    instrumentation.set_stage('dates')
+    # Mosaicos diários em uma única expressão (datas já conhecidas pelo inventário)
+    daily = daily_composites(flow, collection, [date for date, _ in unique_dates])
+    images = [(date, image_for_date(daily, date)) for date, _ in unique_dates]
+    image = images[-1][1] if images else None
+    # Cena original da última data (preserva a grade nativa para exportação)
+    reference_scene = collection.filterDate(f"{unique_dates[-1][0]}T00:00:00",
+                                            f"{unique_dates[-1][0]}T23:59:59").first()
+
+    instrumentation.set_stage('stretch')
+    stretches = daily_stretches(flow, daily, geometry)
+    water = None
+    for date, image in images:
+        # Datas ausentes do lote (falha da redução) voltam ao stretch por imagem
+        rgb_image, vis_params = build_rgb(flow, image, geometry, stretches.get(date))
+        water = flow['water'](image)
+        panels.append({
+            'date': date,
+            'rgb': rgb_image,
+            'vis_params': vis_params,
+            'flood': water.selfMask().visualize(**FLOOD_VIS)
+        })
+    result['panels'] = panels
+
+    if render:
+        instrumentation.set_stage('render')
+        aoi_layer = ee.FeatureCollection([ee.Feature(geometry)]).style(**AOI_STYLE)
+        for panel in panels:
+            aoi_layer.getMapId({})
+            panel['rgb'].getMapId({})
+            panel['flood'].getMapId({})
+
+    if export and image is not None:
+        instrumentation.set_stage('export')
+        result['tasks'] = [
+            export_image_to_drive(panels[-1]['rgb'], 'RGB_inundacao', geometry, reference_scene, flow['collection']),
+            export_image_to_drive(analytic_flood_mask(water), 'areas_inundadas', geometry, reference_scene,
+                                  flow['collection'], nodata=MASK_NODATA),
+            export_image_to_drive(scaled_index(image, flow['collection']), 'indice_agua', geometry,
+                                  reference_scene, flow['collection'], nodata=INDEX_NODATA)
+        ]
+    return result
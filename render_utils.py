@@ -0,0 +1,232 @@
+import hashlib
+import io
+import json
+import os
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import ee
+from PIL import Image, ImageDraw, ImageFont, ImageSequence
+
+
+# Altura da faixa de cabeçalho dos quadros do timelapse (pixels)
+LABEL_HEIGHT = 30
+
+
+def expression_hash(image, params=None):
+    """
+    Gera um hash estável da expressão do Earth Engine e dos parâmetros de renderização.
+
+    Parâmetros:
+    - image: Objeto do Earth Engine (imagem, geometria...)
+    - params: Dicionário de parâmetros adicionais (opcional)
+
+    Retorna:
+    - String hexadecimal SHA-256
+    """
+    payload = image.serialize() + json.dumps(params or {}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def resolve_rgb(panel):
+    """
+    Retorna a composição RGB do painel, calculando o stretch adiado se necessário.
+
+    Painéis criados fora do modo 'interactive' trazem 'rgb' = None e uma função
+    'build_rgb' que devolve (rgb, vis_params); o resultado fica guardado no painel.
+    """
+    if panel.get('rgb') is None:
+        panel['rgb'], panel['vis_params'] = panel['build_rgb']()
+    return panel['rgb']
+
+
+def resolve_rgbs(panels, max_workers=8):
+    """
+    Resolve os stretches adiados de todos os painéis em paralelo (ver resolve_rgb).
+
+    Parâmetros:
+    - panels: Lista de dicionários com 'rgb' (ou 'build_rgb'), como maps_list
+    - max_workers: Número de cálculos simultâneos (padrão: 8)
+
+    Retorna:
+    - Lista das composições RGB, na ordem dos painéis
+    """
+    pending = [panel for panel in panels if panel.get('rgb') is None]
+    if pending:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(resolve_rgb, pending))
+    return [panel['rgb'] for panel in panels]
+
+
+def aoi_outline(geometry, color='0000ff', width=2):
+    """Desenha o contorno da área de interesse como imagem RGB (sem preenchimento)."""
+    return ee.Image().byte().paint(
+        ee.FeatureCollection([ee.Feature(geometry)]), 1, width
+    ).visualize(palette=[color])
+
+
+def compose_panel(rgb_image, flooded_area, geometry):
+    """
+    Combina composição RGB, áreas inundadas e contorno da AOI em uma única imagem.
+
+    Parâmetros:
+    - rgb_image: Composição RGB já visualizada
+    - flooded_area: Áreas inundadas já visualizadas (vermelho)
+    - geometry: Área de interesse
+
+    Retorna:
+    - ee.Image RGB pronta para miniatura
+    """
+    return rgb_image.blend(flooded_area).blend(aoi_outline(geometry))
+
+
+def render_thumbnail(image, region, cache_dir, dimensions=768):
+    """
+    Renderiza uma miniatura PNG via getThumbURL, com cache pelo hash da expressão.
+
+    Parâmetros:
+    - image: Imagem RGB já visualizada
+    - region: Região da miniatura
+    - cache_dir: Pasta do cache de PNGs
+    - dimensions: Maior dimensão da miniatura em pixels (padrão: 768)
+
+    Retorna:
+    - Caminho do PNG
+    """
+    params = {'region': region, 'dimensions': dimensions, 'format': 'png'}
+    key = expression_hash(image, {'region': region.serialize(), 'dimensions': dimensions})
+    path = os.path.join(cache_dir, f"{key}.png")
+    if os.path.exists(path):
+        return path
+
+    url = image.getThumbURL(params)
+    with urllib.request.urlopen(url) as response:
+        data = response.read()
+
+    # Grava em arquivo temporário para não deixar PNG incompleto no cache
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def render_thumbnails(panels, region, cache_dir, dimensions=768, max_workers=8):
+    """
+    Renderiza em paralelo as miniaturas de todos os painéis (base + datas).
+
+    Parâmetros:
+    - panels: Lista de dicionários com 'date', 'filename', 'rgb' (ou 'build_rgb') e 'flood' (como maps_list)
+    - region: Área de interesse (também desenhada como contorno)
+    - cache_dir: Pasta do cache de PNGs
+    - dimensions: Maior dimensão das miniaturas em pixels (padrão: 768)
+    - max_workers: Número de requisições simultâneas (padrão: 8)
+
+    Retorna:
+    - Lista de dicionários com 'date', 'filename' e 'png', na ordem dos painéis
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+
+    def render(panel):
+        image = compose_panel(resolve_rgb(panel), panel['flood'], region)
+        return render_thumbnail(image, region, cache_dir, dimensions)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pngs = list(executor.map(render, panels))
+
+    return [
+        {'date': panel['date'], 'filename': panel['filename'], 'png': png}
+        for panel, png in zip(panels, pngs)
+    ]
+
+
+def label_frames(frames, header, dates):
+    """
+    Adiciona a cada quadro o mesmo cabeçalho dos painéis HTML: 'cidade_uf - sensor' e a data.
+
+    Parâmetros:
+    - frames: Lista de imagens PIL
+    - header: Texto à esquerda (ex.: f"{cidade_uf} - {sensor_name}")
+    - dates: Lista de rótulos de data (à direita), um por quadro
+
+    Retorna:
+    - Lista de imagens PIL RGB com a faixa de cabeçalho
+    """
+    font = ImageFont.load_default()
+    labeled = []
+    for frame, date in zip(frames, dates):
+        frame = frame.convert('RGB')
+        canvas = Image.new('RGB', (frame.width, frame.height + LABEL_HEIGHT), '#f5f5f5')
+        canvas.paste(frame, (0, LABEL_HEIGHT))
+        draw = ImageDraw.Draw(canvas)
+        draw.line([(0, LABEL_HEIGHT - 1), (frame.width, LABEL_HEIGHT - 1)], fill='#dddddd')
+        draw.text((12, 8), header, fill='black', font=font)
+        date_width = draw.textlength(date, font=font)
+        draw.text((frame.width - 12 - date_width, 8), date, fill='black', font=font)
+        labeled.append(canvas)
+    return labeled
+
+
+def _server_frames(panels, region, dimensions):
+    """Busca todos os quadros em uma única requisição de vídeo (getVideoThumbURL)."""
+    # Stretches adiados calculados em paralelo, não um painel por vez
+    collection = ee.ImageCollection([
+        compose_panel(rgb, panel['flood'], region) for rgb, panel in zip(resolve_rgbs(panels), panels)
+    ])
+    url = collection.getVideoThumbURL({
+        'region': region,
+        'dimensions': dimensions,
+        'framesPerSecond': 1,
+        'format': 'gif'
+    })
+    with urllib.request.urlopen(url) as response:
+        gif = Image.open(io.BytesIO(response.read()))
+        return [frame.copy() for frame in ImageSequence.Iterator(gif)]
+
+
+def render_timelapse(panels, region, filename, header, source='server', cache_dir=None,
+                     dimensions=768, fps=1):
+    """
+    Gera um único timelapse (GIF ou MP4) da base e de todas as datas do evento.
+
+    Com source='server' os quadros vêm de uma só requisição de vídeo sobre a
+    coleção de painéis; com source='thumbnails' reaproveita o renderizador local
+    (render_thumbnails e seu cache). Os rótulos são desenhados localmente.
+
+    Parâmetros:
+    - panels: Lista de dicionários com 'date', 'filename', 'rgb' (ou 'build_rgb') e 'flood' (como maps_list)
+    - region: Área de interesse
+    - filename: Caminho de saída (.gif ou .mp4)
+    - header: Texto do cabeçalho (ex.: f"{cidade_uf} - {sensor_name}")
+    - source: 'server' ou 'thumbnails' (padrão: 'server')
+    - cache_dir: Pasta do cache de miniaturas (obrigatória com source='thumbnails')
+    - dimensions: Maior dimensão dos quadros em pixels (padrão: 768)
+    - fps: Quadros por segundo (padrão: 1)
+
+    Retorna:
+    - Caminho do arquivo gravado
+    """
+    if source == 'server':
+        frames = _server_frames(panels, region, dimensions)
+    else:
+        thumbs = render_thumbnails(panels, region, cache_dir, dimensions)
+        frames = [Image.open(thumb['png']) for thumb in thumbs]
+
+    frames = label_frames(frames, header, [panel['date'] for panel in panels])
+
+    if filename.lower().endswith('.mp4'):
+        # MP4 depende do imageio (com ffmpeg); GIF usa apenas o Pillow
+        import imageio.v2 as imageio
+        import numpy as np
+        with imageio.get_writer(filename, fps=fps) as writer:
+            for frame in frames:
+                writer.append_data(np.asarray(frame))
+    else:
+        frames[0].save(
+            filename,
+            save_all=True,
+            append_images=frames[1:],
+            duration=int(1000 / fps),
+            loop=0
+        )
+    return filename
@@ -0,0 +1,192 @@
+import base64
+import html
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import ee
+
+from render_utils import compose_panel, render_thumbnail, resolve_rgb
+
+
+# Mesmo estilo do cabeçalho dos painéis ipywidgets
+LABEL_STYLE = (
+    'display: flex; justify-content: space-between; padding: 8px 12px; '
+    'background-color: #f5f5f5; border-bottom: 1px solid #ddd; font-weight: bold; font-size: 13px;'
+)
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 0; }}
+.grid {{ display: grid; grid-template-columns: 1fr 1fr; gap: 0; }}
+.panel img {{ width: 100%; display: block; }}
+.pending {{ height: 300px; display: flex; align-items: center; justify-content: center; color: #999; }}
+table {{ border-collapse: collapse; margin: 16px 12px; font-size: 13px; }}
+th, td {{ border: 1px solid #ddd; padding: 4px 12px; text-align: right; }}
+th:first-child, td:first-child {{ text-align: left; }}
+@media print {{ .panel {{ break-inside: avoid; }} }}
+</style>
+</head>
+<body>
+<div class="grid">
+{panels}
+</div>
+{table}
+</body>
+</html>
+"""
+
+
+def flooded_area_table(panels, region, scale):
+    """
+    Calcula a área inundada (km²) de todos os painéis em uma única chamada ao servidor.
+
+    Parâmetros:
+    - panels: Lista de dicionários com 'date' e 'mask' (máscara booleana de água)
+    - region: Área de interesse
+    - scale: Escala da redução em metros (resolução nativa do sensor)
+
+    Retorna:
+    - Lista de dicionários com 'date' e 'area_km2'
+    """
+    features = ee.FeatureCollection([
+        ee.Feature(None, {
+            'date': panel['date'],
+            'area_km2': panel['mask'].selfMask().multiply(ee.Image.pixelArea()).reduceRegion(
+                reducer=ee.Reducer.sum(),
+                geometry=region,
+                scale=scale,
+                maxPixels=1e9
+            ).values().reduce(ee.Reducer.sum()).divide(1e6)
+        })
+        for panel in panels
+    ])
+    info = features.getInfo()
+    return [
+        {'date': f['properties']['date'], 'area_km2': f['properties'].get('area_km2') or 0.0}
+        for f in info['features']
+    ]
+
+
+def _panel_html(header, date, png=None):
+    """Gera o HTML de um painel (cabeçalho + imagem embutida ou marcador pendente)."""
+    label = (
+        f'<div style="{LABEL_STYLE}"><span>{html.escape(header)}</span>'
+        f'<span>{html.escape(date)}</span></div>'
+    )
+    if png is None:
+        body = '<div class="pending">Processando...</div>'
+    else:
+        with open(png, 'rb') as f:
+            data = base64.b64encode(f.read()).decode('ascii')
+        body = f'<img src="data:image/png;base64,{data}" alt="{html.escape(date)}">'
+    return f'<div class="panel">{label}{body}</div>'
+
+
+def _table_html(areas):
+    """Gera a tabela de áreas inundadas."""
+    if not areas:
+        return ''
+    rows = ''.join(
+        f"<tr><td>{html.escape(row['date'])}</td><td>{row['area_km2']:.2f}</td></tr>"
+        for row in areas
+    )
+    return f'<table><tr><th>Data</th><th>Área inundada (km²)</th></tr>{rows}</table>'
+
+
+def write_report(filename, header, panels, pngs, areas=None):
+    """
+    Grava o relatório HTML autocontido (imagens embutidas em base64).
+
+    A gravação é atômica, de modo que o arquivo pode ser aberto a qualquer
+    momento enquanto os painéis ainda estão chegando.
+
+    Parâmetros:
+    - filename: Caminho do .html
+    - header: Texto do cabeçalho dos painéis (ex.: f"{cidade_uf} - {sensor_name}")
+    - panels: Lista de dicionários com 'date' (como maps_list)
+    - pngs: Dicionário índice do painel -> caminho do PNG já renderizado
+    - areas: Tabela de áreas inundadas (ver flooded_area_table)
+    """
+    page = PAGE_TEMPLATE.format(
+        title=html.escape(header),
+        panels='\n'.join(
+            _panel_html(header, panel['date'], pngs.get(i)) for i, panel in enumerate(panels)
+        ),
+        table=_table_html(areas)
+    )
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        f.write(page)
+    os.replace(tmp_filename, filename)
+
+
+def build_report(panels, region, filename, header, scale, cache_dir,
+                 dimensions=768, max_workers=8, pdf=False):
+    """
+    Gera o relatório estático (HTML e, opcionalmente, PDF) de um sensor/AOI.
+
+    O arquivo é regravado a cada miniatura concluída, então o relatório pode
+    ser aberto sem kernel enquanto os resultados chegam.
+
+    Parâmetros:
+    - panels: Lista de dicionários com 'date', 'rgb' (ou 'build_rgb'), 'flood' e 'mask' (como maps_list)
+    - region: Área de interesse
+    - filename: Caminho do .html
+    - header: Texto do cabeçalho (ex.: f"{cidade_uf} - {sensor_name}")
+    - scale: Escala (m) do cálculo de área inundada
+    - cache_dir: Pasta do cache de miniaturas
+    - dimensions: Maior dimensão das miniaturas em pixels (padrão: 768)
+    - max_workers: Número de requisições simultâneas (padrão: 8)
+    - pdf: Também gera o PDF ao lado do HTML (requer weasyprint)
+
+    Retorna:
+    - Caminho do HTML gravado
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    pngs = {}
+    write_report(filename, header, panels, pngs)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        areas_future = executor.submit(flooded_area_table, panels, region, scale)
+        futures = {
+            executor.submit(
+                lambda panel: render_thumbnail(
+                    compose_panel(resolve_rgb(panel), panel['flood'], region),
+                    region, cache_dir, dimensions
+                ),
+                panel
+            ): i
+            for i, panel in enumerate(panels)
+        }
+        for future in as_completed(futures):
+            pngs[futures[future]] = future.result()
+            write_report(filename, header, panels, pngs)
+        areas = areas_future.result()
+
+    write_report(filename, header, panels, pngs, areas)
+
+    if pdf:
+        # PDF é opcional e depende do weasyprint
+        from weasyprint import HTML as WeasyHTML
+        WeasyHTML(filename).write_pdf(os.path.splitext(filename)[0] + '.pdf')
+
+    return filename
+
+
+def build_reports(jobs, max_workers=4):
+    """
+    Gera vários relatórios em paralelo (modo em lote).
+
+    Parâmetros:
+    - jobs: Lista de dicionários com os argumentos de build_report
+    - max_workers: Número de relatórios simultâneos (padrão: 4)
+
+    Retorna:
+    - Lista de caminhos dos HTML gravados, na ordem dos jobs
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda job: build_report(**job), jobs))
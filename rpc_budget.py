@@ -0,0 +1,249 @@
+import argparse
+import itertools
+import sys
+from collections import Counter
+from contextlib import contextmanager
+
+import ee_standin
+from script_runner import SCRIPT_FLOWS, run_script
+
+# Orçamento de chamadas bloqueantes ao Earth Engine por etapa. Vale para os
+# scripts dos sensores (executados como estão, ver script_runner) e para
+# pipeline.run_flow. Cada limite é um inteiro ou uma função da execução (ex.:
+# chamadas por painel renderizado). Roda contra o backend local (ee_standin),
+# instalado como 'ee' só quando uma verificação é executada.
+
+DEFAULT_BUDGETS = {
+    'setup': 0,
+    'inventory': 1,                                   # datas + system:index em uma chamada
+    'prefilter': 1,                                   # fração sem nuvens da AOI de todas as cenas
+    'baseline': 3,                                    # nº de cenas, data da cena única e stretch
+    'dates': 0,                                       # laço por data: nenhuma chamada
+    'stretch': 1,                                     # percentis de todos os mosaicos diários
+    'render': lambda run: 3 * len(run['panels']),     # AOI, RGB e áreas inundadas por painel
+    'export': 3,                                      # grade nativa de cada produto
+}
+
+# Ajustes por sensor (mesmas chaves de pipeline.SENSOR_FLOWS)
+SENSOR_BUDGETS = {
+    'sentinel1': {'baseline': 1, 'stretch': 0},       # stretch fixo (-25 a 0 dB)
+    'sentinel2': {'baseline': 2},                     # mediana anual: sem data da cena
+}
+
+
+# Chamadas de cada painel interativo dos scripts: AOI, RGB e áreas inundadas
+# (getMapId) e centerObject (getInfo), atribuídas à etapa 'render'
+PANEL_CALLS = 4
+
+
+class RPCBudgetExceeded(AssertionError):
+    """Alguma etapa fez mais chamadas ao servidor do que o orçamento permite."""
+
+    def __init__(self, violations):
+        self.violations = violations
+        super().__init__(format_violations(violations))
+
+
+def _activate():
+    """
+    Instala o backend local como 'ee' e importa os módulos do projeto sobre ele.
+
+    Lança RuntimeError se o pipeline já foi importado com o cliente real
+    (os módulos guardariam o 'ee' antigo).
+
+    Retorna:
+    - Tupla (instrumentation, pipeline)
+    """
+    for name in ('instrumentation', 'pipeline'):
+        module = sys.modules.get(name)
+        if module is not None and module.ee is not ee_standin:
+            raise RuntimeError(f"'{name}' já foi importado com o cliente real do Earth Engine")
+    if sys.modules.get('ee') is not ee_standin:
+        ee_standin.activate()
+    import instrumentation
+    import pipeline
+    instrumentation.install()
+    return instrumentation, pipeline
+
+
+def budgets_for(sensor, overrides=None):
+    """Orçamento efetivo de um sensor (padrão + ajustes do sensor + overrides)."""
+    budgets = dict(DEFAULT_BUDGETS)
+    budgets.update(SENSOR_BUDGETS.get(sensor, {}))
+    budgets.update(overrides or {})
+    return budgets
+
+
+def script_budgets(script, overrides=None):
+    """
+    Orçamento efetivo de um script de sensor.
+
+    Parte do orçamento do fluxo equivalente (stretch constante: uma chamada
+    para todas as datas); os mapas dos painéis contam em 'render' e o índice
+    de cenas sincroniza cada coleção com uma chamada.
+    """
+    _, pipeline = _activate()
+    sensor = SCRIPT_FLOWS[script]
+    flow = pipeline.SENSOR_FLOWS[sensor]
+    budgets = budgets_for(sensor)
+    budgets.update({
+        'inventory': len(flow.get('collections', [flow['collection']])),
+        'render': lambda run: PANEL_CALLS * len(run['panels']),
+    })
+    budgets.update(overrides or {})
+    return budgets
+
+
+def stage_calls(tracer):
+    """
+    Chamadas ao servidor agrupadas por etapa.
+
+    Retorna:
+    - Dicionário etapa -> Counter de (tipo, nome, ponto de chamada)
+    """
+    calls = {}
+    for stage, kind, name, _, _, site in list(tracer.events):
+        if kind == 'local':
+            continue
+        calls.setdefault(stage, Counter())[(kind, name, site)] += 1
+    return calls
+
+
+def check_tracer(tracer, budgets, run=None, label=''):
+    """
+    Compara as chamadas registradas no tracer com o orçamento.
+
+    Etapas sem orçamento declarado não são verificadas.
+
+    Retorna:
+    - Lista de violações (dicionários com 'label', 'stage', 'limit', 'count' e 'calls')
+    """
+    violations = []
+    for stage, calls in stage_calls(tracer).items():
+        if stage not in budgets:
+            continue
+        limit = budgets[stage]
+        if callable(limit):
+            limit = limit(run or {})
+        count = sum(calls.values())
+        if count > limit:
+            violations.append({'label': label, 'stage': stage, 'limit': limit, 'count': count, 'calls': calls})
+    return violations
+
+
+def format_violations(violations):
+    """Relatório legível das violações, com os pontos de chamada responsáveis."""
+    lines = []
+    for v in violations:
+        prefix = f"{v['label']}: " if v['label'] else ''
+        lines.append(f"{prefix}etapa '{v['stage']}' fez {v['count']} chamada(s); limite {v['limit']}")
+        for (kind, name, site), n in v['calls'].most_common():
+            lines.append(f"    {n:>4} x {kind:<12} {name:<28} {site or '?'}")
+    return '\n'.join(lines)
+
+
+@contextmanager
+def rpc_budget(budgets, label=''):
+    """
+    Context manager que verifica o orçamento das etapas executadas no bloco.
+
+    Uso (em testes):
+        with rpc_budget({'inventory': 1, 'dates': 0}):
+            pipeline.run_flow('sentinel2', lon, lat, '2022-01-13')
+
+    Lança RPCBudgetExceeded ao sair se algum limite for excedido.
+    """
+    instrumentation, _ = _activate()
+    previous = instrumentation.tracer
+    tracer = instrumentation.reset(capture_sites=True)
+    try:
+        yield tracer
+    finally:
+        instrumentation.tracer = previous
+    tracer.finish()
+    violations = check_tracer(tracer, budgets, label=label)
+    if violations:
+        raise RPCBudgetExceeded(violations)
+
+
+def check_flow(sensor, overrides=None, lon=-41.948, lat=-18.851, reference_date='2022-01-13', **kwargs):
+    """
+    Executa o fluxo de um sensor no backend local e verifica o orçamento.
+
+    Parâmetros:
+    - sensor: Chave de pipeline.SENSOR_FLOWS
+    - overrides: Limites que substituem os padrões (opcional)
+    - kwargs: Repassados a pipeline.run_flow (janela, buffer, render, export)
+
+    Retorna:
+    - Lista de violações (vazia se dentro do orçamento)
+    """
+    instrumentation, pipeline = _activate()
+    ee_standin.configure()
+    tracer = instrumentation.reset(capture_sites=True)
+    run = pipeline.run_flow(sensor, lon, lat, reference_date, **kwargs)
+    tracer.finish()
+    label = f"{sensor} ({', '.join(f'{k}={v}' for k, v in sorted(kwargs.items()))})"
+    return check_tracer(tracer, budgets_for(sensor, overrides), run, label)
+
+
+def assert_flow_budget(sensor, overrides=None, **kwargs):
+    """Como check_flow, mas lança RPCBudgetExceeded se houver violações."""
+    violations = check_flow(sensor, overrides, **kwargs)
+    if violations:
+        raise RPCBudgetExceeded(violations)
+
+
+def check_script(script, overrides=None, **settings):
+    """
+    Executa um script de sensor no backend local e verifica o orçamento.
+
+    O script roda como está, em um processo separado (ver script_runner.run_script).
+
+    Parâmetros:
+    - script: Chave de SCRIPT_FLOWS (ex.: 'Sentinel_2.py')
+    - overrides: Limites que substituem os do script (opcional)
+    - settings: Configurações do topo do script (ex.: dias_anteriores=10)
+
+    Retorna:
+    - Lista de violações (vazia se dentro do orçamento)
+    """
+    instrumentation, _ = _activate()
+    budgets = script_budgets(script, overrides)
+    result = run_script(script, settings)
+    tracer = instrumentation.Tracer(capture_sites=True)
+    tracer.events = result['events']
+    label = script
+    if settings:
+        label += f" ({', '.join(f'{k}={v}' for k, v in sorted(settings.items()))})"
+    return check_tracer(tracer, budgets, result, label)
+
+
+def main(argv=None):
+    _, pipeline = _activate()
+    parser = argparse.ArgumentParser(description='Verifica o orçamento de chamadas ao EE por etapa')
+    parser.add_argument('--scripts', nargs='+', choices=list(SCRIPT_FLOWS), default=None)
+    parser.add_argument('--sensors', nargs='+', choices=list(pipeline.SENSOR_FLOWS), default=None)
+    parser.add_argument('--windows', nargs='+', type=int, default=[10, 40])
+    parser.add_argument('--buffers', nargs='+', type=float, default=[0.1])
+    parser.add_argument('--prefilter', action='store_true', help='fluxos do pipeline com o pré-filtro de nuvens na AOI (os scripts usam a própria configuração)')
+    args = parser.parse_args(argv)
+
+    violations = []
+    # Scripts com a própria configuração; janelas e buffers valem para os fluxos
+    for script in args.scripts or list(SCRIPT_FLOWS):
+        violations += check_script(script)
+    for sensor, window, buffer_degrees in itertools.product(
+        args.sensors or list(pipeline.SENSOR_FLOWS), args.windows, args.buffers
+    ):
+        violations += check_flow(sensor, dias_anteriores=window, dias_posteriores=window,
+                                 buffer_degrees=buffer_degrees, prefilter=args.prefilter)
+    if violations:
+        print(format_violations(violations))
+        return 1
+    print('Orçamento de chamadas respeitado em todas as etapas.')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
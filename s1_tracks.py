@@ -0,0 +1,51 @@
+import ee
+
+
+# Passagens ascendente e descendente do Sentinel-1 na mesma linha do tempo.
+# O retroespalhamento (VV) de uma mesma área muda com a geometria de aquisição
+# (passagem e órbita relativa); antes do limiar, cada cena é levada ao nível
+# da base combinada (todas as trilhas) pela diferença entre essa base e a base
+# da sua trilha, para o limiar de VV valer igual nas duas passagens.
+
+# Passagens usadas (antes só 'DESCENDING': metade das aquisições)
+ORBIT_PASSES = ('ASCENDING', 'DESCENDING')
+
+# Propriedades que identificam a trilha (geometria de aquisição) da cena
+TRACK_PROPERTIES = ('orbitProperties_pass', 'relativeOrbitNumber_start')
+
+
+def same_track(collection, image):
+    """Cenas da coleção com a mesma passagem e órbita relativa da imagem (filtro no servidor)."""
+    for prop in TRACK_PROPERTIES:
+        collection = collection.filter(ee.Filter.eq(prop, image.get(prop)))
+    return collection
+
+
+def harmonize_tracks(collection, base_collection, band='VV'):
+    """
+    Leva a banda de cada cena ao nível da base combinada de todas as trilhas.
+
+    A correção é pixel a pixel: mediana da base combinada menos a mediana da
+    base da trilha da cena. Trilhas sem cenas na base (e pixels fora delas)
+    ficam sem correção; com a base vazia nenhuma cena é corrigida. Tudo no
+    servidor, sem chamadas extras.
+
+    Parâmetros:
+    - collection: Coleção do período (com a banda band)
+    - base_collection: Coleção da base (ex.: ano anterior), com os mesmos filtros
+    - band: Banda corrigida
+
+    Retorna:
+    - ee.ImageCollection com a banda corrigida (demais bandas e propriedades preservadas)
+    """
+    reference = base_collection.select(band).median()
+    has_base = base_collection.size().gt(0)
+
+    def harmonize(image):
+        track = same_track(base_collection, image).select(band)
+        track_median = ee.Image(ee.Algorithms.If(track.size().gt(0), track.median(), reference))
+        offset = reference.subtract(track_median).unmask(0)
+        corrected = image.addBands(image.select(band).add(offset).rename(band), None, True)
+        return ee.Image(ee.Algorithms.If(has_base, corrected, image))
+
+    return collection.map(harmonize)
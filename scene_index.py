@@ -0,0 +1,332 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import ee
+from shapely.geometry import box, shape
+
+
+# Índice local (SQLite) dos metadados das cenas: system:index, aquisição,
+# nuvens, órbita e footprint. As consultas do inventário são respondidas
+# localmente; o servidor só é consultado para o trecho do período ainda não
+# sincronizado para a coleção e a região.
+
+# Banco padrão (compartilhado entre sessões, como o cache de map IDs)
+DB_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'satelite', 'scenes.sqlite')
+
+# Propriedade de cobertura de nuvens de cada coleção (None: sem nuvens)
+CLOUD_PROPERTIES = {
+    'COPERNICUS/S2_SR_HARMONIZED': 'CLOUDY_PIXEL_PERCENTAGE',
+    'COPERNICUS/S1_GRD': None,
+    'LANDSAT/LC08/C02/T1_L2': 'CLOUD_COVER',
+    'LANDSAT/LT05/C02/T1_L2': 'CLOUD_COVER',
+    'MODIS/061/MOD09GQ': None,
+    'MODIS/061/MYD09GQ': None,
+}
+
+# Filtros fixos aplicados antes de indexar. Nuvens e passagem da órbita ficam
+# de fora: são colunas do índice e filtradas na consulta.
+INDEX_FILTERS = {
+    'COPERNICUS/S1_GRD': lambda c: (
+        c.filter(ee.Filter.eq('resolution_meters', 10))
+        .filter(ee.Filter.eq('instrumentMode', 'IW'))
+        .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VV'))
+    ),
+}
+
+# Cenas adquiridas até INGESTION_LAG_DAYS antes da última sincronização são
+# buscadas de novo (a ingestão no EE pode atrasar alguns dias)
+INGESTION_LAG_DAYS = 3
+_LAG_MS = INGESTION_LAG_DAYS * 86400000
+
+# Cada trecho sincronizado é uma linha de sync_ranges (trechos separados não
+# cobrem o intervalo entre eles). A tabela 'syncs' das versões anteriores
+# guardava um único intervalo por região e é descartada.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenes (
+    collection TEXT NOT NULL,
+    system_index TEXT NOT NULL,
+    time_start INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    cloud REAL,
+    orbit_pass TEXT,
+    relative_orbit INTEGER,
+    footprint TEXT,
+    minx REAL, miny REAL, maxx REAL, maxy REAL,
+    PRIMARY KEY (collection, system_index)
+);
+CREATE INDEX IF NOT EXISTS scenes_time ON scenes (collection, time_start);
+DROP TABLE IF EXISTS syncs;
+CREATE TABLE IF NOT EXISTS sync_ranges (
+    collection TEXT NOT NULL,
+    region_key TEXT NOT NULL,
+    minx REAL, miny REAL, maxx REAL, maxy REAL,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    synced_ms INTEGER NOT NULL,
+    PRIMARY KEY (collection, region_key, start_ms)
+);
+"""
+
+
+def _to_millis(date_str):
+    """'YYYY-MM-DD' (UTC) em milissegundos."""
+    return int(datetime.strptime(date_str, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def _to_date(millis):
+    """Milissegundos em 'YYYY-MM-DD' (UTC)."""
+    return (datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(milliseconds=millis)).strftime('%Y-%m-%d')
+
+
+def _footprint_bounds(geometry):
+    """Envelope (minx, miny, maxx, maxy) de um GeoJSON (None se vazio)."""
+    points = []
+
+    def walk(coords):
+        if coords and isinstance(coords[0], (int, float)):
+            points.append(coords)
+        else:
+            for c in coords or []:
+                walk(c)
+    walk((geometry or {}).get('coordinates'))
+    if not points:
+        return None, None, None, None
+    xs, ys = [p[0] for p in points], [p[1] for p in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _footprint_intersects(footprint, region):
+    """True se o footprint (GeoJSON em texto) intersecta a região; sem footprint, True."""
+    geometry = json.loads(footprint) if footprint else None
+    if not geometry or not geometry.get('coordinates'):
+        return True
+    return shape(geometry).intersects(region)
+
+
+def region_key(bounds):
+    """Chave estável de uma região (limites arredondados a 1e-4 graus)."""
+    return ','.join(f"{v:.4f}" for v in bounds)
+
+
+class SceneIndex:
+    """
+    Índice local de cenas por coleção e região, com sincronização incremental.
+
+    Uso:
+        index = SceneIndex()
+        dates_list, indices_list = index.inventory(
+            'COPERNICUS/S2_SR_HARMONIZED', (minx, miny, maxx, maxy),
+            start_date, end_date, cloud_lt=20
+        )
+
+    A conexão pode ser usada por várias threads (acesso serializado por lock).
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        if db_file != ':memory:':
+            os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
+        self.db_file = db_file
+        self.server_calls = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _synced_intervals(self, collection, bounds):
+        """
+        Intervalos já sincronizados (ms, ordenados e unidos) de regiões que contêm 'bounds'.
+
+        Cada trecho só vale até INGESTION_LAG_DAYS antes de quando foi
+        sincronizado (cenas mais recentes ainda podem ser ingeridas).
+        """
+        minx, miny, maxx, maxy = bounds
+        rows = self._conn.execute(
+            "SELECT start_ms, MIN(end_ms, synced_ms - ?) FROM sync_ranges"
+            " WHERE collection = ? AND minx <= ? AND miny <= ? AND maxx >= ? AND maxy >= ?"
+            " ORDER BY start_ms",
+            (_LAG_MS, collection, minx, miny, maxx, maxy)
+        ).fetchall()
+        intervals = []
+        for start_ms, end_ms in rows:
+            if end_ms <= start_ms:
+                continue
+            if intervals and start_ms <= intervals[-1][1]:
+                intervals[-1][1] = max(intervals[-1][1], end_ms)
+            else:
+                intervals.append([start_ms, end_ms])
+        return intervals
+
+    def _missing_ranges(self, collection, bounds, start_ms, end_ms):
+        """
+        Trechos do período ainda não sincronizados para a região.
+
+        São as lacunas entre os intervalos sincronizados (ver
+        _synced_intervals): antes do primeiro, entre eles e depois do último.
+        """
+        ranges = []
+        cursor = start_ms
+        for synced_start, synced_end in self._synced_intervals(collection, bounds):
+            if synced_end <= cursor:
+                continue
+            if synced_start >= end_ms:
+                break
+            if synced_start > cursor:
+                ranges.append((cursor, synced_start))
+            cursor = synced_end
+        if cursor < end_ms:
+            ranges.append((cursor, end_ms))
+        return ranges
+
+    def _record_range(self, collection, bounds, start_ms, end_ms, synced_ms):
+        """
+        Registra um trecho sincronizado da região, unindo-o aos trechos que ele continua.
+
+        Um trecho é absorvido pelo anterior quando começa antes do fim válido
+        dele (fim limitado pelo atraso de ingestão): o resultado vale até o fim
+        do trecho mais recente. Trechos separados ficam em linhas separadas.
+        """
+        key = region_key(bounds)
+        rows = self._conn.execute(
+            "SELECT start_ms, end_ms, synced_ms FROM sync_ranges WHERE collection = ? AND region_key = ?",
+            (collection, key)
+        ).fetchall()
+        merged = []
+        for row in sorted(rows + [(start_ms, end_ms, synced_ms)]):
+            if merged:
+                prev_start, prev_end, prev_synced = merged[-1]
+                if row[0] <= min(prev_end, prev_synced - _LAG_MS):
+                    if row[1] >= prev_end:
+                        merged[-1] = (prev_start, row[1], row[2])
+                    elif row[1] <= min(prev_end, prev_synced - _LAG_MS):
+                        pass
+                    else:
+                        merged.append(row)
+                    continue
+            merged.append(row)
+        self._conn.execute("DELETE FROM sync_ranges WHERE collection = ? AND region_key = ?", (collection, key))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO sync_ranges VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(collection, key, *bounds, *row) for row in merged]
+        )
+
+    def _fetch(self, collection, bounds, start_ms, end_ms):
+        """Metadados das cenas de um trecho em uma única chamada ao servidor."""
+        images = ee.ImageCollection(collection).filterBounds(ee.Geometry.Rectangle(list(bounds))) \
+            .filterDate(_to_date(start_ms), _to_date(end_ms))
+        images = INDEX_FILTERS.get(collection, lambda c: c)(images)
+        cloud_property = CLOUD_PROPERTIES.get(collection)
+
+        def scene_info(image):
+            return ee.Feature(image.geometry(), {
+                'system:index': image.get('system:index'),
+                'system:time_start': image.get('system:time_start'),
+                'cloud': image.get(cloud_property) if cloud_property else None,
+                'orbit_pass': image.get('orbitProperties_pass'),
+                'relative_orbit': image.get('relativeOrbitNumber_start')
+            })
+
+        self.server_calls += 1
+        return images.map(scene_info).getInfo()['features']
+
+    def sync(self, collection, bounds, start_date, end_date):
+        """
+        Atualiza o índice para a coleção, região e período (buscando só o que falta).
+
+        Parâmetros:
+        - collection: ID da coleção (ex.: 'COPERNICUS/S2_SR_HARMONIZED')
+        - bounds: (minx, miny, maxx, maxy) da região em graus
+        - start_date, end_date: Período (YYYY-MM-DD; end_date exclusivo, como em filterDate)
+
+        Retorna:
+        - Número de cenas recebidas do servidor
+        """
+        bounds = tuple(float(v) for v in bounds)
+        start_ms, end_ms = _to_millis(start_date), _to_millis(end_date)
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            ranges = self._missing_ranges(collection, bounds, start_ms, end_ms)
+        received = 0
+        for range_start, range_end in ranges:
+            features = self._fetch(collection, bounds, range_start, range_end)
+            rows = []
+            for feature in features:
+                props = feature['properties']
+                time_start = props['system:time_start']
+                rows.append((
+                    collection, props['system:index'], time_start, _to_date(time_start),
+                    props.get('cloud'), props.get('orbit_pass'), props.get('relative_orbit'),
+                    json.dumps(feature.get('geometry')), *_footprint_bounds(feature.get('geometry'))
+                ))
+            received += len(rows)
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO scenes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                self._record_range(collection, bounds, range_start, range_end, now_ms)
+        return received
+
+    def query(self, collection, bounds, start_date, end_date, cloud_lt=None, orbit_pass=None):
+        """
+        Cenas indexadas que intersectam a região no período, em ordem de aquisição.
+
+        O envelope do footprint filtra no SQL; a interseção é confirmada com o
+        footprint (faixas diagonais do Landsat/S2 podem ter o envelope sobre a
+        região sem cobri-la).
+
+        Parâmetros:
+        - cloud_lt: Cobertura de nuvens máxima (exclusiva), como Filter.lt
+        - orbit_pass: 'ASCENDING', 'DESCENDING' ou uma lista de passagens (Sentinel-1)
+
+        Retorna:
+        - Lista de dicionários com as colunas do índice
+        """
+        minx, miny, maxx, maxy = bounds
+        sql = (
+            "SELECT * FROM scenes WHERE collection = ? AND time_start >= ? AND time_start < ?"
+            " AND (minx IS NULL OR (minx <= ? AND maxx >= ? AND miny <= ? AND maxy >= ?))"
+        )
+        params = [collection, _to_millis(start_date), _to_millis(end_date), maxx, minx, maxy, miny]
+        if cloud_lt is not None:
+            sql += " AND cloud < ?"
+            params.append(cloud_lt)
+        if orbit_pass is not None:
+            passes = [orbit_pass] if isinstance(orbit_pass, str) else list(orbit_pass)
+            sql += f" AND orbit_pass IN ({', '.join('?' * len(passes))})"
+            params.extend(passes)
+        sql += " ORDER BY time_start, system_index"
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            columns = [c[0] for c in cursor.description]
+            scenes = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        region = box(minx, miny, maxx, maxy)
+        return [s for s in scenes if _footprint_intersects(s['footprint'], region)]
+
+    def inventory(self, collection, bounds, start_date, end_date, cloud_lt=None, orbit_pass=None,
+                  refresh=True):
+        """
+        Datas e system:index das cenas (mesmo resultado do inventário dos scripts).
+
+        Parâmetros:
+        - collection: ID da coleção ou lista de IDs (ex.: MODIS Terra e Aqua),
+          com as cenas intercaladas em ordem de aquisição
+        - refresh: Sincroniza antes o trecho que falta (False: só o índice local)
+
+        Retorna:
+        - Tupla (dates_list, indices_list)
+        """
+        collections = [collection] if isinstance(collection, str) else list(collection)
+        scenes = []
+        for collection_id in collections:
+            if refresh:
+                self.sync(collection_id, bounds, start_date, end_date)
+            scenes += self.query(collection_id, bounds, start_date, end_date, cloud_lt, orbit_pass)
+        scenes.sort(key=lambda s: (s['time_start'], s['system_index']))
+        return [s['date'] for s in scenes], [s['system_index'] for s in scenes]
@@ -0,0 +1,177 @@
+import ast
+import importlib
+import json
+import os
+import re
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+import ipywidgets
+
+
+# Execução dos scripts dos sensores como estão, fora do notebook, contra o
+# backend local (ee_standin): usada pelo controle de orçamento de RPCs e pelo
+# benchmark, para medir os scripts e não uma cópia do fluxo.
+
+# Scripts dos sensores e o fluxo equivalente em pipeline.SENSOR_FLOWS
+# (o Modis_terra.py roda no modo combinado Terra+Aqua por padrão; o
+# modis_aqua.py, só com o Aqua)
+SCRIPT_FLOWS = {
+    'Sentinel_1.py': 'sentinel1',
+    'Sentinel_2.py': 'sentinel2',
+    'Landsat8.py': 'landsat8',
+    'landsat5.py': 'landsat5',
+    'Modis_terra.py': 'modis',
+    'modis_aqua.py': 'modis_aqua',
+}
+
+# Dependências pesadas importadas antes da medição (tempo e memória do script
+# não incluem a importação das bibliotecas)
+PRELOAD = ('geopandas', 'rasterio', 'xarray', 'IPython.display', 'dateutil.relativedelta', 'ipyleaflet')
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class HeadlessMap(ipywidgets.VBox):
+    """
+    geemap.Map sem interface para executar os scripts fora do notebook.
+
+    Faz as mesmas chamadas ao servidor do geemap: addLayer obtém um map ID
+    (geometrias viram um FeatureCollection estilizado) e centerObject lê os
+    limites ou o centroide da geometria. As chamadas contam como 'render'.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__()
+        self.ee_layers = []
+
+    def addLayer(self, ee_object, vis_params=None, name='Layer', shown=True, opacity=1.0):
+        import ee
+        import instrumentation
+
+        vis_params = vis_params or {}
+        if isinstance(ee_object, (ee.Geometry, ee.Feature, ee.FeatureCollection)):
+            style = {'color': vis_params.get('color', '000000'), 'width': vis_params.get('width', 2)}
+            ee_object = ee.FeatureCollection([ee.Feature(ee_object)]).style(**style)
+            vis_params = {}
+        with instrumentation.attributed('render'):
+            ee_object.getMapId(vis_params)
+        self.ee_layers.append(name)
+
+    def add(self, layer):
+        self.ee_layers.append(getattr(layer, 'name', None))
+
+    def centerObject(self, ee_object, zoom=None):
+        import ee
+        import instrumentation
+
+        geometry = ee_object if isinstance(ee_object, ee.Geometry) else ee_object.geometry()
+        with instrumentation.attributed('render'):
+            (geometry.bounds() if zoom is None else geometry.centroid()).getInfo()
+
+    def addLayerControl(self):
+        pass
+
+
+def apply_settings(source, settings):
+    """
+    Substitui as atribuições de configuração no topo do script (ex.: dias_anteriores = 20).
+
+    Lança KeyError se o script não tiver alguma das configurações.
+    """
+    for name, value in settings.items():
+        source, count = re.subn(rf'^{re.escape(name)}\s*=.*$', f'{name} = {value!r}', source,
+                                count=1, flags=re.MULTILINE)
+        if not count:
+            raise KeyError(f'configuração {name!r} não encontrada no script')
+    return source
+
+
+def read_settings(script, names):
+    """
+    Lê os valores das configurações no topo do script (ex.: lon, lat).
+
+    Lança KeyError se o script não tiver alguma das configurações.
+    """
+    with open(os.path.join(REPO_DIR, script), encoding='utf-8') as f:
+        source = f.read()
+    values = {}
+    for name in names:
+        match = re.search(rf'^{re.escape(name)}\s*=\s*([^#\n]+)', source, flags=re.MULTILINE)
+        if match is None:
+            raise KeyError(f'configuração {name!r} não encontrada no script')
+        values[name] = ast.literal_eval(match.group(1).strip())
+    return values
+
+
+def _child(script, settings, backend, output):
+    """Executa o script neste processo (backend local, geemap sem interface) e grava o resultado em JSON."""
+    import ee_standin
+    ee_standin.activate(**backend)
+    sys.modules['geemap'] = types.SimpleNamespace(Map=HeadlessMap)
+    for module in PRELOAD:
+        importlib.import_module(module)
+    import instrumentation
+
+    with open(os.path.join(REPO_DIR, script), encoding='utf-8') as f:
+        source = apply_settings(f.read(), settings)
+    runner = os.path.join(os.getcwd(), script)
+    with open(runner, 'w', encoding='utf-8') as f:
+        f.write(source)
+
+    tracer = instrumentation.reset(capture_sites=True)
+    tracemalloc.start()
+    start = time.perf_counter()
+    namespace = runpy.run_path(runner, run_name='__main__')
+    wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    tracer.finish()
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'events': tracer.events,
+            'stages': tracer.summary_rows(),
+            'dates': [date for date, _ in namespace.get('unique_dates', [])],
+            'panels': [panel['date'] for panel in namespace.get('maps_list', [])],
+            'wall_s': wall,
+            'peak_memory_bytes': peak,
+            'rpc_count': ee_standin.backend.rpc_count,
+            'bytes': ee_standin.backend.bytes,
+        }, f, default=str)
+
+
+def run_script(script, settings=None, **backend):
+    """
+    Executa um script de sensor no backend local, em um processo separado.
+
+    A pasta de trabalho e o HOME são temporários (índice de cenas e cache de
+    map IDs vazios: pior caso) e as saídas do script são descartadas.
+
+    Parâmetros:
+    - script: Chave de SCRIPT_FLOWS (ex.: 'Sentinel_2.py')
+    - settings: Configurações do topo do script (ex.: {'dias_anteriores': 10})
+    - backend: Repassados a ee_standin.configure (latency, pixel_latency...)
+
+    Retorna:
+    - Dicionário com 'events' (eventos do tracer), 'stages', 'dates', 'panels',
+      'wall_s', 'peak_memory_bytes', 'rpc_count' e 'bytes'
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        output = os.path.join(workdir, 'script_runner.json')
+        env = dict(os.environ, HOME=workdir,
+                   PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get('PYTHONPATH')])))
+        code = f'import script_runner; script_runner._child({script!r}, {settings or {}!r}, {backend!r}, {output!r})'
+        proc = subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env,
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f'{script} falhou no backend local:\n{proc.stderr[-2000:]}')
+        with open(output, encoding='utf-8') as f:
+            result = json.load(f)
+    result['events'] = [tuple(event) for event in result['events']]
+    return result
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Os testes rodam contra o backend local (ee_standin), instalado como 'ee'
+# antes de importar os módulos do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ee_standin  # noqa: E402
+
+ee_standin.activate()
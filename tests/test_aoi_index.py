@@ -0,0 +1,35 @@
+from shapely.geometry import box
+
+from aoi_index import AOIIndex
+
+AOIS = [
+    {'name': 'Governador Valadares', 'lon': -41.948, 'lat': -18.851, 'buffer_degrees': 0.1},
+    {'name': 'Porto Alegre', 'lon': -51.209, 'lat': -30.037, 'buffer_degrees': 0.2},
+]
+
+
+def test_footprint_returns_only_the_aois_it_covers():
+    index = AOIIndex(AOIS)
+    footprint = {
+        'type': 'Polygon',
+        'coordinates': [[[-42.5, -19.5], [-41.0, -19.5], [-41.0, -18.0], [-42.5, -18.0], [-42.5, -19.5]]]
+    }
+
+    assert index.query(footprint) == [(AOIS[0], 1.0)]
+
+
+def test_partial_coverage_is_the_covered_fraction():
+    index = AOIIndex(AOIS)
+
+    # Metade oeste da AOI de Governador Valadares
+    [(aoi, coverage)] = index.query(box(-42.2, -19.0, -41.948, -18.7))
+
+    assert aoi is AOIS[0]
+    assert abs(coverage - 0.5) < 1e-9
+
+
+def test_footprint_away_from_every_aoi_is_a_miss():
+    index = AOIIndex(AOIS)
+
+    assert index.query(box(0.0, 0.0, 1.0, 1.0)) == []
+    assert AOIIndex([]).query(box(0.0, 0.0, 1.0, 1.0)) == []
@@ -0,0 +1,76 @@
+import ee_standin
+
+import batch_planner
+import instrumentation
+
+
+def _aoi(name, lon, lat, buffer_degrees=0.2):
+    return {'name': name, 'lon': lon, 'lat': lat, 'buffer_degrees': buffer_degrees}
+
+
+NEIGHBOURS = [_aoi('Governador Valadares', -41.948, -18.851), _aoi('Alpercata', -41.970, -18.973)]
+FAR = _aoi('Porto Alegre', -51.209, -30.037)
+
+
+def test_overlapping_aois_are_grouped():
+    groups = batch_planner.plan_groups(NEIGHBOURS + [FAR])
+
+    assert [[aoi['name'] for aoi in group] for group in groups] == [
+        ['Governador Valadares', 'Alpercata'], ['Porto Alegre']
+    ]
+
+
+def test_aois_that_only_touch_stay_separate():
+    # Envelopes que só se encostam: o envelope comum não custa menos área
+    groups = batch_planner.plan_groups([_aoi('a', 0.0, 0.0, 0.1), _aoi('b', 0.3, 0.3, 0.1)])
+
+    assert len(groups) == 2
+
+
+def test_group_size_is_limited():
+    chain = [_aoi(str(i), i * 0.3, 0.0) for i in range(6)]
+
+    groups = batch_planner.plan_groups(chain, max_group_degrees=1.0)
+
+    assert len(groups) > 1
+    for group in groups:
+        lons = [aoi['lon'] for aoi in group]
+        assert max(lons) - min(lons) + 0.4 <= 1.0
+
+
+def _rpc_count(func):
+    backend = ee_standin.configure()
+    instrumentation.reset()
+    func()
+    return backend.rpc_count
+
+
+def test_group_needs_fewer_calls_than_separate_aois():
+    grouped = _rpc_count(lambda: batch_planner.run_batch('sentinel2', NEIGHBOURS, '2022-01-13'))
+    separate = _rpc_count(
+        lambda: [batch_planner.run_batch('sentinel2', [aoi], '2022-01-13') for aoi in NEIGHBOURS]
+    )
+
+    assert grouped < separate
+
+
+def test_export_grid_is_fetched_once_per_group():
+    batch = {}
+    exported = _rpc_count(lambda: batch.update(
+        batch_planner.run_batch('sentinel2', NEIGHBOURS, '2022-01-13', render=False)
+    ))
+    not_exported = _rpc_count(
+        lambda: batch_planner.run_batch('sentinel2', NEIGHBOURS, '2022-01-13', render=False, export=False)
+    )
+
+    assert all(len(result['tasks']) == 3 for result in batch['aois'].values())
+    assert exported - not_exported == 1
+
+
+def test_aois_share_the_group_map_ids():
+    batch = batch_planner.run_batch('sentinel2', NEIGHBOURS, '2022-01-13', export=False)
+    first, second = (batch['aois'][aoi['name']] for aoi in NEIGHBOURS)
+
+    assert first['panels'][0]['rgb'] is second['panels'][0]['rgb']
+    assert first['panels'][0]['rgb_map'] is second['panels'][0]['rgb_map']
+    assert first['bounds'] != second['bounds']
@@ -0,0 +1,26 @@
+import benchmark
+
+
+def test_case_runs_the_script():
+    row = benchmark.run_case('Sentinel_2.py', 10, 0.05, 1, latency=0.0)
+
+    assert row['script'] == 'Sentinel_2.py'
+    assert row['dates'] > 0
+    assert row['rpc_count'] == sum(stage['rpc_count'] for stage in row['stages'].values())
+    assert {'inventory', 'render', 'export'} <= set(row['stages'])
+
+
+def test_aois_are_summed():
+    single = benchmark.run_case('Modis_terra.py', 0, 0.05, 1, latency=0.0)
+    double = benchmark.run_case('Modis_terra.py', 0, 0.05, 2, latency=0.0)
+
+    assert double['rpc_count'] == 2 * single['rpc_count']
+
+
+def test_compare_reports_extra_calls():
+    row = benchmark.run_case('Modis_terra.py', 0, 0.05, 1, latency=0.0)
+    baseline = [dict(row, rpc_count=row['rpc_count'] - 1)]
+
+    regressions = benchmark.compare([row], baseline)
+    assert len(regressions) == 1
+    assert regressions[0].startswith('Modis_terra.py janela=0d')
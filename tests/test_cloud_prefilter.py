@@ -0,0 +1,23 @@
+from cloud_prefilter import MIN_CLEAR_FRACTION, usable_scenes
+
+DATES = ['2022-01-03', '2022-01-03', '2022-01-08', '2022-01-13']
+INDICES = ['a', 'b', 'c', 'd']
+
+
+def test_fraction_at_threshold_is_kept():
+    fractions = {'a': MIN_CLEAR_FRACTION, 'b': MIN_CLEAR_FRACTION - 1e-6, 'c': 1.0, 'd': 0.0}
+
+    assert usable_scenes(DATES, INDICES, fractions) == (['2022-01-03', '2022-01-08'], ['a', 'c'])
+
+
+def test_scene_without_fraction_is_dropped():
+    fractions = {'a': 1.0, 'b': 1.0, 'c': 1.0}
+
+    assert usable_scenes(DATES, INDICES, fractions)[1] == ['a', 'b', 'c']
+
+
+def test_threshold_extremes():
+    fractions = {'a': 0.0, 'b': 0.5, 'c': 0.99, 'd': 1.0}
+
+    assert usable_scenes(DATES, INDICES, fractions, min_clear=0.0)[1] == INDICES
+    assert usable_scenes(DATES, INDICES, fractions, min_clear=1.0) == (['2022-01-13'], ['d'])
@@ -0,0 +1,78 @@
+import ee
+import numpy as np
+import xarray as xr
+
+import datacube
+from export_utils import INDEX_NODATA, MASK_NODATA
+from pipeline import SENSOR_FLOWS, aoi_geometry
+
+S2 = 'COPERNICUS/S2_SR_HARMONIZED'
+
+
+def _spy(calls, name, original):
+    def wrapper(*args):
+        calls.append(name)
+        return original(*args)
+    return wrapper
+
+
+def test_grid_is_resolved_once_for_all_dates(monkeypatch):
+    calls = []
+    for name in ('native_grid', 'grid_window'):
+        monkeypatch.setattr(datacube, name, _spy(calls, name, getattr(datacube, name)))
+
+    region = aoi_geometry(-41.948, -18.851, 0.05)
+    collection = ee.ImageCollection(S2).filterBounds(region).filterDate('2022-01-01', '2022-01-20')
+    image = SENSOR_FLOWS['sentinel2']['add_index'](collection.first())
+    dates = ['2022-01-03', '2022-01-08', '2022-01-13']
+
+    ds = datacube.build_datacube(S2, [(date, image) for date in dates], region, collection.first(),
+                                 base_image=image)
+
+    assert calls == ['native_grid', 'grid_window']
+    assert [str(t)[:10] for t in ds['time'].values] == dates
+    assert ds['index'].shape[0] == 3
+    assert ds['baseline_index'].shape == ds['index'].shape[1:]
+
+
+def _cube():
+    region = aoi_geometry(-41.948, -18.851, 0.05)
+    collection = ee.ImageCollection(S2).filterBounds(region).filterDate('2022-01-01', '2022-01-20')
+    image = SENSOR_FLOWS['sentinel2']['add_index'](collection.first())
+    dates = ['2022-01-03', '2022-01-08']
+    stretches = {'2022-01-03': {'min': [0, 0, 0], 'max': [3000, 3000, 3000]}}
+    return datacube.build_datacube(S2, [(date, image) for date in dates], region, collection.first(),
+                                   stretches=stretches, base_image=image)
+
+
+def test_dates_are_fetched_only_when_written(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(datacube, '_fetch_index', _spy(calls, '_fetch_index', datacube._fetch_index))
+
+    ds = _cube()
+    assert calls == []
+
+    datacube.write_datacube(ds, str(tmp_path / 'cubo.zarr'))
+    assert len(calls) == 3
+
+
+def test_zarr_round_trip_keeps_int16_and_cf_attributes(tmp_path):
+    ds = _cube()
+    path = datacube.write_datacube(ds, str(tmp_path / 'cubo.zarr'))
+
+    raw = xr.open_zarr(path, mask_and_scale=False)
+    assert raw['index'].dtype == np.int16
+    assert raw['flood_mask'].dtype == np.uint8
+    assert raw['index'].attrs['scale_factor'] == 1e-4
+    assert raw['index'].attrs['add_offset'] == 0
+    assert raw['index'].attrs['_FillValue'] == INDEX_NODATA
+    assert raw['flood_mask'].attrs['_FillValue'] == MASK_NODATA
+    assert raw.attrs['sensor'] == S2
+    np.testing.assert_array_equal(raw['index'].values, ds['index'].values)
+
+    decoded = xr.open_zarr(path)
+    assert decoded['index'].encoding['dtype'] == np.int16
+    index = decoded['index'].values
+    expected = np.where(raw['index'].values == INDEX_NODATA, np.nan, raw['index'].values * 1e-4)
+    np.testing.assert_allclose(index, expected)
+    assert decoded['stretch_max'].values[0].tolist() == [3000, 3000, 3000]
@@ -0,0 +1,40 @@
+import types
+
+import ee
+import pytest
+
+import ee_retry
+import instrumentation
+
+
+class HttpError(Exception):
+    def __init__(self, status, message=''):
+        super().__init__(message)
+        self.resp = types.SimpleNamespace(status=status)
+
+
+@pytest.mark.parametrize('error, kind', [
+    (ee.EEException('Too many pixels in the region. Found 1500000123, but maxPixels allows 1000000000.'), 'fatal'),
+    (ee.EEException("Pattern 'B5029' did not match any bands."), 'fatal'),
+    (ee.EEException("Image asset 'projects/x/assets/aoi_429' not found."), 'fatal'),
+    (ee.EEException('Too many concurrent aggregations.'), 'concurrency'),
+    (ee.EEException('HTTP Error 429: Too Many Requests'), 'rate_limit'),
+    (ee.EEException('Quota exceeded for quota metric'), 'rate_limit'),
+    (ee.EEException('503 Service Unavailable'), 'transient'),
+    (ee.EEException('Computation timed out.'), 'fatal'),
+    (HttpError(429), 'rate_limit'),
+    (HttpError(429, 'Too many concurrent aggregations.'), 'concurrency'),
+    (HttpError(502), 'transient'),
+    (HttpError(400, 'Request payload size exceeds the limit (503 bytes over)'), 'fatal'),
+    (ConnectionError('reset'), 'transient'),
+])
+def test_classify_error(error, kind):
+    assert ee_retry.classify_error(error) == kind
+
+
+def test_export_start_is_not_retried():
+    ee_retry.install()
+    start = ee.batch.Task.start
+    assert not getattr(start, '_retried', False)
+    assert getattr(ee.batch.Task.status, '_retried', False)
+    assert ('batch.Task', 'start', 'export_start') in instrumentation.EE_CALLS
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from export_utils import INDEX_NODATA
+from fetch_utils import QuantizedArray, band_encoding, local_flood_mask, local_water_index, normalized_difference
+
+S2 = 'COPERNICUS/S2_SR_HARMONIZED'
+S1 = 'COPERNICUS/S1_GRD'
+
+
+def test_half_nodata_pixel_is_nan_and_never_water():
+    # Pixel 0: B3 válido e B11 nodata; pixel 1: os dois válidos (água)
+    views = {
+        'B3': np.array([[1200, 1500]], dtype=np.int16),
+        'B11': np.array([[INDEX_NODATA, 500]], dtype=np.int16),
+    }
+
+    index = local_water_index(views, S2)
+
+    assert np.isnan(index[0, 0])
+    assert index[0, 1] == pytest.approx(0.5)
+    assert local_flood_mask(views, S2).tolist() == [[False, True]]
+
+
+def test_normalized_difference_uses_fill_value_of_quantized_arrays():
+    first = QuantizedArray(np.array([100, 300], dtype=np.int16), 1e-4, nodata=-1)
+    second = QuantizedArray(np.array([-1, 100], dtype=np.int16), 1e-4, nodata=-1)
+
+    result = normalized_difference(first, second)
+
+    assert np.isnan(result[0])
+    assert result[1] == pytest.approx(0.5)
+
+
+def test_sentinel1_raw_view_threshold_in_db():
+    # VV em centi-dB: -20 dB é água, -10 dB não, nodata nunca
+    views = {'VV': np.array([-2000, -1000, INDEX_NODATA], dtype=np.int16)}
+
+    assert local_flood_mask(views, S1).tolist() == [True, False, False]
+
+
+def test_band_encoding_of_sentinel1_bands():
+    assert band_encoding(S1, 'VH') == {'a': 100, 'b': 0, 'scale_factor': 0.01, 'add_offset': 0}
+
+
+def test_band_encoding_unknown_sensor_raises_value_error():
+    with pytest.raises(ValueError):
+        band_encoding('COPERNICUS/S2_SR_HARMONIZED_X', 'B3')
@@ -0,0 +1,60 @@
+import fusion
+from pipeline import SENSOR_FLOWS
+
+
+def test_sentinel1_is_harmonized_before_daily_composites(monkeypatch):
+    steps = []
+
+    def harmonize(collection, base_collection):
+        steps.append('harmonize')
+        return collection
+
+    def daily_composites(flow, collection, dates):
+        steps.append('composites')
+        return collection
+
+    monkeypatch.setitem(SENSOR_FLOWS['sentinel1'], 'harmonize', harmonize)
+    monkeypatch.setattr(fusion, 'daily_composites', daily_composites)
+    monkeypatch.setattr(fusion, 'daily_stretches', lambda flow, daily, geometry: {})
+
+    fusion.run_fusion(-41.948, -18.851, '2022-01-13', sensors=('sentinel1',), render=False)
+
+    assert steps == ['harmonize', 'composites']
+
+
+def _obs(sensor, date, clear, time_start):
+    return {'sensor': sensor, 'date': date, 'clear': clear, 'time_start': time_start,
+            'score': fusion.score(sensor, clear)}
+
+
+def test_score_prefers_finer_resolution():
+    # Sentinel-2 (10 m) e Landsat 8 (30 m) têm a mesma latência
+    assert fusion.score('sentinel2', 1.0) > fusion.score('landsat8', 1.0)
+
+
+def test_score_prefers_lower_latency():
+    # Sentinel-1 e Sentinel-2 têm 10 m; o radar fica disponível antes
+    assert fusion.score('sentinel1', 1.0) > fusion.score('sentinel2', 1.0)
+
+
+def test_timeline_picks_best_observation_per_day():
+    observations = [
+        _obs('sentinel2', '2022-01-13', 0.2, 2000),
+        _obs('landsat8', '2022-01-13', 1.0, 1000),
+        _obs('sentinel2', '2022-01-14', 1.0, 3000),
+        _obs('modis', '2022-01-14', 1.0, 2500),
+    ]
+
+    timeline = fusion.build_timeline(observations)
+
+    # Nuvens pesam mais que resolução; sem nuvens, 10 m vence 250 m
+    assert [(day['date'], day['sensor']) for day in timeline] == [
+        ('2022-01-13', 'landsat8'), ('2022-01-14', 'sentinel2')
+    ]
+    assert [alt['sensor'] for alt in timeline[0]['alternatives']] == ['sentinel2']
+
+
+def test_timeline_tie_goes_to_earliest_acquisition():
+    observations = [_obs('sentinel2', '2022-01-13', 1.0, 2000), _obs('sentinel2', '2022-01-13', 1.0, 1000)]
+
+    assert fusion.build_timeline(observations)[0]['time_start'] == 1000
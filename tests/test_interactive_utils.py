@@ -0,0 +1,60 @@
+import importlib
+import sys
+import time
+import types
+
+import pytest
+
+import ee
+import tile_cache
+from script_runner import HeadlessMap
+
+
+@pytest.fixture
+def interactive_utils(monkeypatch, tmp_path):
+    # geemap sem interface (o geemap real exige o Earth Engine verdadeiro)
+    monkeypatch.setitem(sys.modules, 'geemap', types.SimpleNamespace(Map=HeadlessMap))
+    monkeypatch.setattr(tile_cache, 'CACHE_FILE', str(tmp_path / 'map_ids.json'))
+    monkeypatch.delitem(sys.modules, 'interactive_utils', raising=False)
+    return importlib.import_module('interactive_utils')
+
+
+def _panels(build_rgb):
+    return [{'date': '2022-01-13', 'rgb': None, 'build_rgb': build_rgb, 'flood': ee.Image(1)}]
+
+
+def test_failed_panel_can_be_retried(interactive_utils):
+    attempts = []
+
+    def build_rgb():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ee.EEException('Computation timed out.')
+        return ee.Image(1), {}
+
+    grid = interactive_utils.lazy_map_grid(_panels(build_rgb), ee.Geometry.Point([-41.948, -18.851]), 'AOI', eager=0)
+    container = grid.children[0].children[0]
+    button = container.children[1]
+
+    button.click()
+    assert 'Computation timed out.' in button.description
+    assert not button.disabled
+
+    button.click()
+    assert isinstance(container.children[1], HeadlessMap)
+    assert len(attempts) == 2
+
+
+def test_panel_opens_when_scrolled_into_view(interactive_utils):
+    geometry = ee.Geometry.Point([-41.948, -18.851])
+    grid = interactive_utils.lazy_map_grid(_panels(lambda: (ee.Image(1), {})), geometry, 'AOI', eager=0)
+    container = grid.children[0].children[0]
+    trigger = container.children[2]
+    assert isinstance(trigger, interactive_utils.ViewportTrigger)
+
+    trigger.in_view = True
+    for _ in range(50):
+        if isinstance(container.children[1], HeadlessMap):
+            break
+        time.sleep(0.1)
+    assert isinstance(container.children[1], HeadlessMap)
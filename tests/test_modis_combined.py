@@ -0,0 +1,71 @@
+import numpy as np
+
+from modis_combined import QUALITY_BAND, pixel_quality
+
+
+class _Pixels:
+    """Imagem de bandas numpy com as operações usadas por pixel_quality."""
+
+    def __init__(self, bands):
+        self.bands = bands
+
+    def _value(self):
+        return next(iter(self.bands.values()))
+
+    def _apply(self, func, *others):
+        values = [o._value() if isinstance(o, _Pixels) else o for o in others]
+        return _Pixels({'value': func(self._value(), *values)})
+
+    def select(self, band):
+        return _Pixels({band: self.bands[band]})
+
+    def rightShift(self, bits):
+        return self._apply(np.right_shift, bits)
+
+    def bitwiseAnd(self, mask):
+        return self._apply(np.bitwise_and, mask)
+
+    def eq(self, value):
+        return self._apply(lambda a, b: (a == b).astype(int), value)
+
+    def Or(self, other):
+        return self._apply(lambda a, b: (a | b).astype(int), other)
+
+    def multiply(self, value):
+        return self._apply(np.multiply, value)
+
+    def add(self, other):
+        return self._apply(np.add, other)
+
+    def rename(self, name):
+        return _Pixels({name: self._value()})
+
+    def addBands(self, other):
+        return _Pixels(dict(self.bands, **other.bands))
+
+
+def _qc(cloud_state=0, modland=0, band_quality=0):
+    return (band_quality << 4) | (cloud_state << 2) | modland
+
+
+def _quality(*qc_values):
+    image = pixel_quality(_Pixels({'QC_250m': np.array(qc_values)}))
+    return image.bands[QUALITY_BAND].tolist()
+
+
+def test_clear_ideal_pixel_has_the_maximum_score():
+    assert _quality(_qc()) == [6]
+
+
+def test_cloud_state_weighs_more_than_the_tie_breakers():
+    # limpo, não definido, misto, nublado
+    assert _quality(_qc(0), _qc(3), _qc(2), _qc(1)) == [6, 6, 4, 2]
+    assert _quality(_qc(0, modland=1, band_quality=0xFF)) == [4]
+    assert _quality(_qc(2, modland=0, band_quality=0)) == [4]
+
+
+def test_modland_and_band_quality_bits_break_ties():
+    assert _quality(_qc(modland=1), _qc(modland=2), _qc(band_quality=1), _qc(band_quality=0x80)) == [5, 5, 5, 5]
+    # Bits acima do 11 não fazem parte da qualidade das bandas 1 e 2
+    assert _quality(_qc() | (1 << 12)) == [6]
+    assert _quality(_qc(1, modland=3, band_quality=0xFF)) == [0]
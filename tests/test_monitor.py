@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+
+import monitor
+from modis_combined import MODIS_COLLECTIONS
+from scene_index import SceneIndex
+
+AOI = {'name': 'gv', 'lon': -41.948, 'lat': -18.851, 'buffer_degrees': 0.1}
+NOW = datetime(2022, 1, 20, tzinfo=timezone.utc)
+
+
+def test_merge_prefix_follows_chained_merges():
+    assert monitor.merge_prefix(1, 0) == ''
+    assert [monitor.merge_prefix(2, i) for i in range(2)] == ['1_', '2_']
+    assert [monitor.merge_prefix(3, i) for i in range(3)] == ['1_1_', '1_2_', '2_']
+
+
+def test_dispatch_inventories_every_collection_of_the_flow():
+    index = SceneIndex(':memory:')
+
+    [(aoi, candidates)] = monitor.dispatch([AOI], 'modis', index, NOW)
+
+    assert aoi is AOI
+    assert {idx[:2] for idx, _, _ in candidates} == {'1_', '2_'}
+    assert [t for _, t, _ in candidates] == sorted(t for _, t, _ in candidates)
+    assert index.server_calls == len(MODIS_COLLECTIONS)
+
+
+def test_dispatch_single_collection_keeps_system_index():
+    index = SceneIndex(':memory:')
+
+    [(_, candidates)] = monitor.dispatch([AOI], 'sentinel2', index, NOW)
+
+    assert candidates
+    assert not any(idx.startswith(('1_', '2_')) for idx, _, _ in candidates)
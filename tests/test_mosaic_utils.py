@@ -0,0 +1,35 @@
+from mosaic_utils import bulk_stretch
+
+
+class _Daily:
+    """Coleção diária com a resposta do servidor já conhecida."""
+
+    def __init__(self, features):
+        self.features = features
+
+    def map(self, func):
+        return self
+
+    def getInfo(self):
+        return {'features': self.features}
+
+
+def _feature(date, percentiles):
+    return {'properties': {'date': date, 'percentiles': percentiles}}
+
+
+def test_zero_percentiles_are_kept():
+    daily = _Daily([_feature('2022-01-13', {'VV_p2': -25.0, 'VV_p98': 0.0, 'B4_p2': 0, 'B4_p98': 0})])
+
+    stretch = bulk_stretch(daily, ['VV', 'B4'], None, 10, (2, 98), 3000)['2022-01-13']
+
+    assert stretch == {'min': [-25.0, 0], 'max': [0.0, 0]}
+
+
+def test_missing_percentiles_use_defaults():
+    daily = _Daily([_feature('2022-01-13', {'B4_p2': None, 'B4_p98': None}), _feature('2022-01-14', None)])
+
+    stretches = bulk_stretch(daily, ['B4'], None, 10, (2, 98), 3000)
+
+    assert stretches['2022-01-13'] == {'min': [0], 'max': [3000]}
+    assert stretches['2022-01-14'] == {'min': [0], 'max': [3000]}
@@ -0,0 +1,19 @@
+import threading
+
+from render_utils import resolve_rgbs
+
+
+def test_deferred_stretches_are_resolved_concurrently():
+    # Cada cálculo só termina quando os três estão em andamento ao mesmo tempo
+    barrier = threading.Barrier(3, timeout=5)
+
+    def panel(name):
+        def build_rgb():
+            barrier.wait()
+            return name, {'min': [0], 'max': [1]}
+        return {'rgb': None, 'build_rgb': build_rgb}
+
+    panels = [panel('a'), panel('b'), panel('c'), {'rgb': 'pronta'}]
+
+    assert resolve_rgbs(panels) == ['a', 'b', 'c', 'pronta']
+    assert panels[0]['vis_params'] == {'min': [0], 'max': [1]}
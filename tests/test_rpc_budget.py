@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import instrumentation
+import pipeline
+import rpc_budget
+from rpc_budget import RPCBudgetExceeded
+
+
+@pytest.mark.parametrize('script', list(rpc_budget.SCRIPT_FLOWS))
+def test_scripts_within_budget(script):
+    assert rpc_budget.check_script(script) == []
+
+
+@pytest.mark.parametrize('sensor', list(pipeline.SENSOR_FLOWS))
+@pytest.mark.parametrize('prefilter', [False, True])
+def test_flows_within_budget(sensor, prefilter):
+    assert rpc_budget.check_flow(sensor, prefilter=prefilter) == []
+
+
+def test_gate_passes():
+    assert rpc_budget.main(['--scripts', 'Sentinel_2.py', '--sensors', 'sentinel2', '--windows', '10']) == 0
+
+
+def test_extra_call_is_reported_with_its_call_site():
+    violations = rpc_budget.check_script('Sentinel_2.py', {'stretch': 0})
+
+    assert [v['stage'] for v in violations] == ['stretch']
+    sites = {site for _, _, site in violations[0]['calls']}
+    assert any(site.startswith('mosaic_utils.py:') for site in sites)
+
+
+def test_context_manager_raises_when_budget_exceeded():
+    with pytest.raises(RPCBudgetExceeded) as excinfo:
+        with rpc_budget.rpc_budget({'inventory': 0}, label='sentinel2'):
+            pipeline.run_flow('sentinel2', -41.948, -18.851, '2022-01-13')
+    assert excinfo.value.violations[0]['stage'] == 'inventory'
+
+
+def test_script_stretch_budget_does_not_grow_with_dates():
+    budgets = rpc_budget.script_budgets('Sentinel_2.py')
+    tracer = instrumentation.Tracer()
+    # Regressão: um stretch por data em vez do lote
+    for _ in range(6):
+        tracer.record('getInfo', 'Image.reduceRegion', 0.0, stage='stretch')
+
+    violations = rpc_budget.check_tracer(tracer, budgets, {'dates': ['d'] * 6, 'panels': ['p'] * 7})
+
+    assert budgets['stretch'] == 1
+    assert [v['stage'] for v in violations] == ['stretch']
+
+
+def test_import_keeps_the_real_ee_module():
+    code = 'import sys, ee, rpc_budget; assert sys.modules["ee"] is ee and ee is not rpc_budget.ee_standin'
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(rpc_budget.__file__))
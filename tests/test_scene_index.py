@@ -0,0 +1,83 @@
+import json
+from datetime import datetime, timezone
+
+import scene_index
+from scene_index import SceneIndex
+
+BOUNDS = (-42.048, -18.951, -41.848, -18.751)
+S2 = 'COPERNICUS/S2_SR_HARMONIZED'
+
+
+def _at(monkeypatch, date):
+    now = datetime.strptime(date, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp()
+    monkeypatch.setattr(scene_index.time, 'time', lambda: now)
+
+
+def test_ongoing_window_is_refreshed_as_time_advances(monkeypatch):
+    index = SceneIndex(':memory:')
+    _at(monkeypatch, '2022-01-15')
+    index.inventory(S2, BOUNDS, '2022-01-01', '2022-01-20')
+    assert index.server_calls == 1
+
+    # Um dia depois: o fim do período (depois da sincronização menos o atraso de ingestão) é buscado de novo
+    _at(monkeypatch, '2022-01-16')
+    index.inventory(S2, BOUNDS, '2022-01-01', '2022-01-20')
+    assert index.server_calls == 2
+
+    # Sincronizado bem depois do fim do período: nada mais a buscar
+    _at(monkeypatch, '2022-03-01')
+    index.inventory(S2, BOUNDS, '2022-01-01', '2022-01-20')
+    calls = index.server_calls
+    index.inventory(S2, BOUNDS, '2022-01-01', '2022-01-20')
+    index.inventory(S2, BOUNDS, '2022-01-05', '2022-01-10')
+    assert index.server_calls == calls
+
+
+def test_contained_window_respects_ingestion_lag(monkeypatch):
+    index = SceneIndex(':memory:')
+    _at(monkeypatch, '2022-01-15')
+    # Período que vai além da sincronização: contido nele, o fim recente não conta como coberto
+    index.inventory(S2, BOUNDS, '2022-01-01', '2022-02-01')
+    _at(monkeypatch, '2022-01-20')
+    index.inventory(S2, BOUNDS, '2022-01-05', '2022-01-18')
+    assert index.server_calls == 2
+
+
+def test_gap_between_separate_syncs_is_fetched(monkeypatch):
+    _at(monkeypatch, '2022-06-01')
+    fresh = SceneIndex(':memory:')
+    expected = fresh.inventory(S2, BOUNDS, '2022-01-01', '2022-03-10')
+
+    index = SceneIndex(':memory:')
+    index.inventory(S2, BOUNDS, '2022-01-01', '2022-01-20')
+    index.inventory(S2, BOUNDS, '2022-03-01', '2022-03-10')
+    calls = index.server_calls
+    # Só a lacuna de 20/01 a 01/03 é buscada, em uma chamada
+    assert index.inventory(S2, BOUNDS, '2022-01-01', '2022-03-10') == expected
+    assert index.server_calls == calls + 1
+    assert any('2022-01-20' <= date < '2022-03-01' for date in expected[0])
+
+    # Depois disso o período inteiro está coberto
+    index.inventory(S2, BOUNDS, '2022-01-01', '2022-03-10')
+    assert index.server_calls == calls + 1
+
+
+def test_query_checks_footprint_not_only_envelope():
+    index = SceneIndex(':memory:')
+    # Faixa diagonal: o envelope cobre a região, o footprint não
+    diagonal = {'type': 'Polygon', 'coordinates': [[
+        [-43.0, -20.0], [-42.5, -20.0], [-41.0, -18.5], [-41.5, -18.5], [-43.0, -20.0]
+    ]]}
+    over = {'type': 'Polygon', 'coordinates': [[
+        [-43.0, -20.0], [-41.0, -20.0], [-41.0, -18.5], [-43.0, -18.5], [-43.0, -20.0]
+    ]]}
+    time_start = int(datetime(2022, 1, 10, tzinfo=timezone.utc).timestamp() * 1000)
+    with index._conn:
+        for idx, footprint in (('diagonal', diagonal), ('over', over)):
+            index._conn.execute(
+                "INSERT INTO scenes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (S2, idx, time_start, '2022-01-10', 5.0, None, None, json.dumps(footprint),
+                 *scene_index._footprint_bounds(footprint))
+            )
+    rows = index.query(S2, (-41.3, -19.9, -41.1, -19.7), '2022-01-01', '2022-01-20')
+    assert [r['system_index'] for r in rows] == ['over']
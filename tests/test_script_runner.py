@@ -0,0 +1,19 @@
+import pytest
+
+import script_runner
+
+
+def test_apply_settings_replaces_top_level_assignment():
+    source = "dias_anteriores = 20  # Número de dias\nprint(dias_anteriores)\n"
+
+    assert script_runner.apply_settings(source, {'dias_anteriores': 5}).startswith('dias_anteriores = 5\n')
+    with pytest.raises(KeyError):
+        script_runner.apply_settings(source, {'buffer_degrees': 0.1})
+
+
+def test_script_without_images_finishes():
+    # Janela de um dia fora da passagem do Landsat 8 (revisita de 16 dias)
+    result = script_runner.run_script('Landsat8.py', {'dias_anteriores': 0, 'dias_posteriores': 0})
+
+    assert result['dates'] == []
+    assert result['panels'] == []
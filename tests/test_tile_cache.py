@@ -0,0 +1,45 @@
+import json
+import time
+
+import ee
+import tile_cache
+
+AOI = (-42.048, -18.951, -41.848, -18.751)
+
+
+def test_probe_tile_covers_the_aoi():
+    x, y, z = tile_cache.tile_for_bounds(AOI)
+
+    assert z == 10
+    n = 2 ** z
+    west = x / n * 360 - 180
+    assert west <= -41.948 < west + 360 / n
+
+
+def test_validation_requests_the_aoi_tile(tmp_path, monkeypatch):
+    cache_file = str(tmp_path / 'map_ids.json')
+    image = ee.Image(1)
+    url = tile_cache.cached_tile_url(image, cache_file=cache_file, bounds=AOI)
+    tile_cache._validated.clear()
+
+    requested = []
+
+    def probe(url_format, bounds=None, timeout=10):
+        requested.append(bounds)
+        return True
+
+    monkeypatch.setattr(tile_cache, 'is_valid_tile_url', probe)
+    assert tile_cache.cached_tile_url(image, cache_file=cache_file) == url
+    assert requested == [list(AOI)]
+
+
+def test_expired_entries_are_recreated_and_pruned(tmp_path):
+    cache_file = tmp_path / 'map_ids.json'
+    old = time.time() - tile_cache.MAX_AGE_SECONDS - 1
+    cache_file.write_text(json.dumps({'antiga': {'url': 'https://x/{z}/{x}/{y}', 'created': old}}))
+
+    tile_cache.cached_tile_url(ee.Image(2), cache_file=str(cache_file), bounds=AOI)
+
+    cache = json.loads(cache_file.read_text())
+    assert 'antiga' not in cache
+    assert len(cache) == 1
@@ -0,0 +1,165 @@
+import json
+import math
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from ipyleaflet import TileLayer
+
+import instrumentation
+from render_utils import expression_hash
+
+
+# Arquivo do cache de map IDs (compartilhado entre sessões)
+CACHE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'satelite', 'map_ids.json')
+
+# Idade máxima de uma entrada (os map IDs do Earth Engine expiram): entradas
+# mais antigas não são testadas, são recriadas e saem do arquivo
+MAX_AGE_SECONDS = 24 * 3600
+
+# Zoom máximo do tile usado para validar um map ID
+MAX_PROBE_ZOOM = 18
+
+_lock = threading.Lock()
+_validated = set()  # chaves já validadas nesta sessão
+
+
+def _load(cache_file):
+    """Lê o cache do disco (dicionário vazio se não existir ou estiver corrompido)."""
+    try:
+        with open(cache_file, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save(cache_file, cache):
+    """Grava o cache de forma atômica."""
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tmp_file = f"{cache_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(tmp_file, cache_file)
+
+
+def _expired(entry, now, max_age):
+    return now - entry.get('created', 0) > max_age
+
+
+def tile_for_bounds(bounds):
+    """
+    Tile XYZ do centro da AOI no zoom em que ela ocupa cerca de um tile.
+
+    Parâmetros:
+    - bounds: (oeste, sul, leste, norte) em graus
+
+    Retorna:
+    - Tupla (x, y, z)
+    """
+    west, south, east, north = bounds
+    span = max(east - west, north - south, 1e-9)
+    z = min(MAX_PROBE_ZOOM, max(0, int(math.floor(math.log2(360.0 / span)))))
+    n = 2 ** z
+    lon = (west + east) / 2
+    lat = math.radians(max(-85.0511, min(85.0511, (south + north) / 2)))
+    x = min(n - 1, int((lon + 180.0) / 360.0 * n))
+    y = min(n - 1, int((1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * n))
+    return x, y, z
+
+
+def is_valid_tile_url(url_format, bounds=None, timeout=10):
+    """
+    Verifica se o template de tiles ainda é aceito pelo servidor (map IDs expiram).
+
+    O teste pede um único tile sobre a AOI (tile_for_bounds): um tile pequeno
+    é renderizado rápido, ao contrário do tile 0/0/0, que cobre o mundo todo.
+
+    Parâmetros:
+    - url_format: Template com {x}, {y} e {z}
+    - bounds: (oeste, sul, leste, norte) da AOI; sem limites, usa o tile 0/0/0
+    - timeout: Tempo máximo da requisição em segundos (padrão: 10)
+
+    Retorna:
+    - True se o tile responde com sucesso
+    """
+    x, y, z = tile_for_bounds(bounds) if bounds is not None else (0, 0, 0)
+    url = url_format.format(x=x, y=y, z=z)
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError):
+        return False
+
+
+def cached_tile_url(ee_object, vis_params=None, cache_file=None, validate=True, bounds=None,
+                    max_age=MAX_AGE_SECONDS):
+    """
+    Retorna o template de tiles de uma expressão, reaproveitando map IDs de sessões anteriores.
+
+    A chave é o hash da expressão serializada + parâmetros de visualização;
+    entradas reaproveitadas são validadas uma vez por sessão antes do uso e
+    recriadas (novo getMapId) se tiverem expirado. Entradas com mais de
+    'max_age' segundos são recriadas sem teste e removidas do arquivo.
+
+    Parâmetros:
+    - ee_object: Imagem do Earth Engine
+    - vis_params: Parâmetros de visualização (opcional)
+    - cache_file: Caminho do cache em disco (padrão: CACHE_FILE)
+    - validate: Valida a entrada em cache antes de reutilizar (padrão: True)
+    - bounds: (oeste, sul, leste, norte) da AOI, usados na validação (opcional)
+    - max_age: Idade máxima de uma entrada em segundos (padrão: MAX_AGE_SECONDS)
+
+    Retorna:
+    - Template de URL com {x}, {y} e {z}
+    """
+    cache_file = cache_file or CACHE_FILE
+    vis_params = vis_params or {}
+    key = expression_hash(ee_object, vis_params)
+
+    with _lock:
+        entry = _load(cache_file).get(key)
+    if entry is not None and not _expired(entry, time.time(), max_age):
+        probe_bounds = bounds if bounds is not None else entry.get('bounds')
+        if not validate or key in _validated or is_valid_tile_url(entry['url'], probe_bounds):
+            _validated.add(key)
+            return entry['url']
+
+    with instrumentation.attributed('render'):
+        map_id = ee_object.getMapId(vis_params)
+    url = map_id['tile_fetcher'].url_format
+
+    now = time.time()
+    with _lock:
+        cache = {k: v for k, v in _load(cache_file).items() if not _expired(v, now, max_age)}
+        cache[key] = {'url': url, 'created': now, 'bounds': list(bounds) if bounds is not None else None}
+        _save(cache_file, cache)
+    _validated.add(key)
+    return url
+
+
+def cached_tile_layer(ee_object, vis_params=None, name='Layer', shown=True, opacity=1.0, bounds=None):
+    """Cria a camada ipyleaflet de uma expressão usando o cache de map IDs (bounds: limites da AOI)."""
+    return TileLayer(
+        url=cached_tile_url(ee_object, vis_params, bounds=bounds),
+        name=name,
+        attribution='Google Earth Engine',
+        visible=shown,
+        opacity=opacity,
+        max_zoom=24
+    )
+
+
+def add_cached_layer(Map, ee_object, vis_params=None, name='Layer', bounds=None):
+    """
+    Equivalente a Map.addLayer para imagens, mas reaproveitando map IDs em cache.
+
+    Parâmetros:
+    - Map: geemap.Map de destino
+    - ee_object: Imagem do Earth Engine
+    - vis_params: Parâmetros de visualização (opcional)
+    - name: Nome da camada
+    - bounds: (oeste, sul, leste, norte) da AOI, usados na validação do cache (opcional)
+    """
+    Map.add(cached_tile_layer(ee_object, vis_params, name, bounds=bounds))